@@ -0,0 +1,273 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from generated_validation_code import DEFAULT_DATE_FORMAT, _flag
+
+AGGREGATES = ('sum', 'count', 'max')
+# Files of a checkpoint directory: the retained window events, and the settings they belong to
+_EVENTS_FILE = 'events.parquet'
+_STATE_FILE = 'state.json'
+
+
+class WindowRule:
+    # A per-customer windowed aggregate rule. A row violates it when `aggregate` ('sum', 'count' or
+    # 'max') of `column` over its customer's rows dated within `window` up to its own
+    # Transaction_Date exceeds `threshold`. With `where`, only rows whose flag column is set count
+    # (and only they are judged). The error and action may use {value}, {threshold} and {window}.
+
+    def __init__(self, rule_id, error, action, risk_weight, aggregate, window, threshold, column=None, where=None):
+        if aggregate not in AGGREGATES:
+            raise ValueError(f"Unknown aggregate '{aggregate}', expected one of {AGGREGATES}")
+        if aggregate != 'count' and column is None:
+            raise ValueError(f"A '{aggregate}' rule needs a column")
+        self.rule_id = rule_id
+        self.error = error
+        self.action = action
+        self.risk_weight = risk_weight
+        self.aggregate = aggregate
+        self.window_label = window
+        self.window = pd.Timedelta(window)
+        self.threshold = threshold
+        self.column = column
+        self.where = where
+
+    def spec(self):
+        # What the rule's retained events depend on; the threshold and messages can change freely
+        return {'aggregate': self.aggregate, 'window': self.window_label, 'column': self.column, 'where': self.where}
+
+    def params(self, value):
+        return {'value': value, 'threshold': self.threshold, 'window': self.window_label}
+
+
+DEFAULT_WINDOW_RULES = [
+    WindowRule('cross_border_daily_total',
+               'Cross-border transactions total {value:.2f} within {window}, above the limit of {threshold}',
+               "Action: Review the customer's cross-border transactions in this period against the daily limit.",
+               5, 'sum', '24h', 5000, column='Transaction_Amount', where='is_cross_border'),
+    WindowRule('daily_transaction_count',
+               'Customer made {value:.0f} transactions within {window}, more than the limit of {threshold}',
+               "Action: Check the customer's transactions in this period for duplicates or unusual activity.",
+               3, 'count', '24h', 20),
+]
+
+
+def _range_max(values, lower, upper):
+    # max(values[lower:upper]) for every (non-empty) range, from a sparse table of maxima over
+    # power-of-two spans: two overlapping table entries cover any range
+    lengths = upper - lower
+    levels = [values]
+    while 2 ** len(levels) <= lengths.max():
+        previous, span = levels[-1], 2 ** (len(levels) - 1)
+        levels.append(np.maximum(previous[:-span], previous[span:]))
+    level = np.floor(np.log2(lengths)).astype(np.int64)
+    result = np.empty(len(lower))
+    for k in np.unique(level):
+        selected = level == k
+        result[selected] = np.maximum(levels[k][lower[selected]], levels[k][upper[selected] - 2 ** k])
+    return result
+
+
+def window_aggregates(events, new, aggregate, window):
+    # `aggregate` of every `new` event's window: the values of events of the same customer that
+    # arrived no later than it (`events` all arrived earlier) and are dated in (time - window, time].
+    # Both are DataFrames with Customer_ID, time, value and seq (arrival order) columns.
+    combined = pd.concat([events, new], ignore_index=True) if len(events) else new.reset_index(drop=True)
+    codes = pd.factorize(combined['Customer_ID'])[0].astype(np.int64)
+    times = combined['time'].to_numpy()
+    seqs = combined['seq'].to_numpy()
+    values = combined['value'].to_numpy(dtype=float)
+    order = np.lexsort((seqs, times, codes))
+    position = np.empty(len(order), dtype=np.int64)
+    position[order] = np.arange(len(order))
+    sorted_codes, sorted_seqs, sorted_values = codes[order], seqs[order], values[order]
+
+    # Sorted by (customer, time, arrival), a new event's window is the range from the first event of
+    # its customer dated after time - window up to the event itself
+    unique_times, time_ranks = np.unique(times, return_inverse=True)
+    sorted_keys = (codes * (len(unique_times) + 1) + time_ranks)[order]
+    rows = np.arange(len(events), len(combined))
+    window_start_ranks = np.searchsorted(unique_times, times[rows] - window.to_timedelta64(), side='right')
+    lower = np.searchsorted(sorted_keys, codes[rows] * (len(unique_times) + 1) + window_start_ranks)
+    upper = position[rows] + 1
+
+    # An event is late when a later-sorted event of its customer arrived before it, i.e. it is dated
+    # earlier than something already seen. Every other event in a window arrived no later than the
+    # window's own event, so windows are prefix-sum (or range-max) lookups; only late events are
+    # checked against each window's arrival order.
+    offset_seqs = sorted_seqs - sorted_seqs.min()
+    grouped = offset_seqs + sorted_codes * (offset_seqs.max() + 1)  # Groups never mix in the running minimum
+    suffix_min = np.minimum.accumulate(grouped[::-1])[::-1]
+    next_min = np.append(suffix_min[1:], np.iinfo(np.int64).max)
+    late = grouped > next_min
+    late[np.append(sorted_codes[1:] != sorted_codes[:-1], True)] = False  # Last of its customer
+
+    if aggregate == 'max':
+        result = _range_max(np.where(late, -np.inf, sorted_values), lower, upper)
+    else:
+        counted = np.where(late, 0.0, 1.0 if aggregate == 'count' else sorted_values)
+        prefix = np.concatenate(([0.0], np.cumsum(counted)))
+        result = prefix[upper] - prefix[lower]
+
+    late_positions = np.flatnonzero(late)
+    if len(late_positions):
+        first = np.searchsorted(late_positions, lower)
+        counts = np.searchsorted(late_positions, upper) - first
+        owners = np.repeat(np.arange(len(rows)), counts)
+        candidates = late_positions[np.repeat(first - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())]
+        keep = sorted_seqs[candidates] <= seqs[rows][owners]
+        owners, candidates = owners[keep], candidates[keep]
+        if aggregate == 'max':
+            np.maximum.at(result, owners, sorted_values[candidates])
+        else:
+            result += np.bincount(owners, weights=np.ones(len(owners)) if aggregate == 'count'
+                                  else sorted_values[candidates], minlength=len(rows))
+    return result
+
+
+class WindowedAggregates:
+    # Stateful engine for per-customer windowed aggregate rules (velocity, daily totals).
+    #
+    # validate_frame() is called per chunk in arrival order and judges every row against its
+    # customer's rows seen so far, in this and earlier chunks and runs. Only the events a future
+    # row's window can still reach are kept: those dated within a rule's window plus `lateness` of
+    # the latest Transaction_Date seen (future dates do not count). The state is checkpointed to
+    # `directory`, so a run costs O(new rows + retained events) instead of a group-by over the
+    # whole history.
+    #
+    # Results are the same however the rows are split into chunks and runs, except for rows dated
+    # more than `lateness` before the latest date seen: those are only compared with retained
+    # events. Files not sorted by date need a lateness covering how far back their dates jump.
+    # Changing a rule's aggregate, window, column or flag drops that rule's retained events.
+
+    def __init__(self, rules=None, directory=None, date_format=DEFAULT_DATE_FORMAT, lateness='0D'):
+        self.rules = list(DEFAULT_WINDOW_RULES if rules is None else rules)
+        self.rule_ids = [rule.rule_id for rule in self.rules]
+        self.directory = directory
+        self.date_format = date_format
+        self.lateness = pd.Timedelta(lateness)
+        self.sequence = 0  # Rows seen, for arrival order
+        self.watermark = None  # Latest (non-future) Transaction_Date seen
+        self.rows = 0
+        self._events = {rule.rule_id: self._empty_events() for rule in self.rules}
+        if directory is not None:
+            self._load()
+
+    @staticmethod
+    def _empty_events():
+        return pd.DataFrame({'Customer_ID': pd.Series(dtype=object), 'time': pd.Series(dtype='datetime64[ns]'),
+                             'value': pd.Series(dtype=float), 'seq': pd.Series(dtype=np.int64)})
+
+    def _load(self):
+        state_path = os.path.join(self.directory, _STATE_FILE)
+        if not os.path.exists(state_path):
+            return
+        with open(state_path) as file:
+            state = json.load(file)
+        if state['date_format'] != self.date_format:
+            return
+        self.sequence = state['sequence']
+        self.watermark = pd.Timestamp(state['watermark']) if state['watermark'] else None
+        events = pd.read_parquet(os.path.join(self.directory, _EVENTS_FILE))
+        for rule in self.rules:
+            if state['rules'].get(rule.rule_id) == rule.spec():
+                retained = events[events['rule_id'] == rule.rule_id].drop(columns='rule_id')
+                self._events[rule.rule_id] = retained.reset_index(drop=True)
+
+    def validate_frame(self, data, reference_time=None):
+        # One boolean violation mask per rule, the rule's window value ('<rule_id>_value', NaN for
+        # rows it does not judge) and the rows' risk_score, aligned with `data`
+        n = len(data)
+        reference_time = pd.Timestamp(reference_time if reference_time is not None else pd.Timestamp.now())
+        if 'Transaction_Date' in data and 'Customer_ID' in data:
+            times = pd.to_datetime(data['Transaction_Date'], format=self.date_format, errors='coerce').to_numpy()
+            customers = data['Customer_ID'].astype(str).to_numpy()
+            valid = ~pd.isna(times) & data['Customer_ID'].notna().to_numpy()
+        else:
+            times, customers, valid = None, None, np.zeros(n, dtype=bool)
+        seqs = self.sequence + np.arange(n, dtype=np.int64)
+        self.sequence += n
+        self.rows += n
+
+        results = pd.DataFrame(index=data.index)
+        risk_score = np.zeros(n, dtype=np.int64)
+        for rule in self.rules:
+            judged = valid & (_flag(data, rule.where) if rule.where else True)
+            if rule.aggregate == 'count':
+                values = np.ones(n)
+            elif rule.column in data:
+                values = pd.to_numeric(data[rule.column], errors='coerce').to_numpy(dtype=float)
+                judged &= ~np.isnan(values)
+            else:
+                judged = np.zeros(n, dtype=bool)
+            window_values = np.full(n, np.nan)
+            if judged.any():
+                new = pd.DataFrame({'Customer_ID': customers[judged], 'time': times[judged],
+                                    'value': values[judged], 'seq': seqs[judged]})
+                events = self._events[rule.rule_id]
+                window_values[judged] = window_aggregates(events, new, rule.aggregate, rule.window)
+                self._events[rule.rule_id] = pd.concat([events, new], ignore_index=True) if len(events) else new
+            violated = window_values > rule.threshold  # NaN compares False
+            results[rule.rule_id] = violated
+            results[f"{rule.rule_id}_value"] = window_values
+            risk_score += rule.risk_weight * violated
+
+        if valid.any():
+            current = times[valid][times[valid] <= reference_time.to_datetime64()]
+            if len(current):
+                latest = pd.Timestamp(current.max())
+                self.watermark = latest if self.watermark is None else max(self.watermark, latest)
+        self._prune()
+        results['risk_score'] = risk_score
+        return results
+
+    def _prune(self):
+        if self.watermark is None:
+            return
+        for rule in self.rules:
+            events = self._events[rule.rule_id]
+            retained = events['time'] > self.watermark - rule.window - self.lateness
+            if not retained.all():
+                self._events[rule.rule_id] = events[retained].reset_index(drop=True)
+
+    def frame_messages(self, data, results):
+        # (errors, remediation_actions, risk_score) per row of `data`, like the rule modules'
+        masks = results[self.rule_ids].to_numpy()
+        window_values = results[[f"{rule_id}_value" for rule_id in self.rule_ids]].to_numpy()
+        messages = []
+        for row_mask, row_values, risk_score in zip(masks, window_values, results['risk_score'].tolist()):
+            errors = []
+            remediation_actions = []
+            for rule, violated, value in zip(self.rules, row_mask, row_values):
+                if violated:
+                    errors.append(rule.error.format(**rule.params(value)))
+                    remediation_actions.append(rule.action.format(**rule.params(value)))
+            messages.append((errors, remediation_actions, risk_score))
+        return messages
+
+    def checkpoint(self):
+        # Write the retained events and settings to `directory`. The state file goes last: a crash
+        # part way leaves no checkpoint (the next run starts empty), never mismatched files
+        os.makedirs(self.directory, exist_ok=True)
+        events = pd.concat([events.assign(rule_id=rule_id) for rule_id, events in self._events.items()],
+                           ignore_index=True)
+        events.to_parquet(os.path.join(self.directory, f"{_EVENTS_FILE}.tmp"), index=False)
+        state = {
+            'rules': {rule.rule_id: rule.spec() for rule in self.rules},
+            'date_format': self.date_format,
+            'sequence': self.sequence,
+            'watermark': self.watermark.isoformat() if self.watermark is not None else None,
+        }
+        state_path = os.path.join(self.directory, _STATE_FILE)
+        with open(f"{state_path}.tmp", 'w') as file:
+            json.dump(state, file)
+        if os.path.exists(state_path):
+            os.remove(state_path)
+        os.replace(os.path.join(self.directory, f"{_EVENTS_FILE}.tmp"), os.path.join(self.directory, _EVENTS_FILE))
+        os.replace(f"{state_path}.tmp", state_path)
+
+    def stats(self):
+        return {'rows': self.rows, 'retained_events': sum(len(events) for events in self._events.values()),
+                'watermark': self.watermark.isoformat() if self.watermark is not None else None}
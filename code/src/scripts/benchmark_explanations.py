@@ -0,0 +1,139 @@
+import argparse
+import copy
+import json
+import time
+from datetime import datetime
+
+import numpy as np
+
+from benchmark_validation import REFERENCE_TIME, platform_info
+from explanation_backends import DEFAULT_MAX_NEW_TOKENS, CPUBackend, TransformersBackend
+from generated_validation_code import RULE_IDS, validate_frame, frame_messages
+from remediation_explainer import ExplanationService
+from synthetic_data import generate_transactions
+
+# Backends compared: the full-precision generate() path, and the CPU backend with and without int8
+BENCHMARK_BACKENDS = ('transformers', 'cpu', 'cpu-fp32')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compare explanation backends' latency and throughput on CPU.")
+    parser.add_argument('--backends', nargs='+', choices=BENCHMARK_BACKENDS, default=list(BENCHMARK_BACKENDS))
+    parser.add_argument('--model', default='gpt2')
+    parser.add_argument('--errors', type=int, default=32, help="Distinct error messages explained per backend")
+    parser.add_argument('--latency-samples', type=int, default=8, help="Errors explained one at a time for latency")
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--threads', type=int, default=None, help="Intra-op threads (default: torch's choice)")
+    parser.add_argument('--max-new-tokens', type=int, default=DEFAULT_MAX_NEW_TOKENS, help="For the CPU backends")
+    parser.add_argument('--max-length', type=int, default=100, help="For the transformers backend (prompt included)")
+    parser.add_argument('--random-weights', action='store_true',
+                        help="Use a randomly initialized GPT-2 of the same size and a byte-level tokenizer instead "
+                             "of downloading --model (timings only; the text is meaningless)")
+    parser.add_argument('--output', default='explanation_benchmark.json', help="Where to save the results as JSON")
+    return parser.parse_args(argv)
+
+
+def distinct_errors(count, seed=42):
+    # Up to `count` distinct error messages produced by the rules on synthetic transactions
+    data, historic_violations = generate_transactions(max(count * 50, 1000), seed, reference_time=REFERENCE_TIME)
+    results = validate_frame(data, historic_violations, reference_time=REFERENCE_TIME)
+    violated = results[RULE_IDS].any(axis=1).to_numpy()
+    errors = []
+    for row_errors, _, _ in frame_messages(data[violated], results[violated], historic_violations):
+        for error in row_errors:
+            if error not in errors:
+                errors.append(error)
+    return errors[:count]
+
+
+def random_weight_model():
+    # GPT-2 (124M) shaped model with random weights, and a byte-level tokenizer (one token per byte)
+    from tokenizers import pre_tokenizers
+    from transformers import GPT2Config, GPT2LMHeadModel, GPT2Tokenizer
+    vocab = {char: code for code, char in enumerate(sorted(pre_tokenizers.ByteLevel.alphabet()))}
+    vocab['<|endoftext|>'] = len(vocab)
+    tokenizer = GPT2Tokenizer(vocab=vocab, merges=[])
+    config = GPT2Config(vocab_size=len(vocab), bos_token_id=len(vocab) - 1, eos_token_id=len(vocab) - 1)
+    return GPT2LMHeadModel(config).eval(), tokenizer
+
+
+def make_benchmark_backend(name, args, loaded=None):
+    # Backend `name`, built from `loaded` (model, tokenizer) when given, else loaded by name
+    import model_loader
+    cpu_options = {'max_new_tokens': args.max_new_tokens, 'threads': args.threads}
+    if name == 'transformers':
+        if args.threads:
+            import torch
+            torch.set_num_threads(args.threads)
+        if loaded:
+            return TransformersBackend(*loaded, model_name=args.model, max_length=args.max_length)
+        return TransformersBackend(model_name=args.model, max_length=args.max_length,
+                                   loader=lambda: model_loader.load_model(args.model))
+    quantize = name == 'cpu'
+    if loaded:
+        model, tokenizer = loaded
+        model = model_loader.quantize_for_cpu(copy.deepcopy(model)) if quantize else model
+        return CPUBackend(model, tokenizer, model_name=args.model, quantize=quantize, **cpu_options)
+    return CPUBackend(model_name=args.model, quantize=quantize, **cpu_options)
+
+
+def benchmark_backend(backend, errors, latency_samples, batch_size):
+    # Model load time, per-error latency (one uncached error at a time) and batched throughput.
+    # Each measurement uses a fresh ExplanationService, so nothing is served from its cache.
+    started = time.perf_counter()
+    backend.load()
+    load_seconds = time.perf_counter() - started
+
+    ExplanationService(backend=backend).explain(errors[0])  # Warm-up (and prefix cache) outside the timings
+    latencies = []
+    service = ExplanationService(backend=backend)
+    for error in errors[:latency_samples]:
+        started = time.perf_counter()
+        service.explain(error)
+        latencies.append(time.perf_counter() - started)
+
+    service = ExplanationService(backend=backend, batch_size=batch_size)
+    tokens_before = backend.generated_tokens
+    started = time.perf_counter()
+    explanations = service.explain_many(errors)
+    batch_seconds = time.perf_counter() - started
+    new_tokens = backend.generated_tokens - tokens_before
+    return {
+        'generation_params': backend.generation_params(),
+        'load_seconds': round(load_seconds, 3),
+        'latency_p50_seconds': round(float(np.percentile(latencies, 50)), 4),
+        'latency_p95_seconds': round(float(np.percentile(latencies, 95)), 4),
+        'batched_seconds': round(batch_seconds, 3),
+        'errors_per_sec': round(len(errors) / batch_seconds, 2),
+        'new_tokens_per_sec': round(new_tokens / batch_seconds, 1),
+        'example': explanations[0],
+    }
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    errors = distinct_errors(args.errors)
+    loaded = random_weight_model() if args.random_weights else None
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'platform': platform_info(),
+        'model': 'random-weights' if args.random_weights else args.model,
+        'threads': args.threads,
+        'errors': len(errors),
+        'batch_size': args.batch_size,
+        'results': {},
+    }
+    for name in args.backends:
+        backend = make_benchmark_backend(name, args, loaded)
+        result = benchmark_backend(backend, errors, args.latency_samples, args.batch_size)
+        report['results'][name] = result
+        print(f"{name:<13} load {result['load_seconds']:>7.2f}s  p50 {result['latency_p50_seconds']:>7.3f}s  "
+              f"p95 {result['latency_p95_seconds']:>7.3f}s  {result['errors_per_sec']:>7.2f} errors/sec "
+              f"{result['new_tokens_per_sec']:>8.1f} tokens/sec batched")
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+    print(f"Saved results to '{args.output}'")
+
+
+if __name__ == "__main__":
+    main()
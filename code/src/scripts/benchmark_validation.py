@@ -0,0 +1,165 @@
+import argparse
+import json
+import os
+import platform
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from explanation_backends import StubBackend
+from generated_validation_code import RULE_IDS, validate_frame, frame_messages
+from remediation_explainer import ExplanationService
+from results_writer import open_results_writer
+from synthetic_data import DEFAULT_VIOLATION_RATES, generate_transactions
+
+DEFAULT_SIZES = (10_000,)
+BENCHMARK_CHUNK_ROWS = 1_000_000
+# Fixed so that the date rules flag the same rows on every run
+REFERENCE_TIME = pd.Timestamp('2025-01-01')
+STAGES = ('generate', 'validate', 'messages', 'explain', 'write_csv', 'write_parquet')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark validation, explanation and result writing on synthetic data.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                        help="Row counts to benchmark, e.g. --sizes 10000 1000000 10000000")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--chunk-rows', type=int, default=BENCHMARK_CHUNK_ROWS,
+                        help="Rows generated and validated at a time (bounds memory for large sizes)")
+    parser.add_argument('--rate', action='append', default=[], metavar='RULE=RATE',
+                        help="Override the violation rate of one rule, e.g. --rate stale_date=0.2")
+    parser.add_argument('--output', default='benchmark_baseline.json', help="Where to save the results as JSON")
+    parser.add_argument('--compare', default=None, help="Previous results JSON to compare against")
+    parser.add_argument('--max-slowdown', type=float, default=None,
+                        help="Exit with an error if any stage is this many times slower than in --compare")
+    return parser.parse_args(argv)
+
+
+def parse_rates(overrides):
+    rates = dict(DEFAULT_VIOLATION_RATES)
+    for override in overrides:
+        rule, _, rate = override.partition('=')
+        if rule not in rates:
+            raise ValueError(f"Unknown rule '{rule}' in --rate, expected one of {sorted(rates)}")
+        rates[rule] = float(rate)
+    return rates
+
+
+def platform_info():
+    return {
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'system': platform.system(),
+        'processor': platform.processor(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def benchmark_size(rows, seed=42, violation_rates=None, chunk_rows=BENCHMARK_CHUNK_ROWS):
+    # Seconds spent in each stage for `rows` synthetic transactions, processed chunk by chunk
+    seconds = dict.fromkeys(STAGES, 0.0)
+    violations = 0
+    # The stub backend returns the prompts unchanged, so this measures the explanation pipeline, not GPT-2
+    service = ExplanationService(backend=StubBackend())
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        writers = {
+            'write_csv': open_results_writer(os.path.join(output_dir, 'results.csv'), 'csv'),
+            'write_parquet': open_results_writer(os.path.join(output_dir, 'results.parquet'), 'parquet'),
+        }
+        customers = max(rows // 10, 1)
+        for start_row in range(0, rows, chunk_rows):
+            started = time.perf_counter()
+            data, historic_violations = generate_transactions(min(chunk_rows, rows - start_row), seed, violation_rates,
+                                                              REFERENCE_TIME, customers=customers, start_row=start_row)
+            seconds['generate'] += time.perf_counter() - started
+
+            started = time.perf_counter()
+            results = validate_frame(data, historic_violations, reference_time=REFERENCE_TIME)
+            seconds['validate'] += time.perf_counter() - started
+
+            started = time.perf_counter()
+            violated = results[RULE_IDS].any(axis=1).to_numpy()
+            messages = frame_messages(data[violated], results[violated], historic_violations)
+            seconds['messages'] += time.perf_counter() - started
+            violations += int(violated.sum())
+
+            started = time.perf_counter()
+            service.explain_many([error for errors, _, _ in messages for error in errors])
+            seconds['explain'] += time.perf_counter() - started
+
+            for stage, writer in writers.items():
+                started = time.perf_counter()
+                writer.write(data, results)
+                seconds[stage] += time.perf_counter() - started
+
+        for stage, writer in writers.items():
+            started = time.perf_counter()
+            writer.close()
+            seconds[stage] += time.perf_counter() - started
+
+    return {
+        'rows': rows,
+        'violating_rows': violations,
+        'stages': {stage: {'seconds': round(value, 4), 'rows_per_sec': round(rows / value, 1) if value else None}
+                   for stage, value in seconds.items()},
+    }
+
+
+def compare(current, previous):
+    # {size: {stage: current seconds / previous seconds}} for the sizes and stages both runs have
+    ratios = {}
+    for size, result in current['results'].items():
+        before = previous['results'].get(size)
+        if before is None:
+            continue
+        ratios[size] = {stage: round(timing['seconds'] / before['stages'][stage]['seconds'], 2)
+                        for stage, timing in result['stages'].items()
+                        if before['stages'].get(stage, {}).get('seconds')}
+    return ratios
+
+
+def print_results(report, ratios=None):
+    for size, result in report['results'].items():
+        print(f"{int(size):,} rows ({result['violating_rows']:,} violating):")
+        for stage, timing in result['stages'].items():
+            line = f"  {stage:<14} {timing['seconds']:>9.3f}s  {timing['rows_per_sec'] or 0:>14,.0f} rows/sec"
+            if ratios and stage in ratios.get(size, {}):
+                line += f"  x{ratios[size][stage]} vs baseline"
+            print(line)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    rates = parse_rates(args.rate)
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'platform': platform_info(),
+        'seed': args.seed,
+        'violation_rates': rates,
+        'results': {str(rows): benchmark_size(rows, args.seed, rates, args.chunk_rows) for rows in args.sizes},
+    }
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+
+    ratios = None
+    if args.compare:
+        with open(args.compare) as file:
+            ratios = compare(report, json.load(file))
+    print_results(report, ratios)
+    print(f"Saved results to '{args.output}'")
+
+    if ratios and args.max_slowdown:
+        slower = [f"{size} rows {stage} x{ratio}" for size, stages in ratios.items()
+                  for stage, ratio in stages.items() if ratio > args.max_slowdown]
+        if slower:
+            raise SystemExit("Slower than the baseline: " + ", ".join(slower))
+
+
+if __name__ == "__main__":
+    main()
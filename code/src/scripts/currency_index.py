@@ -0,0 +1,88 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# Precomputed ISO 4217 currency codes and ISO 3166 alpha-2 country codes. Loading this small JSON
+# file is much cheaper than loading the pycountry database; rebuild it with `python currency_index.py`
+# after upgrading pycountry.
+ISO_CODES_PATH = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'iso_codes.json'))
+
+_code_index = None
+
+
+def build_code_index():
+    # Read the code sets from pycountry (only needed to regenerate ISO_CODES_PATH)
+    import pycountry
+    return {
+        'currencies': frozenset(currency.alpha_3 for currency in pycountry.currencies),
+        'countries': frozenset(country.alpha_2 for country in pycountry.countries),
+    }
+
+
+def save_code_index(index, path=ISO_CODES_PATH):
+    with open(path, 'w') as file:
+        json.dump({name: sorted(codes) for name, codes in index.items()}, file, indent=1)
+
+
+def code_index():
+    # The frozen code sets, loaded once per process
+    global _code_index
+    if _code_index is None:
+        if os.path.exists(ISO_CODES_PATH):
+            with open(ISO_CODES_PATH) as file:
+                _code_index = {name: frozenset(codes) for name, codes in json.load(file).items()}
+        else:
+            _code_index = build_code_index()
+    return _code_index
+
+
+def set_code_index(index):
+    # Install an already loaded index, e.g. one handed to a worker process by its pool initializer
+    global _code_index
+    _code_index = index
+
+
+def currency_codes():
+    return code_index()['currencies']
+
+
+def country_codes():
+    return code_index()['countries']
+
+
+def is_valid_currency(currency_code):
+    # True if currency_code is an ISO 4217 alphabetic code
+    return isinstance(currency_code, str) and currency_code in currency_codes()
+
+
+def is_valid_country(country_code):
+    return isinstance(country_code, str) and country_code in country_codes()
+
+
+def valid_code_mask(column, codes):
+    # Vectorized membership test of a whole column against a code set. Categorical columns are
+    # checked once per category instead of once per row.
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        valid_categories = np.append(column.cat.categories.isin(codes), False)  # code -1 (missing) -> False
+        return valid_categories[column.cat.codes.to_numpy()]
+    return column.isin(codes).to_numpy()
+
+
+def valid_currency_mask(column):
+    return valid_code_mask(column, currency_codes())
+
+
+def valid_country_mask(column):
+    return valid_code_mask(column, country_codes())
+
+
+def cross_border_mask(column, home_country):
+    # Rows whose Country is a valid country code other than home_country
+    return valid_country_mask(column) & (column != home_country).to_numpy()
+
+
+if __name__ == "__main__":
+    save_code_index(build_code_index())
+    print(f"ISO code index saved to '{ISO_CODES_PATH}'")
@@ -0,0 +1,198 @@
+import copy
+import threading
+
+# Backends turn prompts into explanations for remediation_explainer.ExplanationService. A backend has
+# a model_name, generation_params() (the settings that change the generated text, part of the
+# explanation store's fingerprint), load(), generate(prompts, shared_prefix=''), which returns each
+# prompt followed by its generated continuation, and a running count of generated_tokens. Every
+# prompt starts with `shared_prefix`; backends may reuse work across it.
+DEFAULT_MAX_NEW_TOKENS = 40
+
+
+class TransformersBackend:
+    # The reference path: padded batches through the full-precision model's generate().
+    #
+    # Pass either a loaded model and tokenizer, or a loader callable returning (model, tokenizer),
+    # which is only called on the first generate().
+
+    def __init__(self, model=None, tokenizer=None, model_name='gpt2', max_length=100, loader=None):
+        if model is None and loader is None:
+            raise ValueError("TransformersBackend needs a model and tokenizer or a loader")
+        self.model = None
+        self.tokenizer = None
+        self.loader = loader
+        self.model_name = model_name
+        self.max_length = max_length
+        self.generated_tokens = 0
+        if model is not None:
+            self._use_model(model, tokenizer)
+
+    def _use_model(self, model, tokenizer):
+        # GPT-2 has no padding token; pad on the left so generation continues right after each prompt
+        if getattr(tokenizer, 'pad_token', None) is None:
+            tokenizer.pad_token = tokenizer.eos_token
+        tokenizer.padding_side = 'left'
+        self.model = model
+        self.tokenizer = tokenizer
+
+    def load(self):
+        if self.model is None:
+            self._use_model(*self.loader())
+
+    def generation_params(self):
+        return {'max_length': self.max_length, 'num_return_sequences': 1, 'do_sample': False}
+
+    def generate(self, prompts, shared_prefix=''):
+        # One padded generate() call for the whole batch
+        self.load()
+        inputs = self.tokenizer(prompts, return_tensors="pt", padding=True)
+        max_new_tokens = max(self.max_length - inputs['input_ids'].shape[1], 1)
+        outputs = self.model.generate(
+            input_ids=inputs['input_ids'],
+            attention_mask=inputs['attention_mask'],
+            max_new_tokens=max_new_tokens,
+            num_return_sequences=1,
+            pad_token_id=self.tokenizer.pad_token_id,
+        )
+        if hasattr(outputs, 'shape'):  # A (batch, tokens) tensor; padding after end-of-text is not counted
+            self.generated_tokens += int((outputs[:, inputs['input_ids'].shape[1]:] != self.tokenizer.pad_token_id).sum())
+        return self.tokenizer.batch_decode(outputs, skip_special_tokens=True)
+
+
+class CPUBackend:
+    # GPT-2 tuned for machines without a GPU:
+    # - int8 dynamic quantization of the linear layers (model_loader.quantize_for_cpu), unless
+    #   quantize=False;
+    # - the keys/values of the shared prompt prefix are computed once and reused by every batch, so
+    #   only each prompt's own tokens go through the model before decoding;
+    # - greedy decoding of at most max_new_tokens tokens, stopping each prompt at end-of-text;
+    # - `threads` intra-op threads (torch.set_num_threads, which applies to the whole process; None
+    #   keeps torch's default of one per physical core).
+    #
+    # With a model and tokenizer passed in, the model is used as is (quantize it yourself).
+
+    def __init__(self, model=None, tokenizer=None, model_name='gpt2', max_new_tokens=DEFAULT_MAX_NEW_TOKENS,
+                 threads=None, quantize=True, loader=None):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.model_name = model_name
+        self.max_new_tokens = max_new_tokens
+        self.threads = threads
+        self.quantize = quantize
+        if loader is None:
+            import model_loader
+            loader = lambda: model_loader.load_model(model_name, quantized=quantize)
+        self.loader = loader
+        self.generated_tokens = 0
+        self._prefix = None  # (prefix token IDs, their key/value cache)
+        self._lock = threading.Lock()
+
+    def load(self):
+        import torch
+        if self.threads:
+            torch.set_num_threads(self.threads)
+        if self.model is None:
+            self.model, self.tokenizer = self.loader()
+
+    def generation_params(self):
+        return {'max_new_tokens': self.max_new_tokens, 'num_return_sequences': 1, 'do_sample': False,
+                'quantization': 'int8' if self.quantize else None}
+
+    def _prefix_cache(self, prefix_ids, batch_size):
+        # Copy of the prefix's key/value cache for a batch (the model extends the cache it is given).
+        # The last prefix token is left out of the cache, so every prompt has at least one token to run.
+        cached_ids = prefix_ids[:-1]
+        if not cached_ids:
+            return cached_ids, None
+        if self._prefix is None or self._prefix[0] != cached_ids:
+            import torch
+            outputs = self.model(input_ids=torch.tensor([cached_ids]), use_cache=True)
+            self._prefix = (cached_ids, outputs.past_key_values)
+        past = copy.deepcopy(self._prefix[1])
+        if batch_size > 1:
+            past.batch_repeat_interleave(batch_size)
+        return cached_ids, past
+
+    def generate(self, prompts, shared_prefix=''):
+        import torch
+        with self._lock, torch.inference_mode():
+            self.load()
+            encoded = [self.tokenizer(prompt)['input_ids'] for prompt in prompts]
+            prefix_ids = self.tokenizer(shared_prefix.rstrip())['input_ids'] if shared_prefix.strip() else []
+            # Byte-pair merges can cross the end of the prefix; such batches are run without the cache
+            if prefix_ids and all(ids[:len(prefix_ids)] == prefix_ids for ids in encoded):
+                cached_ids, past = self._prefix_cache(prefix_ids, len(prompts))
+            else:
+                cached_ids, past = [], None
+            continuations = self._greedy_decode([ids[len(cached_ids):] for ids in encoded], len(cached_ids), past)
+            self.generated_tokens += sum(len(continuation) for continuation in continuations)
+            return [self.tokenizer.decode(ids + continuation, skip_special_tokens=True)
+                    for ids, continuation in zip(encoded, continuations)]
+
+    def _greedy_decode(self, suffixes, prefix_length, past):
+        # Left-pad the prompts' own tokens behind the cached prefix and decode them as one batch;
+        # padding is masked out and position IDs count only real tokens
+        import torch
+        eos_token_id = self.tokenizer.eos_token_id
+        width = max(len(ids) for ids in suffixes)
+        input_ids = torch.full((len(suffixes), width), eos_token_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(suffixes), prefix_length + width), dtype=torch.long)
+        attention_mask[:, :prefix_length] = 1
+        for row, ids in enumerate(suffixes):
+            input_ids[row, width - len(ids):] = torch.tensor(ids)
+            attention_mask[row, prefix_length + width - len(ids):] = 1
+        position_ids = (attention_mask.cumsum(-1) - 1).clamp(min=0)[:, prefix_length:]
+
+        continuations = [[] for _ in suffixes]
+        finished = torch.zeros(len(suffixes), dtype=torch.bool)
+        for _ in range(self.max_new_tokens):
+            outputs = self.model(input_ids=input_ids, attention_mask=attention_mask, position_ids=position_ids,
+                                 past_key_values=past, use_cache=True)
+            past = outputs.past_key_values
+            next_tokens = outputs.logits[:, -1].argmax(-1)
+            for row in torch.nonzero(~finished).flatten().tolist():
+                continuations[row].append(int(next_tokens[row]))
+            finished |= next_tokens == eos_token_id
+            if finished.all():
+                break
+            input_ids = next_tokens[:, None]
+            position_ids = position_ids[:, -1:] + 1
+            attention_mask = torch.cat([attention_mask, torch.ones((len(suffixes), 1), dtype=torch.long)], dim=1)
+        return continuations
+
+
+class StubBackend:
+    # Returns each prompt with a fixed suffix, without a model, and records the size of every batch;
+    # for tests and for benchmarking the explanation pipeline rather than the model
+    model_name = 'stub'
+    generated_tokens = 0
+
+    def __init__(self, suffix=' (stub explanation)'):
+        self.suffix = suffix
+        self.batches = []
+
+    def load(self):
+        pass
+
+    def generation_params(self):
+        return {'suffix': self.suffix}
+
+    def generate(self, prompts, shared_prefix=''):
+        self.batches.append(len(prompts))
+        return [f"{prompt}{self.suffix}" for prompt in prompts]
+
+
+BACKENDS = {'transformers': TransformersBackend, 'cpu': CPUBackend, 'stub': StubBackend}
+
+
+def make_backend(name, model_name='gpt2', **options):
+    # Backend by name: 'cpu' (quantized, for machines without a GPU), 'transformers' (full precision
+    # generate()) or 'stub'. `options` go to the backend's constructor.
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown explanation backend '{name}', expected one of {sorted(BACKENDS)}")
+    if name == 'stub':
+        return StubBackend(**options)
+    if name == 'transformers' and 'loader' not in options and 'model' not in options:
+        import model_loader
+        options['loader'] = lambda: model_loader.load_model(model_name)
+    return BACKENDS[name](model_name=model_name, **options)
@@ -0,0 +1,94 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+# SQLite limits the number of bound parameters per statement; look keys up in slices of this size
+_LOOKUP_BATCH = 500
+
+
+def explanation_fingerprint(model_name, generation_params, prompt_template, prompt_version=None):
+    # Identifies everything that shapes an explanation. Entries stored under another fingerprint
+    # (different model, generation settings or prompt) are never returned.
+    settings = {
+        'model': model_name,
+        'generation': generation_params,
+        'prompt': prompt_template,
+        'prompt_version': prompt_version,
+    }
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class ExplanationStore:
+    # Persistent explanation cache in an SQLite file, shared across runs and processes.
+    #
+    # The database runs in WAL mode, so any number of validator processes can read it while one of
+    # them writes. Lookups and inserts are batched, and hit/miss counters show how many model calls
+    # the store saved. Entries live in the table named by `table`, so a subclass caching other
+    # generated text (see extract_rules.RuleStore) never reads, overwrites or prunes explanations,
+    # even in the same file.
+
+    table = 'explanations'
+
+    def __init__(self, path, timeout=30.0):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            " fingerprint TEXT NOT NULL,"
+            " error_key TEXT NOT NULL,"
+            " explanation TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " PRIMARY KEY (fingerprint, error_key))"
+        )
+        self._connection.commit()
+
+    def get_many(self, fingerprint, error_keys):
+        # Stored explanations for the given normalized error texts, as {error_key: explanation}
+        error_keys = list(dict.fromkeys(error_keys))
+        found = {}
+        with self._lock:
+            for start in range(0, len(error_keys), _LOOKUP_BATCH):
+                batch = error_keys[start:start + _LOOKUP_BATCH]
+                placeholders = ', '.join('?' * len(batch))
+                rows = self._connection.execute(
+                    f"SELECT error_key, explanation FROM {self.table}"
+                    f" WHERE fingerprint = ? AND error_key IN ({placeholders})",
+                    [fingerprint, *batch],
+                )
+                found.update(rows)
+            self.hits += len(found)
+            self.misses += len(error_keys) - len(found)
+        return found
+
+    def put_many(self, fingerprint, explanations):
+        # Store {error_key: explanation}; concurrent writers of the same key simply agree
+        now = time.time()
+        with self._lock:
+            self._connection.executemany(
+                f"INSERT OR REPLACE INTO {self.table} (fingerprint, error_key, explanation, created_at)"
+                " VALUES (?, ?, ?, ?)",
+                [(fingerprint, error_key, explanation, now) for error_key, explanation in explanations.items()],
+            )
+            self._connection.commit()
+
+    def prune(self, keep_fingerprint):
+        # Drop entries made with any other model, generation settings or prompt
+        with self._lock:
+            deleted = self._connection.execute(
+                f"DELETE FROM {self.table} WHERE fingerprint != ?", (keep_fingerprint,)).rowcount
+            self._connection.commit()
+        return deleted
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
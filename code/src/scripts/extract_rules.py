@@ -1,47 +1,261 @@
+import argparse
+import hashlib
+import json
 import os
-from huggingface_hub import login
-from transformers import pipeline
+import re
+import threading
 
-# Function to authenticate with Hugging Face using an API token
-def authenticate_huggingface():
-    # Check if the token is available in environment variable
-    hf_token = "token"
+from explanation_store import ExplanationStore, explanation_fingerprint
+
+# Prompt for one section of an instruction document; the model continues the bullet list.
+# Bump PROMPT_VERSION whenever the template changes, so cached rules from the old prompt are not used.
+PROMPT_TEMPLATE = "Extract the data validation rules from these reporting instructions:\n{section}\nValidation rules:\n-"
+PROMPT_VERSION = 1
+# GPT-2 sees 1024 tokens: a section, the prompt around it and the generated rules must fit
+MAX_SECTION_TOKENS = 640
+MAX_NEW_TOKENS = 200
+# Besides at the token budget, a section ends after every paragraph whose content hash is divisible
+# by this. Boundaries then depend only on nearby text, so an edit changes the sections around it and
+# the split re-aligns at the next such paragraph instead of shifting every later section.
+SECTION_BOUNDARY_EVERY = 4
+
+# Text generation pipelines by model name, built once per process from model_loader's model
+_pipelines = {}
+_tokenizers = {}
+_lock = threading.Lock()
 
+
+def authenticate_huggingface():
+    # Log in with the HF_AUTH_TOKEN environment variable, if set (public models such as gpt2 need none)
+    hf_token = os.environ.get('HF_AUTH_TOKEN')
     if not hf_token:
-        raise ValueError("Hugging Face token is missing! Please set the 'HF_AUTH_TOKEN' environment variable.")
-
-    # Log in with the Hugging Face token
-    try:
-        login(token=hf_token)
-        print("Successfully authenticated with Hugging Face!")
-    except Exception as e:
-        print(f"Error authenticating with Hugging Face: {e}")
-        raise
-
-# Function to extract validation rules using the GPT-2 model
-def extract_validation_rules(instructions_text):
-    # Authenticate with Hugging Face before using the model
-    authenticate_huggingface()
-
-    # Load the GPT-2 model using Hugging Face's pipeline
-    model = pipeline('text-generation', model='gpt2')  # Use 'gpt2' or 'gpt3' for Hugging Face
-
-    # Generate rules based on the instructions
-    rules = model(instructions_text, max_length=200)
+        return False
+    from huggingface_hub import login
+    login(token=hf_token)
+    return True
+
+
+def load_pipeline(model_name='gpt2'):
+    with _lock:
+        if model_name not in _pipelines:
+            import model_loader
+            from transformers import pipeline
+            authenticate_huggingface()
+            model, tokenizer = model_loader.load_model(model_name)
+            # Batched prompts are padded on the left so every continuation starts right after its prompt
+            if tokenizer.pad_token is None:
+                tokenizer.pad_token = tokenizer.eos_token
+            tokenizer.padding_side = 'left'
+            _pipelines[model_name] = pipeline('text-generation', model=model, tokenizer=tokenizer)
+        return _pipelines[model_name]
+
+
+def load_tokenizer(model_name='gpt2'):
+    # Just the tokenizer, for splitting documents without loading the model
+    with _lock:
+        if model_name not in _tokenizers:
+            from transformers import AutoTokenizer
+            _tokenizers[model_name] = AutoTokenizer.from_pretrained(model_name)
+        return _tokenizers[model_name]
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _pack(units, count_tokens, max_tokens, separator):
+    # Join consecutive units into pieces of at most max_tokens tokens (a unit over the limit stays alone)
+    pieces, current, size = [], [], 0
+    for unit in units:
+        tokens = count_tokens(unit)
+        if current and size + tokens > max_tokens:
+            pieces.append(separator.join(current))
+            current, size = [], 0
+        current.append(unit)
+        size += tokens
+    if current:
+        pieces.append(separator.join(current))
+    return pieces
+
+
+def _paragraphs(text, count_tokens, max_tokens):
+    # Blank-line separated paragraphs; longer ones are cut between sentences, and sentences between words
+    for paragraph in re.split(r'\n\s*\n', text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if count_tokens(paragraph) <= max_tokens:
+            yield paragraph
+            continue
+        for sentence in _pack(re.split(r'(?<=[.;:])\s+', paragraph), count_tokens, max_tokens, ' '):
+            if count_tokens(sentence) <= max_tokens:
+                yield sentence
+            else:
+                yield from _pack(sentence.split(), count_tokens, max_tokens, ' ')
+
+
+def split_sections(text, count_tokens, max_tokens=MAX_SECTION_TOKENS, boundary_every=SECTION_BOUNDARY_EVERY):
+    # Sections of at most max_tokens tokens (by count_tokens) made of whole paragraphs where possible
+    sections, current, size = [], [], 0
+    for paragraph in _paragraphs(text, count_tokens, max_tokens):
+        tokens = count_tokens(paragraph)
+        if current and size + tokens > max_tokens:
+            sections.append('\n\n'.join(current))
+            current, size = [], 0
+        current.append(paragraph)
+        size += tokens
+        if int(content_hash(paragraph)[:8], 16) % boundary_every == 0:
+            sections.append('\n\n'.join(current))
+            current, size = [], 0
+    if current:
+        sections.append('\n\n'.join(current))
+    return sections
+
+
+def parse_rules(generated):
+    # Rules from a generated bullet list continuing the prompt's "-"; stops at the first non-bullet line
+    rules = []
+    for position, line in enumerate(('-' + generated).splitlines()):
+        match = re.match(r'\s*(?:[-*•]|\d+[.)])\s*(.+)', line)
+        if not match:
+            if position and not line.strip():
+                continue
+            break
+        rule = match.group(1).strip()
+        if rule and rule not in rules:
+            rules.append(rule)
     return rules
 
+
+class RuleStore(ExplanationStore):
+    # Cache of extracted rule specs (as JSON) per document and section hash, kept apart from the
+    # explanation cache in a table of its own
+    table = 'extracted_rules'
+
+
+class RuleExtractor:
+    # Extracts validation rules from instruction documents of any length.
+    #
+    # A document is split into token-bounded sections (split_sections), the sections are run through
+    # the model in batches of batch_size, and the rules parsed from each continuation. With a store
+    # (a RuleStore), both the whole document's rule spec and every section's
+    # rules are cached by content hash: an unchanged document is answered without splitting or
+    # loading the model, and a changed one only regenerates the sections whose text changed.
+    #
+    # `generate` (prompts -> continuations) and `tokenizer` default to the process-wide GPT-2
+    # pipeline and its tokenizer, both loaded on first use.
+
+    def __init__(self, model_name='gpt2', store=None, batch_size=8, max_section_tokens=MAX_SECTION_TOKENS,
+                 max_new_tokens=MAX_NEW_TOKENS, generate=None, tokenizer=None):
+        self.model_name = model_name
+        self.store = store
+        self.batch_size = batch_size
+        self.max_section_tokens = max_section_tokens
+        self.max_new_tokens = max_new_tokens
+        self._generate_batch = generate or self._generate_with_pipeline
+        self._tokenizer = tokenizer
+        generation_params = {'max_new_tokens': max_new_tokens, 'do_sample': False,
+                             'max_section_tokens': max_section_tokens, 'section_boundary_every': SECTION_BOUNDARY_EVERY}
+        self.fingerprint = explanation_fingerprint(model_name, generation_params, PROMPT_TEMPLATE, PROMPT_VERSION)
+        self.generated_sections = 0
+        self.cached_sections = 0
+
+    def count_tokens(self, text):
+        if self._tokenizer is None:
+            self._tokenizer = load_tokenizer(self.model_name)
+        return len(self._tokenizer(text)['input_ids'])
+
+    def _generate_with_pipeline(self, prompts):
+        outputs = load_pipeline(self.model_name)(prompts, batch_size=self.batch_size, max_new_tokens=self.max_new_tokens,
+                                                 do_sample=False, return_full_text=False)
+        return [output[0]['generated_text'] for output in outputs]
+
+    def extract(self, text):
+        # Rule spec of a document: its hash, its sections' hashes and rules, and all rules in order
+        document_key = f"document:{content_hash(text)}"
+        if self.store is not None:
+            stored = self.store.get_many(self.fingerprint, [document_key])
+            if document_key in stored:
+                return json.loads(stored[document_key])
+
+        sections = split_sections(text, self.count_tokens, self.max_section_tokens)
+        keys = [f"section:{content_hash(section)}" for section in sections]
+        rules = {}
+        if self.store is not None:
+            rules = {key: json.loads(value) for key, value in self.store.get_many(self.fingerprint, keys).items()}
+        missing = [key for key in dict.fromkeys(keys) if key not in rules]
+        self.cached_sections += len(set(keys)) - len(missing)
+        section_text = dict(zip(keys, sections))
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start:start + self.batch_size]
+            generated = self._generate_batch([PROMPT_TEMPLATE.format(section=section_text[key]) for key in batch])
+            rules.update((key, parse_rules(continuation)) for key, continuation in zip(batch, generated))
+            self.generated_sections += len(batch)
+            if self.store is not None:
+                self.store.put_many(self.fingerprint, {key: json.dumps(rules[key]) for key in batch})
+
+        spec = {
+            'document_hash': document_key.split(':', 1)[1],
+            'model': self.model_name,
+            'sections': [{'hash': key.split(':', 1)[1], 'rules': rules[key]} for key in keys],
+            'rules': list(dict.fromkeys(rule for key in keys for rule in rules[key])),
+        }
+        if self.store is not None:
+            self.store.put_many(self.fingerprint, {document_key: json.dumps(spec)})
+        return spec
+
+    def stats(self):
+        stats = {'generated_sections': self.generated_sections, 'cached_sections': self.cached_sections}
+        if self.store is not None:
+            stats['store'] = self.store.stats()
+        return stats
+
+
+def extract_validation_rules(instructions_text, model_name='gpt2', store=None):
+    return RuleExtractor(model_name, store=store).extract(instructions_text)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Extract validation rules from reporting instruction documents.")
+    parser.add_argument('inputs', nargs='*', help="Instruction text files (default: a built-in example)")
+    parser.add_argument('--cache', default='rule_extraction_cache.sqlite3',
+                        help="SQLite file caching rules per document and per section")
+    parser.add_argument('--model', default='gpt2')
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--output', default=None, help="Write the rule specs as JSON to this path")
+    return parser.parse_args(argv)
+
+
+EXAMPLE_INSTRUCTIONS = """
+The data should be validated for the following constraints:
+- Validate cross-border transaction limits (for simplicity, assuming a cross-border flag is set)
+- Validate Account Balance - should never be negative unless marked as overdraft (OD)
+- Check for cross-currency transactions (allow up to 1% deviation)
+- Validate that Transaction Amount matches the Reported Amount (with 1% deviation for cross-currency transactions).
+"""
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    store = RuleStore(args.cache)
+    extractor = RuleExtractor(args.model, store=store, batch_size=args.batch_size)
+    documents = {}
+    for input_path in args.inputs:
+        with open(input_path, encoding='utf-8') as file:
+            documents[input_path] = file.read()
+    if not documents:
+        documents['example'] = EXAMPLE_INSTRUCTIONS
+    specs = {name: extractor.extract(text) for name, text in documents.items()}
+    for name, spec in specs.items():
+        print(f"{name}: {len(spec['rules'])} rules from {len(spec['sections'])} sections")
+        for rule in spec['rules']:
+            print(f"  - {rule}")
+    print(json.dumps(extractor.stats()))
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(specs, file, indent=2)
+    store.close()
+
+
 if __name__ == "__main__":
-    # Example instructions for validation rules
-    instructions = """
-    The data should be validated for the following constraints:
-    - Validate cross-border transaction limits (for simplicity, assuming a cross-border flag is set)
-    - Validate Account Balance - should never be negative unless marked as overdraft (OD)
-    - Check for cross-currency transactions (allow up to 1% deviation)
-    - Validate that Transaction Amount matches the Reported Amount (with 1% deviation for cross-currency transactions).
-    """
-
-    # Extract validation rules
-    validation_rules = extract_validation_rules(instructions)
-
-    # Print the generated rules
-    print(validation_rules)
+    main()
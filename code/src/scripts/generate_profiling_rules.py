@@ -1,16 +1,211 @@
 # scripts/generate_profiling_rules.py
 
+import argparse
+import json
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 import pandas as pd
-from sklearn.preprocessing import LabelEncoder
 
-def generate_profiling_rules(data):
-    encoder = LabelEncoder()
-    data['Customer_ID_encoded'] = encoder.fit_transform(data['Customer_ID'])
-    # Example rule: Ensure 'Transaction_Amount' is numeric and within a valid range.
-    valid_amount_range = (0, 100)
-    return valid_amount_range
+from profiling_sketches import HyperLogLog, QuantileSketch, TopK
+from stream_validation import read_csv_chunks, DEFAULT_CHUNKSIZE
+
+PROFILE_QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+# Range rules accept values up to RANGE_FENCE interquartile ranges outside the quartiles
+# (Tukey's "far out" fences), so they flag outliers rather than the tails of the distribution
+RANGE_FENCE = 3.0
+
+
+class ColumnProfile:
+    # Streaming statistics for one column: row and null counts, min/max, approximate distinct count
+    # (HyperLogLog), frequent values (Misra-Gries) and, for numeric columns, approximate quantiles
+    # (KLL). update() takes one chunk of the column at a time; merge() combines two profiles of
+    # different rows of the same column.
+
+    def __init__(self, name, numeric):
+        self.name = name
+        self.numeric = numeric
+        self.rows = 0
+        self.nulls = 0
+        self.min = None
+        self.max = None
+        self.distinct = HyperLogLog()
+        self.top_values = TopK()
+        self.quantiles = QuantileSketch() if numeric else None
+
+    def update(self, values):
+        self.rows += len(values)
+        present = values.dropna()
+        self.nulls += len(values) - len(present)
+        if present.empty:
+            return
+        if isinstance(present.dtype, pd.CategoricalDtype):
+            # Unordered categoricals (see id_dictionary) have no min/max; use the chunk's distinct values
+            present_values = present.cat.categories.take(np.unique(present.cat.codes.to_numpy()))
+            self._update_range(present_values.min(), present_values.max())
+        else:
+            self._update_range(present.min(), present.max())
+        self.distinct.update(present)
+        self.top_values.update(present)
+        if self.numeric:
+            self.quantiles.update(present.to_numpy(dtype=np.float64))
+
+    def merge(self, other):
+        self.rows += other.rows
+        self.nulls += other.nulls
+        if other.min is not None:
+            self._update_range(other.min, other.max)
+        self.distinct.merge(other.distinct)
+        self.top_values.merge(other.top_values)
+        if self.numeric and other.numeric:
+            self.quantiles.merge(other.quantiles)
+
+    def _update_range(self, low, high):
+        low = low.item() if hasattr(low, 'item') else low
+        high = high.item() if hasattr(high, 'item') else high
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+
+    def quantile_values(self, fractions=PROFILE_QUANTILES):
+        return dict(zip(fractions, self.quantiles.quantiles(fractions).tolist())) if self.numeric else {}
+
+    def as_dict(self, top=10):
+        return {
+            'numeric': self.numeric,
+            'rows': self.rows,
+            'nulls': self.nulls,
+            'null_rate': self.nulls / self.rows if self.rows else 0.0,
+            'min': self.min,
+            'max': self.max,
+            'distinct': min(self.distinct.count(), self.rows - self.nulls),
+            'quantiles': {str(fraction): value for fraction, value in self.quantile_values().items()},
+            'top_values': self.top_values.top(top),
+        }
+
+
+class DatasetProfile:
+    # ColumnProfiles for every column seen in the chunks passed to update()
+
+    def __init__(self):
+        self.columns = {}
+
+    def update(self, chunk):
+        for name in chunk.columns:
+            values = chunk[name]
+            if name not in self.columns:
+                numeric = pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values)
+                self.columns[name] = ColumnProfile(name, numeric)
+            self.columns[name].update(values)
+        return self
+
+    def merge(self, other):
+        for name, column in other.columns.items():
+            if name in self.columns:
+                self.columns[name].merge(column)
+            else:
+                self.columns[name] = column
+        return self
+
+    @property
+    def rows(self):
+        return max((column.rows for column in self.columns.values()), default=0)
+
+    def as_dict(self):
+        return {'rows': self.rows, 'columns': {name: column.as_dict() for name, column in self.columns.items()}}
+
+    def range_rules(self, columns=None, fence=RANGE_FENCE, risk_weight=1):
+        # VALIDATION_RULES-style specs (see generate_validation_code) flagging values outside each
+        # numeric column's profiled range: quartiles widened by `fence` interquartile ranges
+        rules = []
+        for name, column in self.columns.items():
+            if not column.numeric or column.quantiles.count == 0 or (columns is not None and name not in columns):
+                continue
+            lower_quartile, upper_quartile = column.quantiles.quantiles([0.25, 0.75]).tolist()
+            spread = upper_quartile - lower_quartile
+            if spread == 0:
+                continue  # (Nearly) constant column: no range to derive
+            low = float(round(lower_quartile - fence * spread, 6))
+            high = float(round(upper_quartile + fence * spread, 6))
+            label = name.replace('_', ' ')
+            rules.append({
+                'id': f"{name.lower()}_out_of_range",
+                'column': name,
+                'requires': [name],
+                'predicate': f"(data[{name!r}].to_numpy() < {low!r}) | (data[{name!r}].to_numpy() > {high!r})",
+                'risk_weight': risk_weight,
+                'error': f"{label} is outside the profiled range {low!r} to {high!r}",
+                'remediation': f"Action: Verify the {label} against the source; it is far outside the values seen when profiling.",
+            })
+        return rules
+
+
+def profile_frame(data):
+    return DatasetProfile().update(data)
+
+
+def profile_csv(input_path, chunksize=DEFAULT_CHUNKSIZE, dtypes=None, workers=1):
+    # Profile a CSV in one streaming pass. With workers > 1, chunks are profiled by a process pool
+    # (at most two per worker in flight) and the partial profiles merged.
+    chunks = read_csv_chunks(input_path, chunksize, dtypes)
+    if workers <= 1:
+        profile = DatasetProfile()
+        for chunk in chunks:
+            profile.update(chunk)
+        return profile
+
+    profile = DatasetProfile()
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for chunk in chunks:
+            pending.append(executor.submit(profile_frame, chunk))
+            if len(pending) >= 2 * workers:
+                profile.merge(pending.popleft().result())
+        while pending:
+            profile.merge(pending.popleft().result())
+    return profile
+
+
+def generate_profiling_rules(data, id_dictionary=None):
+    # Range rules for the amount columns, derived from the data's profile. With an
+    # id_dictionary.DatasetDictionary the ID columns are profiled by integer code; `data` itself is
+    # never modified.
+    if id_dictionary is not None:
+        data = id_dictionary.encode_frame(data)
+    profile = profile_frame(data)
+    return profile.range_rules(columns=('Transaction_Amount', 'Reported_Amount', 'Account_Balance'))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Profile transaction CSVs and derive range rules from the profile.")
+    parser.add_argument('inputs', nargs='*', default=['../data/example_data.csv'], help="Input CSV paths")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--profile', default=None, help="Write the profile as JSON to this path")
+    parser.add_argument('--rules', default=None,
+                        help="Write a JSON rule spec (the standard rules plus the profiled range rules) to this "
+                             "path, for validate_cli.py --rules")
+    parser.add_argument('--columns', nargs='+', default=None, help="Numeric columns to derive range rules for (default: all)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    profile = DatasetProfile()
+    for input_path in args.inputs:
+        profile.merge(profile_csv(input_path, args.chunk_size, workers=args.workers))
+    if args.profile:
+        with open(args.profile, 'w') as file:
+            json.dump(profile.as_dict(), file, indent=2, default=str)
+    rules = profile.range_rules(args.columns)
+    if args.rules:
+        from generate_validation_code import VALIDATION_RULES
+        with open(args.rules, 'w') as file:
+            json.dump(VALIDATION_RULES + rules, file, indent=2)
+        print(f"Wrote {len(VALIDATION_RULES)} standard and {len(rules)} range rules to '{args.rules}'")
+    for rule in rules:
+        print(f"{rule['id']}: {rule['error']}")
+
 
 if __name__ == "__main__":
-    data = pd.read_csv('C://Users//jahna//IdeaProjects//DataProfiling//src//data//example_data.csv')
-    profiling_rules = generate_profiling_rules(data)
-    print(profiling_rules)
+    main()
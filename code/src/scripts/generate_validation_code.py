@@ -1,110 +1,471 @@
-from jinja2 import Template
-import pycountry
-from datetime import datetime, timedelta
-
-# Define the validation code template, including the new date validation conditions
-validation_code_template = """
-def validate_data(data, historic_violations={}, max_days_old=180):
-    errors = []
-    remediation_actions = []
-    risk_score = 0  # Start with a base risk score
-    
-    # Validate that Transaction Amount matches the Reported Amount (with 1% deviation for cross-currency transactions)
-    if 'Reported_Amount' not in data:
-        errors.append("Reported Amount is required")
-        remediation_actions.append("Action: Ensure 'Reported_Amount' is provided for comparison.")
-        risk_score += 2  # Increase risk score if Reported Amount is missing
-    else:
-        transaction_amount = data['Transaction_Amount']
-        reported_amount = data['Reported_Amount']
-        
-        # Check for cross-currency transactions (allow up to 1% deviation)
-        if 'is_cross_currency' in data and data['is_cross_currency']:
-            allowed_deviation = 0.01 * reported_amount
-            if abs(transaction_amount - reported_amount) > allowed_deviation:
-                errors.append(f"Transaction Amount deviates from Reported Amount by more than 1% (Allowed deviation: {allowed_deviation})")
-                remediation_actions.append(f"Action: Review the transaction for cross-currency discrepancy. Adjust the reported amount or validate cross-currency rates.")
-                risk_score += 3  # Increase risk score for high deviation in cross-currency transactions
-        else:
-            # For non cross-currency transactions, amounts must match exactly
-            if transaction_amount != reported_amount:
-                errors.append("Transaction Amount must match Reported Amount")
-                remediation_actions.append(f"Action: Ensure the transaction amount matches the reported amount.")
-                risk_score += 2  # Increase risk score for mismatch
-
-    # Validate Account Balance - should never be negative unless marked as overdraft (OD)
-    if 'Account_Balance' in data:
-        account_balance = data['Account_Balance']
-        if account_balance < 0 and ('Account_Flag' not in data or data['Account_Flag'] != 'OD'):
-            errors.append("Account Balance cannot be negative unless flagged as overdraft (OD)")
-            remediation_actions.append("Action: Investigate negative balance. If it's a valid overdraft, ensure 'Account_Flag' is set to 'OD'.")
-            risk_score += 4  # High risk for negative balance without OD flag
-
-    # Validate Transaction Date - should not be in the future
-    if 'Transaction_Date' not in data:
-        errors.append("Transaction Date is required")
-        remediation_actions.append("Action: Ensure 'Transaction_Date' is provided.")
-        risk_score += 2  # Increase risk score if Transaction Date is missing
-    else:
-        transaction_date = datetime.strptime(data['Transaction_Date'], '%Y-%m-%d')  # Assuming format 'YYYY-MM-DD'
-        
-        # Check if the transaction date is in the future
-        if transaction_date > datetime.now():
-            errors.append("Transaction Date cannot be in the future")
-            remediation_actions.append("Action: Review the transaction date and correct any future dates.")
-            risk_score += 3  # Increase risk score for future dates
-        
-        # Check if the transaction is older than max_days_old (180 days in this example)
-        if (datetime.now() - transaction_date).days > max_days_old:
-            errors.append(f"Transaction is older than {max_days_old} days, triggering validation alert")
-            remediation_actions.append(f"Action: Review the transaction for validity if older than {max_days_old} days.")
-            risk_score += 3  # Increase risk score for older transactions
-
-    # Validate Currency - should be a valid ISO 4217 code
-    if 'Currency' not in data or not is_valid_currency(data['Currency']):
-        errors.append("Currency should be a valid ISO 4217 currency code")
-        remediation_actions.append("Action: Ensure the currency code is valid and follows ISO 4217 standards.")
-        risk_score += 2  # Increase risk score for invalid currency
-
-    # Validate cross-border transaction limits (for simplicity, assuming a cross-border flag is set)
-    if 'is_cross_border' in data and data['is_cross_border']:
-        # Example limit check, assume the cross-border limit is $5000 for simplicity
-        if data['Transaction_Amount'] > 5000:
-            errors.append("Transaction exceeds cross-border transaction limits")
-            remediation_actions.append("Action: Cross-border transaction limit exceeded. Ensure the transaction adheres to regulatory limits or obtain necessary approval.")
-            risk_score += 5  # Cross-border limit violations increase risk
-
-    # Adjust the risk score based on the customer's historical violations
-    if data['Customer_ID'] in historic_violations:
-        historic_score = historic_violations[data['Customer_ID']]
-        errors.append(f"Customer has {historic_score} previous violations.")
-        remediation_actions.append(f"Action: Review the customer's history of violations. Consider manual review.")
-        risk_score += historic_score  # Add historic violations to the current risk score
-
-    # Return errors, remediation actions, and the final risk score
+import hashlib
+
+from jinja2 import Environment
+
+# Column expressions shared across rules. The generated kernel computes each one once per batch,
+# in this order (so an expression may use the ones listed above it), and only when the columns it
+# requires are present. Rules name the expressions they use instead of recomputing them.
+SHARED_EXPRESSIONS = [
+    {'name': 'transaction_amount', 'requires': ['Transaction_Amount'],
+     'expression': "data['Transaction_Amount'].to_numpy()"},
+    {'name': 'reported_amount', 'requires': ['Reported_Amount'],
+     'expression': "data['Reported_Amount'].to_numpy()"},
+    {'name': 'amount_difference', 'requires': ['Transaction_Amount', 'Reported_Amount'],
+     'expression': "np.abs(transaction_amount - reported_amount)"},
+    {'name': 'cross_currency', 'requires': [],
+     'expression': "_flag(data, 'is_cross_currency')"},
+    {'name': 'cross_border', 'requires': [],
+     'expression': "_flag(data, 'is_cross_border')"},
+    {'name': 'not_overdraft', 'requires': [],
+     'expression': "(data['Account_Flag'] != 'OD').to_numpy() if 'Account_Flag' in data else np.ones(n, dtype=bool)"},
+    {'name': 'transaction_date', 'requires': ['Transaction_Date'],
+     # Naive UTC, like reference_time: offsets in the dates are applied, naive dates are taken as UTC
+     'expression': "pd.to_datetime(data['Transaction_Date'], format=date_format, errors='coerce', utc=True)"
+                   ".dt.tz_localize(None)"},
+    {'name': 'date_unparseable', 'requires': ['Transaction_Date'],
+     'expression': "(transaction_date.isna() & data['Transaction_Date'].notna()).to_numpy()"},
+    {'name': 'transaction_age_days', 'requires': ['Transaction_Date'],
+     'expression': "(reference_time - transaction_date).dt.days.to_numpy()"},
+    {'name': 'currency_valid', 'requires': ['Currency'],
+     'expression': "valid_currency_mask(data['Currency'])"},
+    {'name': 'historic_score', 'requires': ['Customer_ID'],
+     'expression': "_historic_scores(data['Customer_ID'], historic_violations)"},
+    {'name': 'repeat_customer', 'requires': ['Customer_ID'],
+     'expression': "_repeat_customers(data['Customer_ID'], historic_violations, historic_score)"},
+]
+
+# Declarative validation rules, in the order their errors are reported. Each rule has:
+#   id            - stable rule identifier, also the name of its violation mask
+#   column        - the column the rule is about
+#   requires      - columns that must be present for the predicate to run
+#   when_missing  - mask value when a required column is absent (a "column is required" rule)
+#   predicate     - vectorized boolean expression over the shared expressions; {tolerance} and
+#                   {limit} are filled in from the rule itself. None means the rule only checks presence
+#   uses          - shared expressions the predicate and risk weight depend on
+#   risk_weight   - constant added to risk_score per violation, or the name of a shared expression
+#   error, remediation - message templates; {max_days_old}, {date_format} and any message_params are
+#                   filled in per row
+#   message_params - per-row values for the messages, as expressions over `row` (a dict of the row)
+VALIDATION_RULES = [
+    {
+        'id': 'reported_amount_missing',
+        'column': 'Reported_Amount',
+        'requires': ['Reported_Amount'],
+        'when_missing': True,
+        'predicate': None,
+        'risk_weight': 2,
+        'error': "Reported Amount is required",
+        'remediation': "Action: Ensure 'Reported_Amount' is provided for comparison.",
+    },
+    {
+        'id': 'cross_currency_deviation',
+        'column': 'Transaction_Amount',
+        'requires': ['Transaction_Amount', 'Reported_Amount'],
+        'uses': ['amount_difference', 'reported_amount', 'cross_currency'],
+        'predicate': "cross_currency & (amount_difference > {tolerance} * reported_amount)",
+        'tolerance': 0.01,
+        'risk_weight': 3,
+        'error': "Transaction Amount deviates from Reported Amount by more than 1% (Allowed deviation: {allowed_deviation})",
+        'remediation': "Action: Review the transaction for cross-currency discrepancy. Adjust the reported amount or validate cross-currency rates.",
+        'message_params': {'allowed_deviation': "{tolerance} * row['Reported_Amount']"},
+    },
+    {
+        'id': 'amount_mismatch',
+        'column': 'Transaction_Amount',
+        'requires': ['Transaction_Amount', 'Reported_Amount'],
+        'uses': ['transaction_amount', 'reported_amount', 'cross_currency'],
+        'predicate': "~cross_currency & (transaction_amount != reported_amount)",
+        'risk_weight': 2,
+        'error': "Transaction Amount must match Reported Amount",
+        'remediation': "Action: Ensure the transaction amount matches the reported amount.",
+    },
+    {
+        'id': 'negative_balance',
+        'column': 'Account_Balance',
+        'requires': ['Account_Balance'],
+        'uses': ['not_overdraft'],
+        'predicate': "(data['Account_Balance'].to_numpy() < 0) & not_overdraft",
+        'risk_weight': 4,
+        'error': "Account Balance cannot be negative unless flagged as overdraft (OD)",
+        'remediation': "Action: Investigate negative balance. If it's a valid overdraft, ensure 'Account_Flag' is set to 'OD'.",
+    },
+    {
+        'id': 'transaction_date_missing',
+        'column': 'Transaction_Date',
+        'requires': ['Transaction_Date'],
+        'when_missing': True,
+        'predicate': "data['Transaction_Date'].isna().to_numpy()",
+        'risk_weight': 2,
+        'error': "Transaction Date is required",
+        'remediation': "Action: Ensure 'Transaction_Date' is provided.",
+    },
+    {
+        'id': 'invalid_date',
+        'column': 'Transaction_Date',
+        'requires': ['Transaction_Date'],
+        'uses': ['date_unparseable'],
+        'predicate': "date_unparseable",
+        'risk_weight': 2,
+        'error': "Transaction Date is not a valid date in the format {date_format}",
+        'remediation': "Action: Correct the transaction date so it follows the {date_format} format.",
+    },
+    {
+        'id': 'future_date',
+        'column': 'Transaction_Date',
+        'requires': ['Transaction_Date'],
+        'uses': ['transaction_date'],
+        'predicate': "(transaction_date > reference_time).to_numpy()",
+        'risk_weight': 3,
+        'error': "Transaction Date cannot be in the future",
+        'remediation': "Action: Review the transaction date and correct any future dates.",
+    },
+    {
+        'id': 'stale_date',
+        'column': 'Transaction_Date',
+        'requires': ['Transaction_Date'],
+        'uses': ['transaction_age_days'],
+        'predicate': "transaction_age_days > max_days_old",
+        'risk_weight': 3,
+        'error': "Transaction is older than {max_days_old} days, triggering validation alert",
+        'remediation': "Action: Review the transaction for validity if older than {max_days_old} days.",
+    },
+    {
+        'id': 'invalid_currency',
+        'column': 'Currency',
+        'requires': ['Currency'],
+        'when_missing': True,
+        'uses': ['currency_valid'],
+        'predicate': "~currency_valid",
+        'risk_weight': 2,
+        'error': "Currency should be a valid ISO 4217 currency code",
+        'remediation': "Action: Ensure the currency code is valid and follows ISO 4217 standards.",
+    },
+    {
+        'id': 'cross_border_limit',
+        'column': 'Transaction_Amount',
+        'requires': ['Transaction_Amount'],
+        'uses': ['transaction_amount', 'cross_border'],
+        'predicate': "cross_border & (transaction_amount > {limit})",
+        'limit': 5000,
+        'risk_weight': 5,
+        'error': "Transaction exceeds cross-border transaction limits",
+        'remediation': "Action: Cross-border transaction limit exceeded. Ensure the transaction adheres to regulatory limits or obtain necessary approval.",
+    },
+    {
+        'id': 'historic_violations',
+        'column': 'Customer_ID',
+        'requires': ['Customer_ID'],
+        'uses': ['repeat_customer', 'historic_score'],
+        'predicate': "repeat_customer",
+        'risk_weight': 'historic_score',
+        'error': "Customer has {historic_score} previous violations.",
+        'remediation': "Action: Review the customer's history of violations. Consider manual review.",
+        'message_params': {'historic_score': "historic_violations[row['Customer_ID']]"},
+    },
+]
+
+# Define the validation code template: a vectorized kernel rendered from the rule spec above
+validation_code_template = """from datetime import datetime
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+from currency_index import is_valid_currency, valid_currency_mask
+
+# Rules in the order their errors are reported: (rule id, error, remediation action, risk weight)
+RULES = [
+{% for rule in rules %}
+    ({{ rule.id|pyrepr }}, {{ rule.error|pyrepr }},
+     {{ rule.remediation|pyrepr }}, {{ rule.weight_literal }}),
+{% endfor %}
+]
+RULE_IDS = [rule[0] for rule in RULES]
+# Hash of this module's source (with this line blank): changes whenever any rule or expression does
+RULE_SET_VERSION = {{ version|pyrepr }}
+
+# Per-row values substituted into the error and remediation messages
+_MESSAGE_PARAMS = {
+{% for rule in rules if rule.message_params %}
+    {{ rule.id|pyrepr }}: lambda row, historic_violations: {
+{% for name, expression in rule.message_params.items() %}
+        {{ name|pyrepr }}: {{ expression }},
+{% endfor %}
+    },
+{% endfor %}
+}
+
+
+DEFAULT_DATE_FORMAT = '%Y-%m-%d'
+
+
+def validate_data(data, historic_violations=None, max_days_old=180, reference_time=None, date_format=DEFAULT_DATE_FORMAT,
+                  metrics=None):
+    # Validate a single record (a dict of column -> value) by running the batch kernel over it
+    frame = pd.DataFrame([data])
+    results = validate_frame(frame, historic_violations, max_days_old, reference_time, date_format, metrics)
+    errors, remediation_actions, risk_score = frame_messages(frame, results, historic_violations, max_days_old, date_format)[0]
     return errors, remediation_actions, risk_score
 
 
-def is_valid_currency(currency_code):
-    try:
-        # Check if the currency code exists in the ISO 4217 list using pycountry
-        pycountry.currencies.get(alpha_3=currency_code)
-        return True
-    except:
-        return False
+def validate_frame(data, historic_violations=None, max_days_old=180, reference_time=None, date_format=DEFAULT_DATE_FORMAT,
+                   metrics=None):
+    # Vectorized rule kernel: every rule runs as one column operation over the whole DataFrame.
+    # Returns a DataFrame aligned with `data` holding one boolean violation mask per rule
+    # (see RULE_IDS) and the per-row risk_score.
+    #
+    # Future and stale dates are judged against reference_time (default: now). Pass the same value to
+    # every batch of a run, so a run crossing midnight sees one "today" and re-runs are reproducible.
+    # Dates that do not match date_format are reported by the invalid_date rule instead of raising.
+    #
+    # metrics (an instrumentation.ValidationMetrics) receives the time, rows evaluated, rows violated
+    # and risk contributed of every rule; with the default None the kernel only pays one check per rule.
+    if historic_violations is None:
+        historic_violations = {}
+    if reference_time is None:
+        reference_time = datetime.now()
+    reference_time = pd.Timestamp(reference_time)
+    if reference_time.tzinfo is not None:
+        # Dates are compared as naive UTC; a naive reference time is taken as UTC already
+        reference_time = reference_time.tz_convert('UTC').tz_localize(None)
+    n = len(data)
+    masks = {}
+    risk_score = np.zeros(n, dtype=np.int64)
+    if metrics is not None:
+        started = perf_counter()
+
+    # Shared subexpressions, computed once and reused by every rule below
+{% for group in shared %}
+{% if group.guard %}
+    if {{ group.guard }}:
+{% for expression in group.expressions %}
+        {{ expression.name }} = {{ expression.expression }}
+{% endfor %}
+{% else %}
+{% for expression in group.expressions %}
+    {{ expression.name }} = {{ expression.expression }}
+{% endfor %}
+{% endif %}
+{% endfor %}
+    if metrics is not None:
+        metrics.record_shared(perf_counter() - started)
+{% for rule in rules %}
+
+    # {{ rule.id }}: {{ rule.column }}
+    if metrics is not None:
+        started = perf_counter()
+{% if not rule.predicate %}
+    masks[{{ rule.id|pyrepr }}] = np.full(n, {{ rule.missing_check }})
+{% elif rule.guard %}
+    if {{ rule.guard }}:
+        masks[{{ rule.id|pyrepr }}] = {{ rule.predicate }}
+{% if rule.weight_expression %}
+        contribution = np.where(masks[{{ rule.id|pyrepr }}], {{ rule.weight_expression }}, 0)
+{% endif %}
+    else:
+        masks[{{ rule.id|pyrepr }}] = np.full(n, {{ rule.when_missing }})
+{% if rule.weight_expression %}
+        contribution = 0
+{% endif %}
+{% else %}
+    masks[{{ rule.id|pyrepr }}] = {{ rule.predicate }}
+{% if rule.weight_expression %}
+    contribution = np.where(masks[{{ rule.id|pyrepr }}], {{ rule.weight_expression }}, 0)
+{% endif %}
+{% endif %}
+{% if not rule.weight_expression %}
+    contribution = {{ rule.risk_weight }} * masks[{{ rule.id|pyrepr }}]
+{% endif %}
+    risk_score = risk_score + contribution
+    if metrics is not None:
+        metrics.record_rule({{ rule.id|pyrepr }}, perf_counter() - started, n, masks[{{ rule.id|pyrepr }}], contribution)
+{% endfor %}
+
+    results = pd.DataFrame(masks, index=data.index)
+    results['risk_score'] = risk_score
+    return results
+
+
+def frame_messages(data, results, historic_violations=None, max_days_old=180, date_format=DEFAULT_DATE_FORMAT):
+    # Expand validate_frame results into (errors, remediation_actions, risk_score) tuples, one per
+    # row of `data`. Only violated rules are formatted, so clean rows cost almost nothing.
+    if historic_violations is None:
+        historic_violations = {}
+    masks = results[RULE_IDS].to_numpy()
+    risk_scores = results['risk_score'].tolist()
+    # Only rows breaking a rule with per-row message values are turned into dicts
+    with_params = masks[:, [rule_id in _MESSAGE_PARAMS for rule_id in RULE_IDS]].any(axis=1)
+    records = dict(zip(np.flatnonzero(with_params).tolist(), data[with_params].to_dict('records')))
+    if hasattr(historic_violations, 'get_many') and 'Customer_ID' in data:
+        # A store answers the per-row lookups from one bulk query for these rows' customers
+        historic_violations = _historic_counts(data['Customer_ID'][with_params], historic_violations)
+
+    messages = []
+    for position, (row_mask, risk_score) in enumerate(zip(masks, risk_scores)):
+        errors = []
+        remediation_actions = []
+        for (rule_id, error, action, _), violated in zip(RULES, row_mask):
+            if not violated:
+                continue
+            params = {'max_days_old': max_days_old, 'date_format': date_format}
+            if rule_id in _MESSAGE_PARAMS:
+                params.update(_MESSAGE_PARAMS[rule_id](records[position], historic_violations))
+            errors.append(error.format(**params))
+            remediation_actions.append(action.format(**params))
+        messages.append((errors, remediation_actions, risk_score))
+    return messages
+
+
+def _flag(data, column):
+    # Element-wise bool(value) of an optional flag column; absent flags are False
+    if column not in data:
+        return np.zeros(len(data), dtype=bool)
+    values = data[column]
+    if values.dtype == bool:
+        return values.to_numpy()
+    if pd.api.types.is_numeric_dtype(values):
+        numbers = values.to_numpy(dtype=float)
+        return (numbers != 0) | np.isnan(numbers)
+    return values.map(bool).to_numpy(dtype=bool)
+
+
+def _historic_counts(customer_ids, store):
+    # {customer_id: violations} for the distinct IDs of a column, 0 for those without history
+    customer_ids = pd.unique(customer_ids.to_numpy())
+    found = store.get_many(customer_ids)
+    return {customer_id: found.get(str(customer_id), 0) for customer_id in customer_ids}
+
+
+def _historic_scores(customer_ids, historic_violations):
+    # Previous-violation count per row (0 for customers without history), as int64 like every other
+    # risk weight. historic_violations is a dict or a store with a bulk lookup(), e.g.
+    # historic_store.HistoricViolationsStore.
+    if hasattr(historic_violations, 'lookup'):
+        return historic_violations.lookup(customer_ids)
+    if not historic_violations:
+        return np.zeros(len(customer_ids), dtype=np.int64)
+    positions, _, score_by_position = _historic_tables(customer_ids, historic_violations)
+    return score_by_position[positions]
+
+
+def _repeat_customers(customer_ids, historic_violations, historic_score):
+    # True for rows whose customer has previous violations (a store only holds customers that have some)
+    if hasattr(historic_violations, 'lookup'):
+        return historic_score > 0
+    if not historic_violations:
+        return np.zeros(len(customer_ids), dtype=bool)
+    positions, repeat_by_position, _ = _historic_tables(customer_ids, historic_violations)
+    return repeat_by_position[positions]
+
+
+def _historic_tables(customer_ids, historic_violations):
+    # Each row's position among the chunk's distinct customers, and (repeat customer, score) per
+    # distinct customer. Only the chunk's own customers are looked up in the dict, so the cost
+    # follows the chunk rather than the history or the ID dictionary (see id_dictionary), and
+    # nothing is cached, so changes to historic_violations are always seen.
+    if isinstance(customer_ids.dtype, pd.CategoricalDtype):
+        positions, used_codes = pd.factorize(customer_ids.cat.codes.to_numpy())
+        used = customer_ids.cat.categories.take(np.maximum(used_codes, 0))
+        found_scores = [historic_violations.get(customer_id) if code >= 0 else None
+                        for code, customer_id in zip(used_codes, used)]
+    else:
+        positions, used = pd.factorize(customer_ids.to_numpy(), use_na_sentinel=False)
+        found_scores = [historic_violations.get(customer_id) for customer_id in used]
+    repeat_by_position = np.array([score is not None for score in found_scores], dtype=bool)
+    scores = np.asarray([score for score in found_scores if score is not None])
+    counts = scores.astype(np.int64)
+    if not np.array_equal(counts, scores):
+        raise ValueError("Historic violation counts must be whole numbers, got "
+                         f"{scores[counts != scores][:3].tolist()}")
+    score_by_position = np.zeros(len(found_scores), dtype=np.int64)
+    score_by_position[repeat_by_position] = counts
+    return positions, repeat_by_position, score_by_position
 """
 
+
+def _guard(columns):
+    return ' and '.join(f"{column!r} in data" for column in columns)
+
+
+# Resolve the rule spec into the values the template needs, checking it is consistent
+def compile_rules(rules=None, shared_expressions=None):
+    rules = VALIDATION_RULES if rules is None else rules
+    shared_expressions = SHARED_EXPRESSIONS if shared_expressions is None else shared_expressions
+    expressions = {expression['name']: expression for expression in shared_expressions}
+
+    used = set()
+    compiled = []
+    for rule in rules:
+        requires = list(rule.get('requires', []))
+        uses = list(rule.get('uses', []))
+        weight = rule['risk_weight']
+        weight_expression = weight if isinstance(weight, str) else None
+        if weight_expression and weight_expression not in uses:
+            uses.append(weight_expression)
+        for name in uses:
+            if name not in expressions:
+                raise ValueError(f"Rule '{rule['id']}' uses unknown shared expression '{name}'")
+            missing = set(expressions[name]['requires']) - set(requires)
+            if missing:
+                raise ValueError(f"Rule '{rule['id']}' uses '{name}' but does not require {sorted(missing)}")
+            used.add(name)
+        if weight_expression and rule.get('when_missing'):
+            raise ValueError(f"Rule '{rule['id']}' cannot fire on a missing column with a per-row risk weight")
+        if not rule.get('predicate') and not (requires and rule.get('when_missing')):
+            raise ValueError(f"Rule '{rule['id']}' needs a predicate or required columns with when_missing")
+
+        params = {key: rule[key] for key in ('tolerance', 'limit') if key in rule}
+        compiled.append({
+            'id': rule['id'],
+            'column': rule['column'],
+            'guard': _guard(requires),
+            'missing_check': ' or '.join(f"{column!r} not in data" for column in requires),
+            'when_missing': bool(rule.get('when_missing', False)),
+            'predicate': rule['predicate'].format(**params) if rule.get('predicate') else None,
+            'risk_weight': weight,
+            'weight_expression': weight_expression,
+            'weight_literal': 0 if weight_expression else weight,
+            'error': rule['error'],
+            'remediation': rule['remediation'],
+            'message_params': {name: expression.format(**params)
+                               for name, expression in rule.get('message_params', {}).items()},
+        })
+
+    # Pull in the expressions the used ones depend on, keeping the declared order
+    for expression in reversed(shared_expressions):
+        if expression['name'] in used:
+            used.update(name for name in expressions if name in expression['expression'])
+    # Consecutive expressions with the same required columns share one presence check
+    shared = []
+    for expression in shared_expressions:
+        if expression['name'] not in used:
+            continue
+        guard = _guard(expression['requires'])
+        if not shared or shared[-1]['guard'] != guard:
+            shared.append({'guard': guard, 'expressions': []})
+        shared[-1]['expressions'].append(expression)
+    return compiled, shared
+
+
+# Render the validation module source for a rule spec
+def render_validation_code(rules=None, shared_expressions=None):
+    compiled, shared = compile_rules(rules, shared_expressions)
+    environment = Environment(trim_blocks=True, lstrip_blocks=True)
+    environment.filters['pyrepr'] = repr
+    template = environment.from_string(validation_code_template)
+    version = hashlib.sha256(template.render(rules=compiled, shared=shared, version='').encode('utf-8')).hexdigest()
+    return template.render(rules=compiled, shared=shared, version=version[:16])
+
+
 # Function to generate the validation code
-def generate_code():
+def generate_code(rules=None, output_path='generated_validation_code.py'):
     # Generate validation code based on the template
-    template = Template(validation_code_template)
-    validation_code = template.render()
+    validation_code = render_validation_code(rules)
 
     # Write the generated validation code to a Python file
-    with open('generated_validation_code.py', 'w') as file:
+    with open(output_path, 'w') as file:
         file.write(validation_code)
 
-    print("Validation code has been generated and saved to 'generated_validation_code.py'")
+    print(f"Validation code has been generated and saved to '{output_path}'")
 
 # Main function to generate the validation code
 if __name__ == "__main__":
@@ -1,93 +1,336 @@
 from datetime import datetime
+from time import perf_counter
 
-import pycountry
+import numpy as np
+import pandas as pd
+from currency_index import is_valid_currency, valid_currency_mask
 
+# Rules in the order their errors are reported: (rule id, error, remediation action, risk weight)
+RULES = [
+    ('reported_amount_missing', 'Reported Amount is required',
+     "Action: Ensure 'Reported_Amount' is provided for comparison.", 2),
+    ('cross_currency_deviation', 'Transaction Amount deviates from Reported Amount by more than 1% (Allowed deviation: {allowed_deviation})',
+     'Action: Review the transaction for cross-currency discrepancy. Adjust the reported amount or validate cross-currency rates.', 3),
+    ('amount_mismatch', 'Transaction Amount must match Reported Amount',
+     'Action: Ensure the transaction amount matches the reported amount.', 2),
+    ('negative_balance', 'Account Balance cannot be negative unless flagged as overdraft (OD)',
+     "Action: Investigate negative balance. If it's a valid overdraft, ensure 'Account_Flag' is set to 'OD'.", 4),
+    ('transaction_date_missing', 'Transaction Date is required',
+     "Action: Ensure 'Transaction_Date' is provided.", 2),
+    ('invalid_date', 'Transaction Date is not a valid date in the format {date_format}',
+     'Action: Correct the transaction date so it follows the {date_format} format.', 2),
+    ('future_date', 'Transaction Date cannot be in the future',
+     'Action: Review the transaction date and correct any future dates.', 3),
+    ('stale_date', 'Transaction is older than {max_days_old} days, triggering validation alert',
+     'Action: Review the transaction for validity if older than {max_days_old} days.', 3),
+    ('invalid_currency', 'Currency should be a valid ISO 4217 currency code',
+     'Action: Ensure the currency code is valid and follows ISO 4217 standards.', 2),
+    ('cross_border_limit', 'Transaction exceeds cross-border transaction limits',
+     'Action: Cross-border transaction limit exceeded. Ensure the transaction adheres to regulatory limits or obtain necessary approval.', 5),
+    ('historic_violations', 'Customer has {historic_score} previous violations.',
+     "Action: Review the customer's history of violations. Consider manual review.", 0),
+]
+RULE_IDS = [rule[0] for rule in RULES]
+# Hash of this module's source (with this line blank): changes whenever any rule or expression does
+RULE_SET_VERSION = 'dedbf998fed77c00'
 
-def validate_data(data, historic_violations={}, max_days_old=180):
-    errors = []
-    remediation_actions = []
-    risk_score = 0  # Start with a base risk score
-    
-    # Validate that Transaction Amount matches the Reported Amount (with 1% deviation for cross-currency transactions)
-    if 'Reported_Amount' not in data:
-        errors.append("Reported Amount is required")
-        remediation_actions.append("Action: Ensure 'Reported_Amount' is provided for comparison.")
-        risk_score += 2  # Increase risk score if Reported Amount is missing
+# Per-row values substituted into the error and remediation messages
+_MESSAGE_PARAMS = {
+    'cross_currency_deviation': lambda row, historic_violations: {
+        'allowed_deviation': 0.01 * row['Reported_Amount'],
+    },
+    'historic_violations': lambda row, historic_violations: {
+        'historic_score': historic_violations[row['Customer_ID']],
+    },
+}
+
+
+DEFAULT_DATE_FORMAT = '%Y-%m-%d'
+
+
+def validate_data(data, historic_violations=None, max_days_old=180, reference_time=None, date_format=DEFAULT_DATE_FORMAT,
+                  metrics=None):
+    # Validate a single record (a dict of column -> value) by running the batch kernel over it
+    frame = pd.DataFrame([data])
+    results = validate_frame(frame, historic_violations, max_days_old, reference_time, date_format, metrics)
+    errors, remediation_actions, risk_score = frame_messages(frame, results, historic_violations, max_days_old, date_format)[0]
+    return errors, remediation_actions, risk_score
+
+
+def validate_frame(data, historic_violations=None, max_days_old=180, reference_time=None, date_format=DEFAULT_DATE_FORMAT,
+                   metrics=None):
+    # Vectorized rule kernel: every rule runs as one column operation over the whole DataFrame.
+    # Returns a DataFrame aligned with `data` holding one boolean violation mask per rule
+    # (see RULE_IDS) and the per-row risk_score.
+    #
+    # Future and stale dates are judged against reference_time (default: now). Pass the same value to
+    # every batch of a run, so a run crossing midnight sees one "today" and re-runs are reproducible.
+    # Dates that do not match date_format are reported by the invalid_date rule instead of raising.
+    #
+    # metrics (an instrumentation.ValidationMetrics) receives the time, rows evaluated, rows violated
+    # and risk contributed of every rule; with the default None the kernel only pays one check per rule.
+    if historic_violations is None:
+        historic_violations = {}
+    if reference_time is None:
+        reference_time = datetime.now()
+    reference_time = pd.Timestamp(reference_time)
+    if reference_time.tzinfo is not None:
+        # Dates are compared as naive UTC; a naive reference time is taken as UTC already
+        reference_time = reference_time.tz_convert('UTC').tz_localize(None)
+    n = len(data)
+    masks = {}
+    risk_score = np.zeros(n, dtype=np.int64)
+    if metrics is not None:
+        started = perf_counter()
+
+    # Shared subexpressions, computed once and reused by every rule below
+    if 'Transaction_Amount' in data:
+        transaction_amount = data['Transaction_Amount'].to_numpy()
+    if 'Reported_Amount' in data:
+        reported_amount = data['Reported_Amount'].to_numpy()
+    if 'Transaction_Amount' in data and 'Reported_Amount' in data:
+        amount_difference = np.abs(transaction_amount - reported_amount)
+    cross_currency = _flag(data, 'is_cross_currency')
+    cross_border = _flag(data, 'is_cross_border')
+    not_overdraft = (data['Account_Flag'] != 'OD').to_numpy() if 'Account_Flag' in data else np.ones(n, dtype=bool)
+    if 'Transaction_Date' in data:
+        transaction_date = pd.to_datetime(data['Transaction_Date'], format=date_format, errors='coerce', utc=True).dt.tz_localize(None)
+        date_unparseable = (transaction_date.isna() & data['Transaction_Date'].notna()).to_numpy()
+        transaction_age_days = (reference_time - transaction_date).dt.days.to_numpy()
+    if 'Currency' in data:
+        currency_valid = valid_currency_mask(data['Currency'])
+    if 'Customer_ID' in data:
+        historic_score = _historic_scores(data['Customer_ID'], historic_violations)
+        repeat_customer = _repeat_customers(data['Customer_ID'], historic_violations, historic_score)
+    if metrics is not None:
+        metrics.record_shared(perf_counter() - started)
+
+    # reported_amount_missing: Reported_Amount
+    if metrics is not None:
+        started = perf_counter()
+    masks['reported_amount_missing'] = np.full(n, 'Reported_Amount' not in data)
+    contribution = 2 * masks['reported_amount_missing']
+    risk_score = risk_score + contribution
+    if metrics is not None:
+        metrics.record_rule('reported_amount_missing', perf_counter() - started, n, masks['reported_amount_missing'], contribution)
+
+    # cross_currency_deviation: Transaction_Amount
+    if metrics is not None:
+        started = perf_counter()
+    if 'Transaction_Amount' in data and 'Reported_Amount' in data:
+        masks['cross_currency_deviation'] = cross_currency & (amount_difference > 0.01 * reported_amount)
     else:
-        transaction_amount = data['Transaction_Amount']
-        reported_amount = data['Reported_Amount']
-        
-        # Check for cross-currency transactions (allow up to 1% deviation)
-        if 'is_cross_currency' in data and data['is_cross_currency']:
-            allowed_deviation = 0.01 * reported_amount
-            if abs(transaction_amount - reported_amount) > allowed_deviation:
-                errors.append(f"Transaction Amount deviates from Reported Amount by more than 1% (Allowed deviation: {allowed_deviation})")
-                remediation_actions.append(f"Action: Review the transaction for cross-currency discrepancy. Adjust the reported amount or validate cross-currency rates.")
-                risk_score += 3  # Increase risk score for high deviation in cross-currency transactions
-        else:
-            # For non cross-currency transactions, amounts must match exactly
-            if transaction_amount != reported_amount:
-                errors.append("Transaction Amount must match Reported Amount")
-                remediation_actions.append(f"Action: Ensure the transaction amount matches the reported amount.")
-                risk_score += 2  # Increase risk score for mismatch
-
-    # Validate Account Balance - should never be negative unless marked as overdraft (OD)
+        masks['cross_currency_deviation'] = np.full(n, False)
+    contribution = 3 * masks['cross_currency_deviation']
+    risk_score = risk_score + contribution
+    if metrics is not None:
+        metrics.record_rule('cross_currency_deviation', perf_counter() - started, n, masks['cross_currency_deviation'], contribution)
+
+    # amount_mismatch: Transaction_Amount
+    if metrics is not None:
+        started = perf_counter()
+    if 'Transaction_Amount' in data and 'Reported_Amount' in data:
+        masks['amount_mismatch'] = ~cross_currency & (transaction_amount != reported_amount)
+    else:
+        masks['amount_mismatch'] = np.full(n, False)
+    contribution = 2 * masks['amount_mismatch']
+    risk_score = risk_score + contribution
+    if metrics is not None:
+        metrics.record_rule('amount_mismatch', perf_counter() - started, n, masks['amount_mismatch'], contribution)
+
+    # negative_balance: Account_Balance
+    if metrics is not None:
+        started = perf_counter()
     if 'Account_Balance' in data:
-        account_balance = data['Account_Balance']
-        if account_balance < 0 and ('Account_Flag' not in data or data['Account_Flag'] != 'OD'):
-            errors.append("Account Balance cannot be negative unless flagged as overdraft (OD)")
-            remediation_actions.append("Action: Investigate negative balance. If it's a valid overdraft, ensure 'Account_Flag' is set to 'OD'.")
-            risk_score += 4  # High risk for negative balance without OD flag
-
-    # Validate Transaction Date - should not be in the future
-    if 'Transaction_Date' not in data:
-        errors.append("Transaction Date is required")
-        remediation_actions.append("Action: Ensure 'Transaction_Date' is provided.")
-        risk_score += 2  # Increase risk score if Transaction Date is missing
+        masks['negative_balance'] = (data['Account_Balance'].to_numpy() < 0) & not_overdraft
     else:
-        transaction_date = datetime.strptime(data['Transaction_Date'], '%Y-%m-%d')  # Assuming format 'YYYY-MM-DD'
-        
-        # Check if the transaction date is in the future
-        if transaction_date > datetime.now():
-            errors.append("Transaction Date cannot be in the future")
-            remediation_actions.append("Action: Review the transaction date and correct any future dates.")
-            risk_score += 3  # Increase risk score for future dates
-        
-        # Check if the transaction is older than max_days_old (180 days in this example)
-        if (datetime.now() - transaction_date).days > max_days_old:
-            errors.append(f"Transaction is older than {max_days_old} days, triggering validation alert")
-            remediation_actions.append(f"Action: Review the transaction for validity if older than {max_days_old} days.")
-            risk_score += 3  # Increase risk score for older transactions
-
-    # Validate Currency - should be a valid ISO 4217 code
-    if 'Currency' not in data or not is_valid_currency(data['Currency']):
-        errors.append("Currency should be a valid ISO 4217 currency code")
-        remediation_actions.append("Action: Ensure the currency code is valid and follows ISO 4217 standards.")
-        risk_score += 2  # Increase risk score for invalid currency
-
-    # Validate cross-border transaction limits (for simplicity, assuming a cross-border flag is set)
-    if 'is_cross_border' in data and data['is_cross_border']:
-        # Example limit check, assume the cross-border limit is $5000 for simplicity
-        if data['Transaction_Amount'] > 5000:
-            errors.append("Transaction exceeds cross-border transaction limits")
-            remediation_actions.append("Action: Cross-border transaction limit exceeded. Ensure the transaction adheres to regulatory limits or obtain necessary approval.")
-            risk_score += 5  # Cross-border limit violations increase risk
-
-    # Adjust the risk score based on the customer's historical violations
-    if data['Customer_ID'] in historic_violations:
-        historic_score = historic_violations[data['Customer_ID']]
-        errors.append(f"Customer has {historic_score} previous violations.")
-        remediation_actions.append(f"Action: Review the customer's history of violations. Consider manual review.")
-        risk_score += historic_score  # Add historic violations to the current risk score
-
-    # Return errors, remediation actions, and the final risk score
-    return errors, remediation_actions, risk_score
+        masks['negative_balance'] = np.full(n, False)
+    contribution = 4 * masks['negative_balance']
+    risk_score = risk_score + contribution
+    if metrics is not None:
+        metrics.record_rule('negative_balance', perf_counter() - started, n, masks['negative_balance'], contribution)
+
+    # transaction_date_missing: Transaction_Date
+    if metrics is not None:
+        started = perf_counter()
+    if 'Transaction_Date' in data:
+        masks['transaction_date_missing'] = data['Transaction_Date'].isna().to_numpy()
+    else:
+        masks['transaction_date_missing'] = np.full(n, True)
+    contribution = 2 * masks['transaction_date_missing']
+    risk_score = risk_score + contribution
+    if metrics is not None:
+        metrics.record_rule('transaction_date_missing', perf_counter() - started, n, masks['transaction_date_missing'], contribution)
 
+    # invalid_date: Transaction_Date
+    if metrics is not None:
+        started = perf_counter()
+    if 'Transaction_Date' in data:
+        masks['invalid_date'] = date_unparseable
+    else:
+        masks['invalid_date'] = np.full(n, False)
+    contribution = 2 * masks['invalid_date']
+    risk_score = risk_score + contribution
+    if metrics is not None:
+        metrics.record_rule('invalid_date', perf_counter() - started, n, masks['invalid_date'], contribution)
+
+    # future_date: Transaction_Date
+    if metrics is not None:
+        started = perf_counter()
+    if 'Transaction_Date' in data:
+        masks['future_date'] = (transaction_date > reference_time).to_numpy()
+    else:
+        masks['future_date'] = np.full(n, False)
+    contribution = 3 * masks['future_date']
+    risk_score = risk_score + contribution
+    if metrics is not None:
+        metrics.record_rule('future_date', perf_counter() - started, n, masks['future_date'], contribution)
+
+    # stale_date: Transaction_Date
+    if metrics is not None:
+        started = perf_counter()
+    if 'Transaction_Date' in data:
+        masks['stale_date'] = transaction_age_days > max_days_old
+    else:
+        masks['stale_date'] = np.full(n, False)
+    contribution = 3 * masks['stale_date']
+    risk_score = risk_score + contribution
+    if metrics is not None:
+        metrics.record_rule('stale_date', perf_counter() - started, n, masks['stale_date'], contribution)
 
-def is_valid_currency(currency_code):
-    try:
-        # Check if the currency code exists in the ISO 4217 list using pycountry
-        pycountry.currencies.get(alpha_3=currency_code)
-        return True
-    except:
-        return False
\ No newline at end of file
+    # invalid_currency: Currency
+    if metrics is not None:
+        started = perf_counter()
+    if 'Currency' in data:
+        masks['invalid_currency'] = ~currency_valid
+    else:
+        masks['invalid_currency'] = np.full(n, True)
+    contribution = 2 * masks['invalid_currency']
+    risk_score = risk_score + contribution
+    if metrics is not None:
+        metrics.record_rule('invalid_currency', perf_counter() - started, n, masks['invalid_currency'], contribution)
+
+    # cross_border_limit: Transaction_Amount
+    if metrics is not None:
+        started = perf_counter()
+    if 'Transaction_Amount' in data:
+        masks['cross_border_limit'] = cross_border & (transaction_amount > 5000)
+    else:
+        masks['cross_border_limit'] = np.full(n, False)
+    contribution = 5 * masks['cross_border_limit']
+    risk_score = risk_score + contribution
+    if metrics is not None:
+        metrics.record_rule('cross_border_limit', perf_counter() - started, n, masks['cross_border_limit'], contribution)
+
+    # historic_violations: Customer_ID
+    if metrics is not None:
+        started = perf_counter()
+    if 'Customer_ID' in data:
+        masks['historic_violations'] = repeat_customer
+        contribution = np.where(masks['historic_violations'], historic_score, 0)
+    else:
+        masks['historic_violations'] = np.full(n, False)
+        contribution = 0
+    risk_score = risk_score + contribution
+    if metrics is not None:
+        metrics.record_rule('historic_violations', perf_counter() - started, n, masks['historic_violations'], contribution)
+
+    results = pd.DataFrame(masks, index=data.index)
+    results['risk_score'] = risk_score
+    return results
+
+
+def frame_messages(data, results, historic_violations=None, max_days_old=180, date_format=DEFAULT_DATE_FORMAT):
+    # Expand validate_frame results into (errors, remediation_actions, risk_score) tuples, one per
+    # row of `data`. Only violated rules are formatted, so clean rows cost almost nothing.
+    if historic_violations is None:
+        historic_violations = {}
+    masks = results[RULE_IDS].to_numpy()
+    risk_scores = results['risk_score'].tolist()
+    # Only rows breaking a rule with per-row message values are turned into dicts
+    with_params = masks[:, [rule_id in _MESSAGE_PARAMS for rule_id in RULE_IDS]].any(axis=1)
+    records = dict(zip(np.flatnonzero(with_params).tolist(), data[with_params].to_dict('records')))
+    if hasattr(historic_violations, 'get_many') and 'Customer_ID' in data:
+        # A store answers the per-row lookups from one bulk query for these rows' customers
+        historic_violations = _historic_counts(data['Customer_ID'][with_params], historic_violations)
+
+    messages = []
+    for position, (row_mask, risk_score) in enumerate(zip(masks, risk_scores)):
+        errors = []
+        remediation_actions = []
+        for (rule_id, error, action, _), violated in zip(RULES, row_mask):
+            if not violated:
+                continue
+            params = {'max_days_old': max_days_old, 'date_format': date_format}
+            if rule_id in _MESSAGE_PARAMS:
+                params.update(_MESSAGE_PARAMS[rule_id](records[position], historic_violations))
+            errors.append(error.format(**params))
+            remediation_actions.append(action.format(**params))
+        messages.append((errors, remediation_actions, risk_score))
+    return messages
+
+
+def _flag(data, column):
+    # Element-wise bool(value) of an optional flag column; absent flags are False
+    if column not in data:
+        return np.zeros(len(data), dtype=bool)
+    values = data[column]
+    if values.dtype == bool:
+        return values.to_numpy()
+    if pd.api.types.is_numeric_dtype(values):
+        numbers = values.to_numpy(dtype=float)
+        return (numbers != 0) | np.isnan(numbers)
+    return values.map(bool).to_numpy(dtype=bool)
+
+
+def _historic_counts(customer_ids, store):
+    # {customer_id: violations} for the distinct IDs of a column, 0 for those without history
+    customer_ids = pd.unique(customer_ids.to_numpy())
+    found = store.get_many(customer_ids)
+    return {customer_id: found.get(str(customer_id), 0) for customer_id in customer_ids}
+
+
+def _historic_scores(customer_ids, historic_violations):
+    # Previous-violation count per row (0 for customers without history), as int64 like every other
+    # risk weight. historic_violations is a dict or a store with a bulk lookup(), e.g.
+    # historic_store.HistoricViolationsStore.
+    if hasattr(historic_violations, 'lookup'):
+        return historic_violations.lookup(customer_ids)
+    if not historic_violations:
+        return np.zeros(len(customer_ids), dtype=np.int64)
+    positions, _, score_by_position = _historic_tables(customer_ids, historic_violations)
+    return score_by_position[positions]
+
+
+def _repeat_customers(customer_ids, historic_violations, historic_score):
+    # True for rows whose customer has previous violations (a store only holds customers that have some)
+    if hasattr(historic_violations, 'lookup'):
+        return historic_score > 0
+    if not historic_violations:
+        return np.zeros(len(customer_ids), dtype=bool)
+    positions, repeat_by_position, _ = _historic_tables(customer_ids, historic_violations)
+    return repeat_by_position[positions]
+
+
+def _historic_tables(customer_ids, historic_violations):
+    # Each row's position among the chunk's distinct customers, and (repeat customer, score) per
+    # distinct customer. Only the chunk's own customers are looked up in the dict, so the cost
+    # follows the chunk rather than the history or the ID dictionary (see id_dictionary), and
+    # nothing is cached, so changes to historic_violations are always seen.
+    if isinstance(customer_ids.dtype, pd.CategoricalDtype):
+        positions, used_codes = pd.factorize(customer_ids.cat.codes.to_numpy())
+        used = customer_ids.cat.categories.take(np.maximum(used_codes, 0))
+        found_scores = [historic_violations.get(customer_id) if code >= 0 else None
+                        for code, customer_id in zip(used_codes, used)]
+    else:
+        positions, used = pd.factorize(customer_ids.to_numpy(), use_na_sentinel=False)
+        found_scores = [historic_violations.get(customer_id) for customer_id in used]
+    repeat_by_position = np.array([score is not None for score in found_scores], dtype=bool)
+    scores = np.asarray([score for score in found_scores if score is not None])
+    counts = scores.astype(np.int64)
+    if not np.array_equal(counts, scores):
+        raise ValueError("Historic violation counts must be whole numbers, got "
+                         f"{scores[counts != scores][:3].tolist()}")
+    score_by_position = np.zeros(len(found_scores), dtype=np.int64)
+    score_by_position[repeat_by_position] = counts
+    return positions, repeat_by_position, score_by_position
\ No newline at end of file
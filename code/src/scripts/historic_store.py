@@ -0,0 +1,145 @@
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+# Keys per SELECT ... IN (...) statement (below SQLite's historic limit of 999 bound parameters)
+_LOOKUP_BATCH = 900
+
+
+class HistoricViolationsStore:
+    # Previous-violation counts per Customer_ID in an indexed SQLite file, for histories far too
+    # large for a dict. Pass it wherever a historic_violations dict is accepted (validate_frame,
+    # validate_csv_stream, validate_csv_parallel); the kernel calls lookup() once per chunk.
+    #
+    # Only the distinct customers of a chunk are looked up, and nothing else is held in memory, so
+    # memory does not grow with the number of customers in the store. This run's violations are
+    # staged with record() and added to the counts by commit_run() at the end of the run, so every
+    # chunk of a run sees the same history. Instances can be pickled to worker processes, which
+    # reopen the file (WAL mode lets them read while the main process writes).
+
+    def __init__(self, path, timeout=30.0):
+        self.path = path
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._connection = self._connect()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS historic_violations ("
+            " customer_id TEXT PRIMARY KEY,"
+            " violations INTEGER NOT NULL,"
+            " updated_at REAL NOT NULL) WITHOUT ROWID"
+        )
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS pending_violations ("
+            " customer_id TEXT PRIMARY KEY,"
+            " violations INTEGER NOT NULL) WITHOUT ROWID"
+        )
+        connection.commit()
+        return connection
+
+    def __getstate__(self):
+        return {'path': self.path, 'timeout': self.timeout}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'], state['timeout'])
+
+    def get_many(self, customer_ids):
+        # {customer_id: violations} for the given IDs that have a history
+        customer_ids = [str(customer_id) for customer_id in customer_ids]
+        found = {}
+        with self._lock:
+            for start in range(0, len(customer_ids), _LOOKUP_BATCH):
+                batch = customer_ids[start:start + _LOOKUP_BATCH]
+                placeholders = ', '.join('?' * len(batch))
+                found.update(self._connection.execute(
+                    f"SELECT customer_id, violations FROM historic_violations WHERE customer_id IN ({placeholders})",
+                    batch,
+                ))
+        return found
+
+    def lookup(self, customer_ids):
+        # Violation count per row of a Customer_ID Series (0 without history), as an int64 array.
+        # Each distinct ID is looked up once; dictionary-encoded (categorical) columns are factorized
+        # by code.
+        codes, uniques = pd.factorize(customer_ids)
+        found = self.get_many(uniques)
+        counts = np.array([found.get(str(customer_id), 0) for customer_id in uniques] + [0], dtype=np.int64)
+        return counts[codes]  # Missing IDs have code -1 -> the trailing 0
+
+    def __getitem__(self, customer_id):
+        return self.get_many([customer_id]).get(str(customer_id), 0)
+
+    def __contains__(self, customer_id):
+        return str(customer_id) in self.get_many([customer_id])
+
+    def update(self, violations):
+        # Add {customer_id: violations} (or a Series) to the stored counts right away
+        now = time.time()
+        with self._lock:
+            self._connection.executemany(
+                "INSERT INTO historic_violations (customer_id, violations, updated_at) VALUES (?, ?, ?)"
+                " ON CONFLICT (customer_id) DO UPDATE SET"
+                " violations = violations + excluded.violations, updated_at = excluded.updated_at",
+                [(str(customer_id), int(count), now) for customer_id, count in violations.items()],
+            )
+            self._connection.commit()
+
+    def record(self, violations):
+        # Stage this run's {customer_id: violations}; lookups ignore them until commit_run()
+        with self._lock:
+            self._connection.executemany(
+                "INSERT INTO pending_violations (customer_id, violations) VALUES (?, ?)"
+                " ON CONFLICT (customer_id) DO UPDATE SET violations = violations + excluded.violations",
+                [(str(customer_id), int(count)) for customer_id, count in violations.items()],
+            )
+            self._connection.commit()
+
+    def commit_run(self):
+        # Add the staged violations to the stored counts in one transaction; returns how many
+        # customers were updated
+        with self._lock:
+            self._connection.execute(
+                "INSERT INTO historic_violations (customer_id, violations, updated_at)"
+                " SELECT customer_id, violations, ? FROM pending_violations WHERE true"
+                " ON CONFLICT (customer_id) DO UPDATE SET"
+                " violations = violations + excluded.violations, updated_at = excluded.updated_at",
+                (time.time(),),
+            )
+            committed = self._connection.execute("DELETE FROM pending_violations").rowcount
+            self._connection.commit()
+        return committed
+
+    def discard_run(self):
+        # Drop the staged violations of a run that did not finish
+        with self._lock:
+            self._connection.execute("DELETE FROM pending_violations")
+            self._connection.commit()
+
+    def stats(self):
+        with self._lock:
+            customers, violations = self._connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(violations), 0) FROM historic_violations").fetchone()
+            pending = self._connection.execute("SELECT COUNT(*) FROM pending_violations").fetchone()[0]
+        return {'customers': customers, 'violations': violations, 'pending_customers': pending}
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+def run_violations(data, results, rule_ids, exclude=('historic_violations',)):
+    # Violating rows per customer in one validated chunk, as a Series to record(). Rows that only
+    # broke rules in `exclude` do not count, so a customer's history alone never adds to it.
+    rule_ids = [rule_id for rule_id in rule_ids if rule_id not in exclude]
+    violated = results[rule_ids].any(axis=1).to_numpy()
+    if 'Customer_ID' not in data or not violated.any():
+        return pd.Series(dtype=np.int64)
+    customer_ids = data['Customer_ID'][violated]
+    return customer_ids.astype(str).value_counts(sort=False)
@@ -1,22 +1,57 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox
 from tkinter import ttk  # Import ttk for Treeview widget
+from paged_table import PagedResultTable
 import pandas as pd
-from generated_validation_code import validate_data  # Import validate_data function
-from transformers import GPT2LMHeadModel, GPT2Tokenizer
+from generated_validation_code import validate_frame, frame_messages, RULE_IDS  # Batch validation over the whole DataFrame
 import threading  # To run GPT-2 generation in a separate thread
+import queue
+import time
+import os
+import model_loader
+from instrumentation import ValidationMetrics, timed_stage
+from remediation_explainer import ExplanationService
+from explanation_backends import make_backend
+from explanation_store import ExplanationStore
+from historic_store import HistoricViolationsStore, run_violations
+from staged_pipeline import Stage, StagedPipeline
 
-# Load GPT-2 model and tokenizer
-model = GPT2LMHeadModel.from_pretrained("gpt2")
-tokenizer = GPT2Tokenizer.from_pretrained("gpt2")
+# GPT-2 is loaded on demand (and warmed up in the background once the UI is shown), not at import time
+MODEL_NAME = "gpt2"
+
+# EXPLANATION_BACKEND picks the generator: 'cpu' (int8 GPT-2 with a cached prompt prefix, the default)
+# or 'transformers' (full-precision generate()); EXPLANATION_THREADS sets its intra-op threads
+EXPLANATION_BACKEND = os.environ.get('EXPLANATION_BACKEND', 'cpu')
+EXPLANATION_THREADS = int(os.environ['EXPLANATION_THREADS']) if os.environ.get('EXPLANATION_THREADS') else None
+QUANTIZED_MODEL = EXPLANATION_BACKEND == 'cpu'
+
+# SQLite files of the explanation cache and of the previous violations per customer; they are
+# opened by create_ui(), so importing this module creates no files
+EXPLANATION_CACHE_FILE = os.environ.get('EXPLANATION_CACHE_FILE', 'explanation_cache.sqlite3')
+HISTORIC_VIOLATIONS_FILE = os.environ.get('HISTORIC_VIOLATIONS_FILE', 'historic_violations.sqlite3')
+explanation_store = None
+explanation_service = None
+historic_violations = None
+
+# Set VALIDATION_METRICS_FILE to record per-rule and per-stage metrics, written in the Prometheus text
+# format after every run; without it nothing is measured
+METRICS_FILE = os.environ.get('VALIDATION_METRICS_FILE')
+validation_metrics = ValidationMetrics() if METRICS_FILE else None
+
+def open_stores():
+    global explanation_store, explanation_service, historic_violations
+    # Explanations are cached per error template, generated in batches and kept on disk across runs
+    explanation_store = ExplanationStore(EXPLANATION_CACHE_FILE)
+    explanation_service = ExplanationService(
+        store=explanation_store,
+        backend=make_backend(EXPLANATION_BACKEND, MODEL_NAME,
+                             **({'threads': EXPLANATION_THREADS} if QUANTIZED_MODEL else {})))
+    # Previous violations per customer, looked up per run and updated with each run's violations
+    historic_violations = HistoricViolationsStore(HISTORIC_VIOLATIONS_FILE)
 
 # Function to generate remediation explanation using GPT-2
 def generate_remediation_explanation(error_message):
-    input_text = f"Explain why the following error might have occurred in a financial transaction: {error_message}"
-    inputs = tokenizer.encode(input_text, return_tensors="pt")
-    outputs = model.generate(inputs, max_length=100, num_return_sequences=1)
-    explanation = tokenizer.decode(outputs[0], skip_special_tokens=True)
-    return explanation
+    return explanation_service.explain(error_message)
 
 # Function to load the CSV file
 def load_csv():
@@ -24,7 +59,8 @@ def load_csv():
     if file_path:
         try:
             # Load CSV file into DataFrame
-            data = pd.read_csv(file_path)
+            with timed_stage(validation_metrics, 'read'):
+                data = pd.read_csv(file_path)
             global csv_data  # Store CSV data in a global variable for further processing
             csv_data = data
             # Display message to indicate the file has been successfully loaded
@@ -32,59 +68,157 @@ def load_csv():
         except Exception as e:
             messagebox.showerror("Error", f"An error occurred while loading the file: {e}")
 
+# Worker-to-UI messages. Tk widgets may only be touched from the main thread, so the validation
+# thread never updates the table itself: it queues batches of rows that poll_results() renders.
+result_queue = queue.Queue()
+RESULT_BATCH_SIZE = 500  # Rows per queued batch
+POLL_INTERVAL_MS = 100
+current_run = 0  # Incremented per submission so stale batches from an earlier run are ignored
+# Rows are validated, explained and published in chunks of this size by concurrent stages, with at
+# most PIPELINE_QUEUE_SIZE chunks waiting between two stages
+PIPELINE_CHUNK_ROWS = 5000
+PIPELINE_QUEUE_SIZE = 4
+current_pipeline = None
+# The thread of the running validation. Runs stage their violations in the history store's one
+# pending buffer until commit_run()/discard_run(), so only one run may be active at a time.
+validation_thread = None
+
 # Function to validate the CSV data and display results in the table
 def submit_validation():
     if 'csv_data' not in globals():
         messagebox.showwarning("Warning", "Please upload a CSV file first!")
         return
+    global validation_thread
+    if validation_thread is not None and validation_thread.is_alive():
+        messagebox.showwarning("Warning", "A validation is still running, please wait for it to finish.")
+        return
 
-    # Clear the existing table (if any)
-    for row in treeview.get_children():
-        treeview.delete(row)
+    global current_run
+    current_run += 1
+    run = current_run
+    data = csv_data  # Uploading another file while this run is active does not change its rows
+    submit_button.config(state='disabled')
 
-    # Sample historic violations data (for demo purposes)
-    historic_violations = {
-        '1234567890': 3,  # Customer 1234567890 has 3 previous violations
-        '0987654321': 1   # Customer 0987654321 has 1 previous violation
-    }
+    # Clear the existing table (if any)
+    result_table.clear()
+    total_rows = len(data)
+    progress_bar.config(maximum=max(total_rows, 1), value=0)
+    progress_label.config(text=f"Validating {total_rows:,} rows...")
 
-    def validate_and_insert_row(index, row_data):
-        # Validate the data using the generated function (validate_data)
-        errors, remediation_actions, risk_score = validate_data(row_data, historic_violations)
+    def table_row(index, row_data, row_messages):
+        # Validation results for this row were computed by validate_frame
+        errors, remediation_actions, risk_score = row_messages
 
-        # Retrieve Customer ID from the data and insert the result as a new row in the Treeview table
+        # Retrieve Customer ID from the data; the table shows it instead of a Transaction ID
         customer_id = row_data.get('Customer_ID', f"Row {index + 1}")  # Retrieve Customer ID
-
-        # Insert row into the Treeview with Customer ID instead of Transaction ID
-        treeview.insert('', 'end', values=(
+        return (
             customer_id,
             ', '.join(errors) if errors else 'No Errors',
             ', '.join(remediation_actions) if remediation_actions else 'No Actions',
             risk_score
-        ))
+        )
+
+    def validate_chunk(chunk):
+        # Rule results and messages for one chunk; this run's violations are staged in the history
+        results = validate_frame(chunk, historic_violations, metrics=validation_metrics)
+        historic_violations.record(run_violations(chunk, results, RULE_IDS))
+        return chunk, frame_messages(chunk, results, historic_violations)
 
-    def generate_and_insert_explanations():
-        for index, row in csv_data.iterrows():
-            row_data = row.to_dict()  # Convert row to dictionary
+    def explain_chunk(item):
+        # Add a GPT-2 explanation for every error to the row's remediation actions. Distinct errors
+        # are generated in batches and cached, so repeated errors cost nothing.
+        chunk, messages = item
+        distinct_errors = list(dict.fromkeys(error for errors, _, _ in messages for error in errors))
+        explanations = dict(zip(distinct_errors, explanation_service.explain_many(distinct_errors)))
+        messages = [(errors, list(remediation_actions) + [f"Explanation: {explanations[error]}" for error in errors],
+                     risk_score)
+                    for errors, remediation_actions, risk_score in messages]
+        return chunk, messages
 
-            # For each validation error, generate a GPT-2 explanation and add it to remediation actions
-            errors, remediation_actions, risk_score = validate_data(row_data, historic_violations)
+    def publish_chunk(item):
+        # Queue the rows for the table in batches; the UI thread inserts them
+        chunk, messages = item
+        rows = [table_row(chunk.index[position], row_data, messages[position])
+                for position, row_data in enumerate(chunk.to_dict('records'))]
+        for start in range(0, len(rows), RESULT_BATCH_SIZE):
+            result_queue.put((run, 'rows', rows[start:start + RESULT_BATCH_SIZE]))
 
-            for error in errors:
-                # Generate detailed explanation for the error using GPT-2
-                explanation = generate_remediation_explanation(error)
-                remediation_actions.append(f"Explanation: {explanation}")
+    chunk_rows = lambda item: len(item[0])
+    pipeline = StagedPipeline([Stage('validate', validate_chunk), Stage('explain', explain_chunk, chunk_rows),
+                               Stage('publish', publish_chunk, chunk_rows)],
+                              queue_size=PIPELINE_QUEUE_SIZE, metrics=validation_metrics)
+    global current_pipeline
+    current_pipeline = pipeline
 
-            # Insert the row with validation data into the table
-            validate_and_insert_row(index, row_data)
+    def run_pipeline():
+        # Each row is validated once; validation, explanation and publishing overlap chunk by chunk
+        try:
+            chunks = (data.iloc[start:start + PIPELINE_CHUNK_ROWS] for start in range(0, len(data), PIPELINE_CHUNK_ROWS))
+            pipeline.run(chunks)
+            # Write this run's violations back to the history for the next run
+            historic_violations.commit_run()
+        except Exception as e:
+            historic_violations.discard_run()
+            result_queue.put((run, 'error', e))
+        finally:
+            result_queue.put((run, 'done', None))
 
-    # Run the GPT-2 generation and validation in a separate thread
-    validation_thread = threading.Thread(target=generate_and_insert_explanations)
+    # Run the pipeline off the UI thread; Submit is enabled again once poll_results() sees it finish
+    validation_thread = threading.Thread(target=run_pipeline, daemon=True)
     validation_thread.start()
+    poll_results(run, total_rows, time.perf_counter())
+
+# Per-stage rows/sec and queue depth, e.g. " | validate 210,000/s | explain 3,100/s (queue 4/4) | ..."
+def pipeline_status(pipeline):
+    if pipeline is None:
+        return ""
+    parts = []
+    for name, stats in pipeline.stats().items():
+        part = f"{name} {stats['rows_per_sec'] or 0:,.0f}/s"
+        if 'queue' in stats:
+            part += f" (queue {stats['queue']['depth']}/{stats['queue']['capacity']})"
+        parts.append(part)
+    return " | " + " | ".join(parts)
+
+# Drain queued result batches into the table and update progress, then poll again until the run is done
+def poll_results(run, total_rows, started_at):
+    if run != current_run:
+        return  # A newer submission has its own poller
+    done = False
+    try:
+        while True:
+            batch_run, kind, rows = result_queue.get_nowait()
+            if batch_run != run:
+                continue  # Left over from an earlier submission
+            if kind == 'done':
+                done = True
+                break
+            if kind == 'error':
+                messagebox.showerror("Error", f"An error occurred during validation: {rows}")
+                continue
+            with timed_stage(validation_metrics, 'render', len(rows)):
+                result_table.append(rows)
+    except queue.Empty:
+        pass
+
+    validated = len(result_table.rows)
+    elapsed = max(time.perf_counter() - started_at, 1e-9)
+    progress_bar.config(value=validated)
+    progress_label.config(text=f"{validated:,} / {total_rows:,} rows ({validated / elapsed:,.0f} rows/sec)"
+                               + (" - done" if done else "") + pipeline_status(current_pipeline))
+    if not done:
+        root.after(POLL_INTERVAL_MS, poll_results, run, total_rows, started_at)
+        return
+    submit_button.config(state='normal')
+    if validation_metrics is not None:
+        validation_metrics.write_prometheus(METRICS_FILE)
 
 # Function to create the Tkinter UI
 def create_ui():
+    open_stores()
+
     # Set up the root window
+    global root
     root = tk.Tk()
     root.title("Data Validation UI")
     root.geometry("1000x700")
@@ -111,10 +245,31 @@ def create_ui():
     status_label = tk.Label(root, text="No file uploaded", font=("Arial", 12), fg="red", bg="#f4f4f9")
     status_label.pack(pady=10)
 
-    # Create and place the submit button to trigger validation
+    # Model status label, updated once the background warm-up has loaded GPT-2
+    model_status_label = tk.Label(root, text="Loading GPT-2 model in the background...", font=("Arial", 10), fg="gray", bg="#f4f4f9")
+    model_status_label.pack()
+    model_loader.warm_up_in_background(MODEL_NAME, quantized=QUANTIZED_MODEL)
+
+    def poll_model_status():
+        if model_loader.is_loaded(MODEL_NAME, quantized=QUANTIZED_MODEL):
+            model_status_label.config(text="GPT-2 model ready", fg="green")
+        else:
+            root.after(500, poll_model_status)
+
+    root.after(500, poll_model_status)
+
+    # Create and place the submit button to trigger validation; it is disabled while a run is active
+    global submit_button
     submit_button = tk.Button(root, text="Submit for Validation", command=submit_validation, font=("Arial", 14), bg="#4CAF50", fg="white", relief="solid", bd=2)
     submit_button.pack(pady=20)
 
+    # Progress of the running validation
+    global progress_bar, progress_label
+    progress_bar = ttk.Progressbar(root, orient='horizontal', mode='determinate', length=600)
+    progress_bar.pack()
+    progress_label = tk.Label(root, text="", font=("Arial", 10), bg="#f4f4f9")
+    progress_label.pack()
+
     # Create the frame for the table
     table_frame = tk.Frame(root, bg="#f4f4f9")
     table_frame.pack(pady=20, fill="both", expand=True)
@@ -122,27 +277,9 @@ def create_ui():
     # Define columns for the table
     columns = ('Customer_ID', 'Errors', 'Remediation Actions', 'Risk Score')
 
-    # Create Treeview widget for the table with scrollbars
-    global treeview
-    treeview = ttk.Treeview(table_frame, columns=columns, show='headings', style="Treeview")
-
-    # Define column headings
-    for col in columns:
-        treeview.heading(col, text=col)
-        treeview.column(col, width=200, anchor='center')
-
-    # Add horizontal scrollbar
-    x_scroll = ttk.Scrollbar(table_frame, orient='horizontal', command=treeview.xview)
-    x_scroll.pack(side=tk.BOTTOM, fill=tk.X)
-    treeview.configure(xscrollcommand=x_scroll.set)
-
-    # Add vertical scrollbar
-    y_scroll = ttk.Scrollbar(table_frame, orient='vertical', command=treeview.yview)
-    y_scroll.pack(side=tk.RIGHT, fill=tk.Y)
-    treeview.configure(yscrollcommand=y_scroll.set)
-
-    # Pack the Treeview into the frame
-    treeview.pack(fill="both", expand=True)
+    # Paged table: only the visible page of results is inserted into the Treeview
+    global result_table
+    result_table = PagedResultTable(table_frame, columns)
 
     # Add some custom styles for the treeview
     style = ttk.Style()
@@ -0,0 +1,96 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# Columns encoded by default: high-cardinality IDs and the short code columns rules look up
+ID_COLUMNS = ('Customer_ID', 'Currency', 'Country')
+
+
+class IdDictionary:
+    # Append-only mapping between the values of one column and compact integer codes.
+    #
+    # encode() turns a column into a pandas Categorical whose categories are this dictionary, so a
+    # value keeps the same code in every chunk and (once saved) every run. Each chunk's values are
+    # hashed once, by pd.factorize; only the chunk's distinct values are looked up in the dictionary.
+    # The categories are a view of an append-only array that grows by doubling, so a chunk costs
+    # O(chunk) however large the dictionary has grown.
+
+    def __init__(self, values=()):
+        self.values = list(values)
+        self._codes = {value: code for code, value in enumerate(self.values)}
+        self._array = np.empty(max(len(self.values), 16), dtype=object)
+        self._array[:len(self.values)] = self.values
+        self._dtype = None
+
+    def __len__(self):
+        return len(self.values)
+
+    def _append(self, value):
+        if len(self.values) == len(self._array):
+            grown = np.empty(2 * len(self._array), dtype=object)
+            grown[:len(self.values)] = self._array[:len(self.values)]
+            self._array = grown
+        self._array[len(self.values)] = value
+        self._codes[value] = len(self.values)
+        self.values.append(value)
+        self._dtype = None
+
+    @property
+    def dtype(self):
+        # CategoricalDtype over the current values, rebuilt only after new values were added. The
+        # values are unique by construction, so pandas' uniqueness check (a hash of every value) is
+        # skipped where this pandas version allows it.
+        if self._dtype is None:
+            categories = pd.Index(self._array[:len(self.values)], dtype=object, copy=False)
+            from_fastpath = getattr(pd.CategoricalDtype, '_from_fastpath', None)
+            self._dtype = from_fastpath(categories, False) if from_fastpath else pd.CategoricalDtype(categories)
+        return self._dtype
+
+    def encode(self, column, add=True):
+        # Categorical version of `column`. Unseen values are added to the dictionary, or become
+        # missing (code -1) with add=False. Nulls stay missing.
+        if isinstance(column.dtype, pd.CategoricalDtype) and column.dtype is self._dtype:
+            return column
+        chunk_codes, uniques = pd.factorize(column, use_na_sentinel=True)
+        unique_codes = np.empty(len(uniques), dtype=np.int64)
+        for position, value in enumerate(uniques):
+            code = self._codes.get(value)
+            if code is None:
+                if not add:
+                    code = -1
+                else:
+                    code = len(self.values)
+                    self._append(value)
+            unique_codes[position] = code
+        codes = np.append(unique_codes, -1)[chunk_codes]  # factorize marks nulls -1 -> the appended -1
+        categorical = pd.Categorical.from_codes(codes, dtype=self.dtype, validate=False)
+        return pd.Series(categorical, index=column.index, name=column.name)
+
+
+class DatasetDictionary:
+    # One IdDictionary per ID column, optionally persisted as JSON at `path` so codes stay stable
+    # across runs. Call save() after encoding to keep the values added by this run.
+
+    def __init__(self, path=None, columns=ID_COLUMNS):
+        self.path = path
+        self.columns = {column: IdDictionary() for column in columns}
+        if path and os.path.exists(path):
+            with open(path) as file:
+                for column, values in json.load(file).items():
+                    self.columns[column] = IdDictionary(values)
+
+    def encode_frame(self, data, add=True):
+        # Copy of `data` with every ID column it has replaced by its dictionary-encoded Categorical;
+        # `data` itself is not modified
+        encoded = {column: dictionary.encode(data[column], add) for column, dictionary in self.columns.items()
+                   if column in data}
+        return data.assign(**encoded)
+
+    def save(self, path=None):
+        path = path or self.path
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, 'w') as file:
+            json.dump({column: dictionary.values for column, dictionary in self.columns.items()}, file)
+        os.replace(temporary_path, path)
@@ -0,0 +1,149 @@
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+# Files of a fingerprint index directory: sorted row hashes, the matching violation bitmasks and
+# risk scores (all .npy, memory-mapped when read), and the settings they were computed with
+_FILES = ('hashes', 'violations', 'risk_scores')
+_SETTINGS_FILE = 'settings.json'
+
+
+def rule_set_version(rules):
+    # Version of a rule set module: RULE_SET_VERSION for modules rendered by generate_validation_code,
+    # else a hash of its RULES (which misses predicate-only edits; regenerate such modules)
+    version = getattr(rules, 'RULE_SET_VERSION', None)
+    if version is None:
+        version = hashlib.sha256(repr(rules.RULES).encode('utf-8')).hexdigest()[:16]
+    return version
+
+
+def row_hashes(data, historic_violations=None):
+    # 64-bit fingerprint of every row: all of its columns plus its customer's previous-violation
+    # count, so a row is "changed" when either its data or its customer's history changed
+    categorical = [column for column, dtype in data.dtypes.items() if isinstance(dtype, pd.CategoricalDtype)]
+    if categorical:
+        # Hashing (or mapping) a dictionary-encoded column touches every category of the dictionary;
+        # the chunk's decoded values cost O(chunk) and give the same fingerprints
+        data = data.copy(deep=False)
+        for column in categorical:
+            data[column] = np.asarray(data[column])
+    if historic_violations and 'Customer_ID' in data:
+        customer_ids = data['Customer_ID']
+        if hasattr(historic_violations, 'lookup'):
+            history = historic_violations.lookup(customer_ids)
+        else:
+            history = customer_ids.map(historic_violations).fillna(0).to_numpy()
+        data = data.assign(_historic_violations=history)
+    return pd.util.hash_pandas_object(data, index=False).to_numpy()
+
+
+class RowFingerprintIndex:
+    # Incremental revalidation: remembers the results of every row validated by the last run,
+    # keyed by row fingerprint, and only sends new or changed rows through the rule kernel.
+    #
+    # A run calls begin() with its rule set and options, validate_frame() per chunk (same results
+    # as rules.validate_frame) and commit() once the run succeeded. The previous run's results are
+    # reused only if it used the same rule set version, reference date, max_days_old and
+    # date_format; otherwise every row is revalidated. Rows are matched by content, not position,
+    # so inserted, deleted or reordered rows cost nothing extra.
+    #
+    # The previous index is memory-mapped; the new one is appended to disk chunk by chunk and
+    # sorted on commit (about 20 bytes per row).
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.reused = 0
+        self.validated = 0
+        self.full_revalidation = True
+
+    def begin(self, rules, reference_time, max_days_old=180, date_format='%Y-%m-%d'):
+        os.makedirs(self.directory, exist_ok=True)
+        self.rules = rules
+        self.rule_ids = list(rules.RULE_IDS)
+        if len(self.rule_ids) > 64:
+            raise ValueError("Incremental validation supports at most 64 rules")
+        self.reference_time = pd.Timestamp(reference_time)
+        self.max_days_old = max_days_old
+        self.date_format = date_format
+        self.settings = {
+            'rule_set_version': rule_set_version(rules),
+            'rule_ids': self.rule_ids,
+            # Date rules only compare whole days, so any time on the same day gives the same results
+            'reference_date': str(self.reference_time.normalize().date()),
+            'max_days_old': max_days_old,
+            'date_format': date_format,
+        }
+        self.reused = 0
+        self.validated = 0
+        self._previous = self._load_previous()
+        self.full_revalidation = self._previous is None
+        self._pending_path = os.path.join(self.directory, 'pending')
+        shutil.rmtree(self._pending_path, ignore_errors=True)
+        os.makedirs(self._pending_path)
+        self._pending = {name: open(os.path.join(self._pending_path, f"{name}.bin"), 'wb') for name in _FILES}
+
+    def _load_previous(self):
+        settings_path = os.path.join(self.directory, _SETTINGS_FILE)
+        if not os.path.exists(settings_path):
+            return None
+        with open(settings_path) as file:
+            if json.load(file) != self.settings:
+                return None
+        return {name: np.load(os.path.join(self.directory, f"{name}.npy"), mmap_mode='r') for name in _FILES}
+
+    def validate_frame(self, data, historic_violations=None, metrics=None):
+        hashes = row_hashes(data, historic_violations)
+        violations = np.zeros(len(data), dtype=np.uint64)
+        risk_scores = np.zeros(len(data), dtype=np.int64)
+        found = np.zeros(len(data), dtype=bool)
+        if self._previous is not None and len(self._previous['hashes']):
+            previous_hashes = self._previous['hashes']
+            positions = np.minimum(np.searchsorted(previous_hashes, hashes), len(previous_hashes) - 1)
+            found = previous_hashes[positions] == hashes
+            violations[found] = self._previous['violations'][positions[found]]
+            risk_scores[found] = self._previous['risk_scores'][positions[found]]
+
+        changed = ~found
+        if changed.any():
+            fresh = self.rules.validate_frame(data[changed], historic_violations, self.max_days_old,
+                                              self.reference_time, self.date_format, metrics)
+            bits = np.uint64(1) << np.arange(len(self.rule_ids), dtype=np.uint64)
+            violations[changed] = fresh[self.rule_ids].to_numpy(dtype=np.uint64) @ bits
+            risk_scores[changed] = fresh['risk_score'].to_numpy()
+        self.reused += int(found.sum())
+        self.validated += int(changed.sum())
+
+        for name, values in (('hashes', hashes), ('violations', violations), ('risk_scores', risk_scores)):
+            self._pending[name].write(values.tobytes())
+
+        masks = (violations[:, None] >> np.arange(len(self.rule_ids), dtype=np.uint64)) & np.uint64(1)
+        results = pd.DataFrame(masks.astype(bool), columns=self.rule_ids, index=data.index)
+        results['risk_score'] = risk_scores
+        return results
+
+    def commit(self):
+        # Replace the previous index with this run's rows, sorted by hash for the next run's lookups
+        for file in self._pending.values():
+            file.close()
+        self._previous = None  # Release the memory maps before their files are replaced
+        # Settings go last: until they are written, a crash leaves an index no run will trust
+        settings_path = os.path.join(self.directory, _SETTINGS_FILE)
+        if os.path.exists(settings_path):
+            os.remove(settings_path)
+        dtypes = {'hashes': np.uint64, 'violations': np.uint64, 'risk_scores': np.int64}
+        arrays = {name: np.fromfile(os.path.join(self._pending_path, f"{name}.bin"), dtype=dtypes[name])
+                  for name in _FILES}
+        order = np.argsort(arrays['hashes'], kind='stable')
+        for name, values in arrays.items():
+            np.save(os.path.join(self.directory, f"{name}.npy"), values[order])
+        with open(f"{settings_path}.tmp", 'w') as file:
+            json.dump(self.settings, file)
+        os.replace(f"{settings_path}.tmp", settings_path)
+        shutil.rmtree(self._pending_path, ignore_errors=True)
+
+    def stats(self):
+        return {'reused': self.reused, 'validated': self.validated, 'full_revalidation': self.full_revalidation}
@@ -0,0 +1,138 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+
+class ValidationMetrics:
+    # Counters for one validation run (or one process's lifetime): per rule, the seconds spent,
+    # rows evaluated, rows violated and risk contributed; per stage (read, validate, explain,
+    # write, render), the seconds, calls and rows; per pipeline queue, the current and peak depth.
+    #
+    # Pass an instance as `metrics` to validate_frame / validate_csv_stream / validate_csv_parallel;
+    # with metrics=None (the default everywhere) nothing is recorded and nothing is timed.
+    # Safe to share between threads. Snapshots from other processes are added with merge().
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.rules = {}
+            self.stages = {}
+            self.queues = {}
+            self.shared_seconds = 0.0
+
+    def record_rule(self, rule_id, seconds, rows, mask, contribution):
+        violations = int(np.count_nonzero(mask))
+        risk = int(np.sum(contribution))
+        with self._lock:
+            entry = self.rules.setdefault(rule_id, {'seconds': 0.0, 'rows': 0, 'violations': 0, 'risk': 0})
+            entry['seconds'] += seconds
+            entry['rows'] += rows
+            entry['violations'] += violations
+            entry['risk'] += risk
+
+    def record_shared(self, seconds):
+        # Time the kernel spent on the shared subexpressions every rule reuses
+        with self._lock:
+            self.shared_seconds += seconds
+
+    def record_stage(self, stage, seconds, rows=0):
+        with self._lock:
+            entry = self.stages.setdefault(stage, {'seconds': 0.0, 'calls': 0, 'rows': 0})
+            entry['seconds'] += seconds
+            entry['calls'] += 1
+            entry['rows'] += rows
+
+    def record_queue_depth(self, stage, depth, capacity):
+        # Items waiting in the queue in front of a staged_pipeline stage
+        with self._lock:
+            entry = self.queues.setdefault(stage, {'depth': 0, 'peak': 0, 'capacity': capacity})
+            entry['depth'] = depth
+            entry['peak'] = max(entry['peak'], depth)
+
+    @contextmanager
+    def stage(self, stage, rows=0):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_stage(stage, time.perf_counter() - started, rows)
+
+    def snapshot(self):
+        # Plain, JSON-serializable copy of every counter
+        with self._lock:
+            return {
+                'rules': {rule_id: dict(entry) for rule_id, entry in self.rules.items()},
+                'stages': {stage: dict(entry) for stage, entry in self.stages.items()},
+                'queues': {stage: dict(entry) for stage, entry in self.queues.items()},
+                'shared_seconds': self.shared_seconds,
+            }
+
+    def merge(self, snapshot):
+        # Add another ValidationMetrics' snapshot (e.g. from a worker process) to these counters
+        with self._lock:
+            for rule_id, entry in snapshot['rules'].items():
+                totals = self.rules.setdefault(rule_id, dict.fromkeys(entry, 0))
+                for key, value in entry.items():
+                    totals[key] += value
+            for stage, entry in snapshot['stages'].items():
+                totals = self.stages.setdefault(stage, dict.fromkeys(entry, 0))
+                for key, value in entry.items():
+                    totals[key] += value
+            for stage, entry in snapshot.get('queues', {}).items():
+                totals = self.queues.setdefault(stage, dict(entry))
+                totals['depth'] = entry['depth']
+                totals['peak'] = max(totals['peak'], entry['peak'])
+            self.shared_seconds += snapshot['shared_seconds']
+
+    def prometheus_text(self, prefix='validation'):
+        # The counters in the Prometheus text exposition format
+        snapshot = self.snapshot()
+        lines = []
+
+        def metric(name, help_text, label, entries, key, kind='counter'):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            for label_value, entry in entries.items():
+                lines.append(f'{prefix}_{name}{{{label}="{label_value}"}} {entry[key]}')
+
+        rules = snapshot['rules']
+        metric('rule_seconds_total', "Seconds spent evaluating each rule.", 'rule', rules, 'seconds')
+        metric('rule_rows_evaluated_total', "Rows each rule was evaluated on.", 'rule', rules, 'rows')
+        metric('rule_rows_violated_total', "Rows that violated each rule.", 'rule', rules, 'violations')
+        metric('rule_risk_total', "Risk score contributed by each rule.", 'rule', rules, 'risk')
+        stages = snapshot['stages']
+        metric('stage_seconds_total', "Seconds spent in each pipeline stage.", 'stage', stages, 'seconds')
+        metric('stage_calls_total', "Times each pipeline stage ran.", 'stage', stages, 'calls')
+        metric('stage_rows_total', "Rows processed by each pipeline stage.", 'stage', stages, 'rows')
+        queues = snapshot['queues']
+        if queues:
+            metric('queue_depth', "Items waiting in front of each pipeline stage.", 'stage', queues, 'depth', 'gauge')
+            metric('queue_peak_depth', "Most items seen waiting in front of each pipeline stage.", 'stage', queues,
+                   'peak', 'gauge')
+        lines.append(f"# HELP {prefix}_shared_expression_seconds_total Seconds spent on subexpressions shared by rules.")
+        lines.append(f"# TYPE {prefix}_shared_expression_seconds_total counter")
+        lines.append(f"{prefix}_shared_expression_seconds_total {snapshot['shared_seconds']}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path, prefix='validation'):
+        # Replace the file atomically, so a textfile collector never reads half of it
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, 'w') as file:
+            file.write(self.prometheus_text(prefix))
+        os.replace(temporary_path, path)
+
+
+@contextmanager
+def timed_stage(metrics, stage, rows=0):
+    # metrics.stage(...) when metrics are enabled, a no-op otherwise
+    if metrics is None:
+        yield
+    else:
+        with metrics.stage(stage, rows):
+            yield
@@ -0,0 +1,69 @@
+import threading
+import warnings
+
+# Loaded (model, tokenizer) pairs by model name (and precision). transformers and torch are only
+# imported the first time a model is actually needed, so rule-only validation never pays for them.
+_models = {}
+_lock = threading.Lock()
+
+
+def _key(model_name, quantized):
+    return f"{model_name}:int8" if quantized else model_name
+
+
+def load_model(model_name="gpt2", quantized=False):
+    # Load (or return the already loaded) causal language model and tokenizer; safe to call from any thread.
+    # quantized=True gives a separate copy with int8 linear layers for CPU inference (see quantize_for_cpu).
+    with _lock:
+        key = _key(model_name, quantized)
+        if key not in _models:
+            from transformers import GPT2LMHeadModel, GPT2Tokenizer
+            model = GPT2LMHeadModel.from_pretrained(model_name)
+            model.eval()
+            if quantized:
+                model = quantize_for_cpu(model)
+            tokenizer = GPT2Tokenizer.from_pretrained(model_name)
+            _models[key] = (model, tokenizer)
+        return _models[key]
+
+
+def quantize_for_cpu(model):
+    # Dynamic int8 quantization of every linear layer: weights are stored as int8 and activations
+    # quantized on the fly, about 4x less weight memory and faster matmuls on CPU. GPT-2 implements
+    # its projections as transformers' Conv1D (a transposed Linear), which quantize_dynamic does not
+    # know, so those are converted to nn.Linear first. `model` is modified in place.
+    import torch
+    from transformers.pytorch_utils import Conv1D
+
+    for parent in list(model.modules()):
+        for name, child in parent.named_children():
+            if isinstance(child, Conv1D):
+                in_features, out_features = child.weight.shape
+                linear = torch.nn.Linear(in_features, out_features)
+                linear.weight.data = child.weight.data.t().contiguous()
+                linear.bias.data = child.bias.data
+                setattr(parent, name, linear)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')  # torch.ao.quantization is deprecated in favour of torchao
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+def is_loaded(model_name="gpt2", quantized=False):
+    return _key(model_name, quantized) in _models
+
+
+def warm_up_in_background(model_name="gpt2", on_ready=None, quantized=False):
+    # Start loading the model on a daemon thread, calling on_ready(error) when done (error is None on success)
+    def warm_up():
+        try:
+            load_model(model_name, quantized)
+        except Exception as e:
+            if on_ready:
+                on_ready(e)
+            return
+        if on_ready:
+            on_ready(None)
+
+    thread = threading.Thread(target=warm_up, name=f"warm-up-{model_name}", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,84 @@
+import tkinter as tk
+from tkinter import ttk
+
+
+class PagedResultTable:
+    # Treeview that holds any number of result rows but only renders one page of them.
+    #
+    # The Treeview never has more than page_size items, so appending hundreds of thousands of rows
+    # and clearing the table stay cheap. Must only be used from the Tk (main) thread.
+
+    def __init__(self, parent, columns, page_size=200, bg="#f4f4f9"):
+        self.columns = columns
+        self.page_size = page_size
+        self.rows = []
+        self.page = 0
+
+        self.frame = tk.Frame(parent, bg=bg)
+        self.frame.pack(fill="both", expand=True)
+
+        # Page navigation
+        nav_frame = tk.Frame(self.frame, bg=bg)
+        nav_frame.pack(side=tk.BOTTOM, fill="x")
+        self.prev_button = tk.Button(nav_frame, text="< Prev", command=self.previous_page, font=("Arial", 10))
+        self.prev_button.pack(side=tk.LEFT, padx=5, pady=5)
+        self.next_button = tk.Button(nav_frame, text="Next >", command=self.next_page, font=("Arial", 10))
+        self.next_button.pack(side=tk.RIGHT, padx=5, pady=5)
+        self.page_label = tk.Label(nav_frame, text="", font=("Arial", 10), bg=bg)
+        self.page_label.pack()
+
+        # Create Treeview widget for the table with scrollbars
+        self.treeview = ttk.Treeview(self.frame, columns=columns, show='headings', style="Treeview")
+        for col in columns:
+            self.treeview.heading(col, text=col)
+            self.treeview.column(col, width=200, anchor='center')
+
+        x_scroll = ttk.Scrollbar(self.frame, orient='horizontal', command=self.treeview.xview)
+        x_scroll.pack(side=tk.BOTTOM, fill=tk.X)
+        self.treeview.configure(xscrollcommand=x_scroll.set)
+
+        y_scroll = ttk.Scrollbar(self.frame, orient='vertical', command=self.treeview.yview)
+        y_scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        self.treeview.configure(yscrollcommand=y_scroll.set)
+
+        self.treeview.pack(fill="both", expand=True)
+        self._render()
+
+    def page_count(self):
+        return max((len(self.rows) + self.page_size - 1) // self.page_size, 1)
+
+    def append(self, rows):
+        # Add rows at the end; only redraw if they land on the page being shown
+        first_new = len(self.rows)
+        self.rows.extend(rows)
+        page_start = self.page * self.page_size
+        if first_new < page_start + self.page_size:
+            self._render()
+        else:
+            self._update_page_label()
+
+    def clear(self):
+        self.rows = []
+        self.page = 0
+        self._render()
+
+    def next_page(self):
+        if self.page + 1 < self.page_count():
+            self.page += 1
+            self._render()
+
+    def previous_page(self):
+        if self.page > 0:
+            self.page -= 1
+            self._render()
+
+    def _render(self):
+        # Replace the visible items with the current page in one delete and page_size inserts
+        self.treeview.delete(*self.treeview.get_children())
+        start = self.page * self.page_size
+        for values in self.rows[start:start + self.page_size]:
+            self.treeview.insert('', 'end', values=values)
+        self._update_page_label()
+
+    def _update_page_label(self):
+        self.page_label.config(text=f"Page {self.page + 1} of {self.page_count()} ({len(self.rows):,} rows)")
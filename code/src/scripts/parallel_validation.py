@@ -0,0 +1,134 @@
+import os
+import time
+from collections import deque
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import currency_index
+from generated_validation_code import DEFAULT_DATE_FORMAT
+from stream_validation import ValidationSummary, read_csv_chunks, timed_chunks, DEFAULT_CHUNKSIZE
+from results_writer import open_results_writer
+from rule_sets import load_rule_set
+from instrumentation import ValidationMetrics
+
+# Read-only state each worker receives once, through the pool initializer, instead of with every
+# task: the validate_frame options and the rule set module
+_worker_options = {}
+_worker_rules = []
+
+
+def _init_worker(options, code_index, rule_set):
+    currency_index.set_code_index(code_index)
+    _worker_options.update(options)
+    _worker_rules.append(load_rule_set(rule_set))
+
+
+def _validate_shard(shard):
+    return _worker_rules[0].validate_frame(shard, **_worker_options)
+
+
+def _validate_shard_with_metrics(shard):
+    # Per-rule counters are collected in the worker and sent back with the results, to be merged
+    metrics = ValidationMetrics()
+    return _worker_rules[0].validate_frame(shard, metrics=metrics, **_worker_options), metrics.snapshot()
+
+
+def shard_frame(data, shards, shard_by='range'):
+    # Split a DataFrame into shards, either as contiguous row ranges or by a stable hash of
+    # Customer_ID (so all of a customer's rows land in the same shard)
+    if shard_by == 'range':
+        bounds = np.linspace(0, len(data), shards + 1).astype(int)
+        return [data.iloc[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+    if shard_by == 'customer':
+        hashes = pd.util.hash_pandas_object(data['Customer_ID'], index=False).to_numpy()
+        shard_ids = hashes % np.uint64(shards)
+        return [data[shard_ids == shard] for shard in range(shards)]
+    raise ValueError(f"Unknown shard_by '{shard_by}', expected 'range' or 'customer'")
+
+
+def _validation_options(historic_violations, max_days_old, reference_time, date_format):
+    # One reference time for the whole run, taken here so every worker judges dates against it
+    return {
+        'historic_violations': historic_violations or {},
+        'max_days_old': max_days_old,
+        'reference_time': reference_time or datetime.now(),
+        'date_format': date_format,
+    }
+
+
+def _executor(workers, options, rule_set=None):
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                               initargs=(options, currency_index.code_index(), rule_set))
+
+
+def validate_frame_parallel(data, historic_violations=None, max_days_old=180, workers=None, shard_by='range',
+                            reference_time=None, date_format=DEFAULT_DATE_FORMAT, rule_set=None):
+    # Validate a DataFrame across a process pool. Results are identical to validate_frame(data) and
+    # come back in the original row order whichever way the rows were sharded.
+    workers = workers or os.cpu_count() or 1
+    options = _validation_options(historic_violations, max_days_old, reference_time, date_format)
+    shards = [shard for shard in shard_frame(data, workers, shard_by) if len(shard)]
+    if not shards:
+        return load_rule_set(rule_set).validate_frame(data, **options)
+    with _executor(workers, options, rule_set) as executor:
+        results = pd.concat(list(executor.map(_validate_shard, shards)))
+    if shard_by == 'range':
+        return results
+    return results.reindex(data.index)
+
+
+def validate_csv_parallel(input_path, output_path, historic_violations=None, max_days_old=180,
+                          workers=None, chunksize=DEFAULT_CHUNKSIZE, dtypes=None, reference_time=None,
+                          date_format=DEFAULT_DATE_FORMAT, output_format='csv', rule_set=None,
+                          on_chunk=None, timings=None, metrics=None):
+    # Parallel version of stream_validation.validate_csv_stream (same options): chunks are validated
+    # by a process pool and written in input order. At most two chunks per worker are in flight, so
+    # memory stays bounded by chunksize * workers. timings['validate'] is the time spent waiting
+    # for workers, not the CPU time they used. Per-rule metrics are measured in the workers and
+    # merged into `metrics` as their chunks come back.
+    workers = workers or os.cpu_count() or 1
+    rules = load_rule_set(rule_set)
+    timings = {} if timings is None else timings
+    options = _validation_options(historic_violations, max_days_old, reference_time, date_format)
+    summary = ValidationSummary(rules.RULE_IDS)
+    pending = deque()
+
+    def write_oldest():
+        chunk, future = pending.popleft()
+        started = time.perf_counter()
+        results = future.result()
+        if metrics is not None:
+            results, worker_metrics = results
+            metrics.merge(worker_metrics)
+        validated = time.perf_counter()
+        writer.write(chunk, results)
+        written = time.perf_counter()
+        timings['validate'] = timings.get('validate', 0.0) + validated - started
+        timings['write'] = timings.get('write', 0.0) + written - validated
+        if metrics is not None:
+            metrics.record_stage('validate', validated - started, len(chunk))
+            metrics.record_stage('write', written - validated, len(chunk))
+        summary.update(results)
+        if on_chunk:
+            on_chunk(chunk, results)
+
+    writer = open_results_writer(output_path, output_format, rules.RULES)
+    try:
+        with _executor(workers, options, rule_set) as executor:
+            validate_shard = _validate_shard if metrics is None else _validate_shard_with_metrics
+            for chunk in timed_chunks(read_csv_chunks(input_path, chunksize, dtypes), timings, metrics=metrics):
+                pending.append((chunk, executor.submit(validate_shard, chunk)))
+                if len(pending) >= 2 * workers:
+                    write_oldest()
+            while pending:
+                write_oldest()
+    finally:
+        writer.close()
+    return summary
+
+
+if __name__ == "__main__":
+    summary = validate_csv_parallel('../data/example_data.csv', 'validation_results.csv', workers=2, chunksize=2)
+    print(summary.as_dict())
@@ -0,0 +1,142 @@
+import numpy as np
+import pandas as pd
+
+# Mergeable streaming summaries for data profiling. Each sketch is updated one chunk (a pandas
+# Series) at a time in memory that does not grow with the data, and two sketches built on different
+# chunks (e.g. by different worker processes) merge into the sketch of all their rows.
+
+
+def hash_values(values):
+    # Stable 64-bit hashes of a Series' values (the same value always gets the same hash)
+    return pd.util.hash_pandas_object(values, index=False).to_numpy()
+
+
+class HyperLogLog:
+    # Approximate distinct count: 2**precision one-byte registers, about 1.04 / sqrt(2**precision)
+    # relative error (0.8% at the default precision of 14, in 16 KB)
+
+    def __init__(self, precision=14):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def update(self, values):
+        if len(values) == 0:
+            return
+        hashes = hash_values(values)
+        buckets = (hashes >> np.uint64(64 - self.precision)).astype(np.int64)
+        remainder = hashes & np.uint64((1 << (64 - self.precision)) - 1)
+        # Position of the leftmost 1 bit in the remaining 64 - precision bits (frexp's exponent is
+        # the bit length, exact because the remainder fits in a float64 mantissa)
+        _, bit_length = np.frexp(remainder.astype(np.float64))
+        ranks = (64 - self.precision - bit_length + 1).astype(np.uint8)
+        np.maximum.at(self.registers, buckets, ranks)
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches with different precisions")
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def count(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = np.count_nonzero(self.registers == 0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * np.log(m / zeros)  # Linear counting is more accurate for small counts
+        return int(round(estimate))
+
+
+class QuantileSketch:
+    # KLL quantile sketch: sorted compactors where each level's items stand for 2**level values.
+    # When a level outgrows its capacity, every other item (random offset) moves up one level.
+    # Memory is O(k) floats; at the default k=400 quantiles are typically within 0.5% in rank.
+
+    def __init__(self, k=400, seed=0):
+        self.k = k
+        self.count = 0
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values):
+            self.levels[0] = np.concatenate([self.levels[0], values])
+            self.count += len(values)
+            self._compress()
+
+    def merge(self, other):
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self._compress()
+
+    def _capacity(self, level):
+        # Lower levels hold geometrically fewer items than the top one
+        return max(int(self.k * (2 / 3) ** (len(self.levels) - level - 1)), 2)
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                items = np.sort(items)
+                kept = items[len(items) - len(items) % 2:]  # An odd item out stays on this level
+                promoted = items[self._rng.integers(2):len(items) - len(items) % 2:2]
+                self.levels[level] = kept
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    def quantiles(self, fractions):
+        # Approximate values at the given fractions (0..1) of the data, NaN if no values were seen
+        fractions = np.asarray(fractions, dtype=np.float64)
+        if not self.count:
+            return np.full(len(fractions), np.nan)
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level_items), 2.0 ** level) for level, level_items in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        cumulative = np.cumsum(weights[order])
+        positions = np.searchsorted(cumulative, fractions * cumulative[-1], side='left')
+        return items[order][np.minimum(positions, len(items) - 1)]
+
+
+class TopK:
+    # Frequent values with the Misra-Gries summary: at most `capacity` counters; counts are
+    # underestimated by at most (number of values) / (capacity + 1), so every value more frequent
+    # than that is kept
+
+    def __init__(self, capacity=100):
+        self.capacity = capacity
+        self.counts = {}
+
+    def update(self, values):
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # Count codes, so a large dictionary's unused categories are never touched
+            codes = values.cat.codes.to_numpy()
+            counts = pd.Series(codes[codes >= 0]).value_counts()
+            counts.index = values.cat.categories.take(counts.index.to_numpy())
+        else:
+            counts = values.value_counts(dropna=True)
+        for value, count in counts.items():
+            value = value.item() if hasattr(value, 'item') else value
+            self.counts[value] = self.counts.get(value, 0) + int(count)
+        self._prune()
+
+    def merge(self, other):
+        for value, count in other.counts.items():
+            self.counts[value] = self.counts.get(value, 0) + count
+        self._prune()
+
+    def _prune(self):
+        if len(self.counts) <= self.capacity:
+            return
+        # Subtract the (capacity + 1)-th largest count from every counter and drop the ones that run out
+        threshold = sorted(self.counts.values(), reverse=True)[self.capacity]
+        self.counts = {value: count - threshold for value, count in self.counts.items() if count > threshold}
+
+    def top(self, k=10):
+        return sorted(self.counts.items(), key=lambda item: item[1], reverse=True)[:k]
@@ -0,0 +1,151 @@
+import re
+import string
+import threading
+from collections import OrderedDict
+
+import generated_validation_code
+from explanation_backends import TransformersBackend
+from explanation_store import explanation_fingerprint
+
+# Prompt used for every explanation. Bump PROMPT_VERSION whenever the template changes, so cached
+# explanations produced by the old prompt are no longer used.
+PROMPT_TEMPLATE = "Explain why the following error might have occurred in a financial transaction: {error_message}"
+PROMPT_VERSION = 2
+# Text every prompt starts with, which backends may process once for all prompts
+PROMPT_PREFIX = PROMPT_TEMPLATE.split('{error_message}')[0]
+
+
+def normalize_error(error_message):
+    # Error messages come from a handful of templates; collapse whitespace so equal messages share a key
+    return re.sub(r'\s+', ' ', str(error_message)).strip()
+
+
+def compile_templates(templates):
+    # [(pattern, key)] for error message templates such as the rules' 'Customer has {historic_score}
+    # previous violations.': the pattern matches any message made from the template, and the key is
+    # the template with its fields written as X ('Customer has X previous violations.')
+    compiled = []
+    for template in dict.fromkeys(templates):
+        pattern, key = '', ''
+        for literal, field, _, _ in string.Formatter().parse(normalize_error(template)):
+            pattern += re.escape(literal) + ('(.+?)' if field is not None else '')
+            key += literal + ('X' if field is not None else '')
+        compiled.append((re.compile(pattern), key))
+    return compiled
+
+
+def message_template(error_message, compiled_templates):
+    # The key shared by every message of the same template, so per-row values (amounts, counts) do
+    # not make a new explanation each; messages of no known template are keyed by their own text
+    error_message = normalize_error(error_message)
+    for pattern, key in compiled_templates:
+        if pattern.fullmatch(error_message):
+            return key
+    return error_message
+
+
+class ExplanationService:
+    # Explains validation errors with a causal language model (GPT-2 by default).
+    #
+    # Each distinct error message is generated only once: explanations are kept in a bounded LRU
+    # cache keyed by (message template, model name, prompt version), and cache misses are run
+    # through the model together in batches. Messages are matched against `templates` (by default
+    # the generated rules' error messages), and the template with its values written as X is both
+    # the key and the text that is explained. With an ExplanationStore, misses are looked up on disk
+    # before generating, and new explanations are written back for later runs.
+    #
+    # Generation is done by a backend (see explanation_backends). Pass one as `backend`, or a loaded
+    # model and tokenizer, or a loader callable returning (model, tokenizer), for the full-precision
+    # TransformersBackend; the model is only loaded on the first cache miss, so fully cached runs
+    # never load it.
+
+    def __init__(self, model=None, tokenizer=None, model_name='gpt2', max_cache_size=4096, batch_size=8,
+                 max_length=100, prompt_version=PROMPT_VERSION, store=None, loader=None, backend=None,
+                 templates=None):
+        if backend is None:
+            if model is None and loader is None:
+                raise ValueError("ExplanationService needs a backend, a model and tokenizer or a loader")
+            backend = TransformersBackend(model, tokenizer, model_name=model_name, max_length=max_length, loader=loader)
+        self.backend = backend
+        self.model_name = backend.model_name
+        self.max_cache_size = max_cache_size
+        self.batch_size = batch_size
+        self.prompt_version = prompt_version
+        self.store = store
+        if templates is None:
+            templates = [rule[1] for rule in generated_validation_code.RULES]
+        self.templates = compile_templates(templates)
+        self.fingerprint = explanation_fingerprint(self.model_name, self.generation_params(), PROMPT_TEMPLATE, prompt_version)
+        self.hits = 0
+        self.generated = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def cache_key(self, error_message):
+        return (message_template(error_message, self.templates), self.model_name, self.prompt_version)
+
+    def generation_params(self):
+        # Settings that change the generated text; part of the persistent store's fingerprint
+        return self.backend.generation_params()
+
+    def explain(self, error_message):
+        return self.explain_many([error_message])[0]
+
+    def explain_many(self, error_messages):
+        # Explanations for a list of error messages, in the same order
+        keys = [self.cache_key(error_message) for error_message in error_messages]
+        explanations = {}
+        missing = []
+        missing_keys = set()
+        with self._lock:
+            for key in keys:
+                if key in explanations or key in missing_keys:
+                    continue
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    explanations[key] = self._cache[key]
+                    self.hits += 1
+                else:
+                    missing.append(key)
+                    missing_keys.add(key)
+                    self.misses += 1
+
+        if missing and self.store is not None:
+            stored = self.store.get_many(self.fingerprint, [key[0] for key in missing])
+            with self._lock:
+                for key in missing:
+                    if key[0] in stored:
+                        explanations[key] = stored[key[0]]
+                        self._remember(key, stored[key[0]])
+            missing = [key for key in missing if key not in explanations]
+
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start:start + self.batch_size]
+            generated = self._generate([key[0] for key in batch])
+            explanations.update(zip(batch, generated))
+            with self._lock:
+                self.generated += len(batch)
+                for key, explanation in zip(batch, generated):
+                    self._remember(key, explanation)
+            if self.store is not None:
+                self.store.put_many(self.fingerprint, {key[0]: explanation for key, explanation in zip(batch, generated)})
+
+        return [explanations[key] for key in keys]
+
+    def stats(self):
+        stats = {'hits': self.hits, 'misses': self.misses, 'generated': self.generated, 'cached': len(self._cache)}
+        if self.store is not None:
+            stats['store'] = self.store.stats()
+        return stats
+
+    def _remember(self, key, explanation):
+        self._cache[key] = explanation
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_cache_size:
+            self._cache.popitem(last=False)
+
+    def _generate(self, error_messages):
+        # One backend call for a batch of distinct error messages
+        prompts = [PROMPT_TEMPLATE.format(error_message=error_message) for error_message in error_messages]
+        return self.backend.generate(prompts, shared_prefix=PROMPT_PREFIX)
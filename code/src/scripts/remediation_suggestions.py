@@ -1,17 +1,179 @@
 # scripts/remediation_suggestions.py
 
+import asyncio
+import random
+import re
+import time
+
 import openai
 
-openai.api_key = 'your-api-key'
+# The completions model that replaced text-davinci-003. The API key is read from OPENAI_API_KEY.
+DEFAULT_MODEL = "gpt-3.5-turbo-instruct"
+PROMPT_TEMPLATE = "Given the following data issue: {data_issue}, suggest remediation actions."
+# Errors worth another attempt: rate limits, timeouts, dropped connections and server errors
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)
+
+
+class TokenBucket:
+    # Rate limiter: holds up to `capacity` units, refilled at `rate` units per second. acquire(n)
+    # waits until n units are available and takes them, so callers proceed at the rate on average,
+    # with bursts of at most `capacity`.
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount=1):
+        amount = min(amount, self.capacity)  # A request larger than a full bucket waits for a full bucket
+        async with self._lock:  # First come, first served
+            self._refill()
+            while self.tokens < amount:
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= amount
+
+
+class RemediationClient:
+    # Asynchronous remediation suggestions from a hosted completions model.
+    #
+    # - One AsyncOpenAI client, so requests share its pool of keep-alive HTTP connections.
+    # - At most max_concurrency requests in flight (a semaphore).
+    # - Optional token buckets for the provider's requests-per-minute and tokens-per-minute limits
+    #   (a request's tokens are estimated as max_tokens plus a quarter of its prompt's characters).
+    # - Up to batch_size issues per request, as one completions call with a list of prompts.
+    # - Failed requests are retried up to max_retries times for rate limits, timeouts, connection and
+    #   server errors, waiting exponentially longer with full jitter, or as long as Retry-After says.
+    # - Identical issues (after whitespace normalization) are requested once: later and concurrent
+    #   callers wait for the same result, and results are remembered for the client's lifetime.
+    #
+    # Use it as an async context manager (or call close()) to release the connections.
+
+    def __init__(self, client=None, model=DEFAULT_MODEL, max_tokens=100, max_concurrency=8, batch_size=8,
+                 requests_per_minute=None, tokens_per_minute=None, max_retries=5, backoff=0.5, max_backoff=30.0,
+                 timeout=30.0, base_url=None, api_key=None):
+        self.client = client or openai.AsyncOpenAI(api_key=api_key, base_url=base_url, timeout=timeout, max_retries=0)
+        self.model = model
+        self.max_tokens = max_tokens
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._request_bucket = TokenBucket(requests_per_minute / 60) if requests_per_minute else None
+        self._token_bucket = TokenBucket(tokens_per_minute / 60) if tokens_per_minute else None
+        self._results = {}  # Normalized issue -> Future of its suggestion
+        self.requests = 0
+        self.retries = 0
+        self.coalesced = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        await self.client.close()
+
+    async def suggest(self, data_issue):
+        return (await self.suggest_many([data_issue]))[0]
+
+    async def suggest_many(self, data_issues):
+        # Suggestions for a list of issues, in the same order. Issues not seen before are requested in
+        # batches, concurrently; a failed batch raises here and in every caller waiting for it.
+        # Same whitespace normalization as remediation_explainer, without loading pandas and the kernel
+        keys = [re.sub(r'\s+', ' ', str(data_issue)).strip() for data_issue in data_issues]
+        loop = asyncio.get_running_loop()
+        new_keys = [key for key in dict.fromkeys(keys) if key not in self._results]
+        for key in new_keys:
+            self._results[key] = loop.create_future()
+        self.coalesced += len(keys) - len(new_keys)
+        futures = {key: self._results[key] for key in dict.fromkeys(keys)}
+        batches = [new_keys[start:start + self.batch_size] for start in range(0, len(new_keys), self.batch_size)]
+        await asyncio.gather(*(self._request_batch(batch) for batch in batches))
+        suggestions = dict(zip(futures, await asyncio.gather(*futures.values(), return_exceptions=True)))
+        for suggestion in suggestions.values():
+            if isinstance(suggestion, BaseException):
+                raise suggestion
+        return [suggestions[key] for key in keys]
+
+    async def _request_batch(self, keys):
+        # Resolve the batch's futures; failed issues are forgotten so a later call tries them again
+        try:
+            suggestions = await self._complete([PROMPT_TEMPLATE.format(data_issue=key) for key in keys])
+        except asyncio.CancelledError:
+            for key in keys:
+                self._results.pop(key).cancel()
+            raise
+        except Exception as e:
+            for key in keys:
+                self._results.pop(key).set_exception(e)
+            return
+        for key, suggestion in zip(keys, suggestions):
+            self._results[key].set_result(suggestion)
+        if len(suggestions) < len(keys):
+            # A response short of choices would otherwise leave its callers waiting forever
+            error = RuntimeError(f"Expected {len(keys)} completions, got {len(suggestions)}")
+            for key in keys[len(suggestions):]:
+                self._results.pop(key).set_exception(error)
+
+    async def _complete(self, prompts):
+        # One completions request for a list of prompts, rate limited and retried
+        for attempt in range(self.max_retries + 1):
+            # Every attempt counts against the provider's limits
+            if self._request_bucket:
+                await self._request_bucket.acquire()
+            if self._token_bucket:
+                await self._token_bucket.acquire(sum(self.max_tokens + len(prompt) // 4 for prompt in prompts))
+            try:
+                async with self._semaphore:
+                    self.requests += 1
+                    response = await self.client.completions.create(model=self.model, prompt=prompts,
+                                                                    max_tokens=self.max_tokens)
+                choices = sorted(response.choices, key=lambda choice: choice.index)
+                return [choice.text.strip() for choice in choices]
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                self.retries += 1
+                await asyncio.sleep(self._retry_delay(e, attempt))
+
+    def _retry_delay(self, error, attempt):
+        response = getattr(error, 'response', None)
+        retry_after = response.headers.get('retry-after') if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.max_backoff)
+            except ValueError:
+                pass  # An HTTP date; fall back to backoff
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def stats(self):
+        return {'requests': self.requests, 'retries': self.retries, 'coalesced': self.coalesced,
+                'suggestions': sum(1 for future in self._results.values() if future.done())}
+
+
+async def generate_remediation_suggestions_async(data_issues, **options):
+    # Suggestions for many issues with a short-lived client; `options` go to RemediationClient
+    async with RemediationClient(**options) as client:
+        return await client.suggest_many(data_issues)
+
+
+def generate_remediation_suggestions_many(data_issues, **options):
+    return asyncio.run(generate_remediation_suggestions_async(data_issues, **options))
+
+
+def generate_remediation_suggestions(data_issue, **options):
+    return generate_remediation_suggestions_many([data_issue], **options)[0]
 
-def generate_remediation_suggestions(data_issue):
-    prompt = f"Given the following data issue: {data_issue}, suggest remediation actions."
-    response = openai.Completion.create(
-      model="text-davinci-003",
-      prompt=prompt,
-      max_tokens=100
-    )
-    return response.choices[0].text.strip()
 
 if __name__ == "__main__":
     data_issue = "Transaction Amount is 12000, which exceeds the allowable limit."
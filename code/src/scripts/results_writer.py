@@ -0,0 +1,129 @@
+import json
+
+import numpy as np
+import pandas as pd
+from generated_validation_code import RULES
+
+OUTPUT_FORMATS = ('csv', 'parquet', 'arrow')
+
+
+class CsvResultsWriter:
+    # One CSV row per input row: row number, Customer_ID, one True/False column per rule and risk_score
+
+    def __init__(self, path):
+        self.path = path
+        self.rows = 0
+        self._file = open(path, 'w', newline='')
+
+    def write(self, chunk, results):
+        results = results.copy()
+        if 'Customer_ID' in chunk:
+            results.insert(0, 'Customer_ID', chunk['Customer_ID'])
+        results.to_csv(self._file, header=self.rows == 0, index=True, index_label='Row')
+        self.rows += len(results)
+
+    def close(self):
+        self._file.close()
+
+
+class ColumnarResultsWriter:
+    # Compact columnar results (Parquet, or the Arrow IPC stream format), written chunk by chunk.
+    #
+    # Each row stores only its row number, Customer_ID, risk_score and the list of rule IDs it
+    # violated. Customer_ID and the rule IDs are dictionary-encoded; the error and remediation text of
+    # every rule is stored once, in the file's schema metadata (see load_rule_texts).
+
+    def __init__(self, path, output_format='parquet', rules=None):
+        import pyarrow as pa
+
+        self.pa = pa
+        self.path = path
+        self.output_format = output_format
+        self.rows = 0
+        rules = RULES if rules is None else rules
+        self.rule_ids = [rule[0] for rule in rules]
+        self._rule_dictionary = pa.array(self.rule_ids, type=pa.string())
+        # Narrowest index type that can address every rule (profiled range rules can be many)
+        self._rule_index = next(dtype for dtype in (np.int8, np.int16, np.int32)
+                                if len(self.rule_ids) <= np.iinfo(dtype).max + 1)
+        rules = [{'id': rule_id, 'error': error, 'remediation': action} for rule_id, error, action, _ in rules]
+        self.schema = pa.schema([
+            ('row', pa.int64()),
+            ('Customer_ID', pa.dictionary(pa.int32(), pa.string())),
+            ('risk_score', pa.int32()),
+            ('violations', pa.list_(pa.dictionary(pa.from_numpy_dtype(self._rule_index), pa.string()))),
+        ], metadata={'validation_rules': json.dumps(rules)})
+
+        if output_format == 'parquet':
+            import pyarrow.parquet as pq
+            self._writer = pq.ParquetWriter(path, self.schema, compression='zstd')
+        elif output_format == 'arrow':
+            self._sink = pa.OSFile(path, 'wb')
+            # The stream format (unlike the IPC file format) lets every batch carry its own Customer_ID dictionary
+            self._writer = pa.ipc.new_stream(self._sink, self.schema)
+        else:
+            raise ValueError(f"Unknown columnar format '{output_format}', expected 'parquet' or 'arrow'")
+
+    def write(self, chunk, results):
+        pa = self.pa
+        masks = results[self.rule_ids].to_numpy(dtype=bool)
+
+        # Violated rule IDs per row as one list array: offsets from the per-row counts, values from
+        # the column positions of the set mask bits (np.nonzero walks the rows in order)
+        offsets = np.zeros(len(masks) + 1, dtype=np.int32)
+        np.cumsum(masks.sum(axis=1), out=offsets[1:])
+        rule_positions = np.nonzero(masks)[1].astype(self._rule_index)
+        violations = pa.ListArray.from_arrays(
+            pa.array(offsets), pa.DictionaryArray.from_arrays(pa.array(rule_positions), self._rule_dictionary))
+
+        if 'Customer_ID' in chunk:
+            customer_ids = chunk['Customer_ID']
+            if isinstance(customer_ids.dtype, pd.CategoricalDtype):
+                # Only this chunk's IDs, not every category of a dataset-wide ID dictionary
+                customer_ids = customer_ids.to_numpy()
+            customer_ids = pa.array(customer_ids, from_pandas=True)
+            if isinstance(customer_ids, pa.ChunkedArray):  # Arrow-backed string columns come back chunked
+                customer_ids = customer_ids.combine_chunks()
+            customer_ids = customer_ids.cast(pa.string()).dictionary_encode()
+            customer_ids = customer_ids.cast(self.schema.field('Customer_ID').type)
+        else:
+            customer_ids = pa.nulls(len(chunk), type=self.schema.field('Customer_ID').type)
+
+        batch = pa.RecordBatch.from_arrays([
+            pa.array(results.index.to_numpy(), type=pa.int64()),
+            customer_ids,
+            pa.array(results['risk_score'].to_numpy()).cast(pa.int32()),
+            violations,
+        ], schema=self.schema)
+        self._writer.write_batch(batch)
+        self.rows += len(results)
+
+    def close(self):
+        self._writer.close()
+        if self.output_format == 'arrow':
+            self._sink.close()
+
+
+def open_results_writer(path, output_format='csv', rules=None):
+    if output_format == 'csv':
+        return CsvResultsWriter(path)
+    if output_format in ('parquet', 'arrow'):
+        return ColumnarResultsWriter(path, output_format, rules)
+    raise ValueError(f"Unknown output format '{output_format}', expected one of {OUTPUT_FORMATS}")
+
+
+def read_results(path, output_format='parquet', columns=None):
+    # Load a columnar results file as a pyarrow Table (call .to_pandas() for a DataFrame)
+    import pyarrow as pa
+    if output_format == 'parquet':
+        import pyarrow.parquet as pq
+        return pq.read_table(path, columns=columns)
+    with pa.memory_map(path) as source:
+        table = pa.ipc.open_stream(source).read_all()
+    return table.select(columns) if columns else table
+
+
+def load_rule_texts(table):
+    # {rule id: (error, remediation)} from a columnar results file's metadata
+    rules = json.loads(table.schema.metadata[b'validation_rules'])
+    return {rule['id']: (rule['error'], rule['remediation']) for rule in rules}
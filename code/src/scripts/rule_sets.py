@@ -0,0 +1,34 @@
+import importlib.util
+import json
+import os
+import types
+
+import generated_validation_code
+from generate_validation_code import render_validation_code
+
+# Rule set modules already loaded in this process, by absolute path
+_rule_sets = {}
+
+
+def load_rule_set(path=None):
+    # Validation module for a rule set. None is the default generated_validation_code; otherwise
+    # `path` is either a module written by generate_validation_code.generate_code, or a JSON file
+    # holding a VALIDATION_RULES-style list, which is compiled into a kernel on the fly.
+    # The module provides validate_frame, frame_messages, RULES and RULE_IDS.
+    if path is None:
+        return generated_validation_code
+    path = os.path.abspath(path)
+    if path not in _rule_sets:
+        name = f"rule_set_{os.path.splitext(os.path.basename(path))[0]}"
+        if path.endswith('.json'):
+            with open(path) as file:
+                source = render_validation_code(json.load(file))
+            module = types.ModuleType(name)
+            module.__file__ = path
+            exec(compile(source, path, 'exec'), module.__dict__)
+        else:
+            spec = importlib.util.spec_from_file_location(name, path)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+        _rule_sets[path] = module
+    return _rule_sets[path]
@@ -0,0 +1,123 @@
+import queue
+import threading
+import time
+
+_DONE = object()  # Sent down the queues after the last item
+
+
+class Stage:
+    # One step of a StagedPipeline: function(item) returns the item for the next stage (None passes
+    # nothing on). rows(item) counts the rows an input item stands for (default len(item)), for
+    # rows/sec.
+
+    def __init__(self, name, function, rows=len):
+        self.name = name
+        self.function = function
+        self.rows = rows
+        self.items = 0
+        self.rows_processed = 0
+        self.busy_seconds = 0.0
+        self.blocked_seconds = 0.0  # Waiting for room in the next stage's queue (backpressure)
+
+    def stats(self):
+        return {'items': self.items, 'rows': self.rows_processed, 'busy_seconds': round(self.busy_seconds, 4),
+                'blocked_seconds': round(self.blocked_seconds, 4),
+                'rows_per_sec': round(self.rows_processed / self.busy_seconds, 1) if self.busy_seconds else None}
+
+
+class StagedPipeline:
+    # Runs each stage on its own thread, connected by bounded queues: the first stage takes items
+    # from the source, each later stage from the queue in front of it, in order.
+    #
+    # A fast stage runs ahead of a slow one until the queue between them is full, then waits, so
+    # at most queue_size items are buffered per queue however large the source is. If a stage
+    # raises, the source stops, the remaining items are discarded and run() re-raises the error.
+    # stats() can be called from any thread while the pipeline runs; with a ValidationMetrics,
+    # every stage's time and rows are also recorded as stages, and queue depths as gauges.
+
+    def __init__(self, stages, queue_size=4, metrics=None):
+        self.stages = stages
+        self.queue_size = queue_size
+        self.metrics = metrics
+        # queues[i] feeds stages[i + 1]
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in stages[1:]]
+        self.peak_depths = [0] * len(self.queues)
+        self._failed = threading.Event()
+        self._error = None
+
+    def run(self, source):
+        threads = [threading.Thread(target=self._run_stage, args=(position, source), name=f"stage-{stage.name}",
+                                    daemon=True)
+                   for position, stage in enumerate(self.stages)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if self._error is not None:
+            raise self._error
+        return self.stats()
+
+    def _items(self, position, source):
+        if position == 0:
+            for item in source:
+                if self._failed.is_set():
+                    return
+                yield item
+            return
+        while True:
+            item = self.queues[position - 1].get()
+            if item is _DONE:
+                return
+            yield item
+
+    def _run_stage(self, position, source):
+        stage = self.stages[position]
+        output = self.queues[position] if position < len(self.queues) else None
+        try:
+            for item in self._items(position, source):
+                if self._failed.is_set():
+                    continue  # Keep draining so the stages before this one can finish
+                started = time.perf_counter()
+                try:
+                    result = stage.function(item)
+                except Exception as e:
+                    self._fail(e)
+                    continue
+                seconds = time.perf_counter() - started
+                rows = stage.rows(item)
+                stage.items += 1
+                stage.rows_processed += rows
+                stage.busy_seconds += seconds
+                if self.metrics is not None:
+                    self.metrics.record_stage(stage.name, seconds, rows)
+                if output is not None and result is not None:
+                    started = time.perf_counter()
+                    output.put(result)
+                    stage.blocked_seconds += time.perf_counter() - started
+                    self._record_depth(position)
+        except Exception as e:  # The source itself failed
+            self._fail(e)
+        finally:
+            if output is not None:
+                output.put(_DONE)
+
+    def _fail(self, error):
+        if not self._failed.is_set():
+            self._error = error
+            self._failed.set()
+
+    def _record_depth(self, position):
+        depth = self.queues[position].qsize()
+        self.peak_depths[position] = max(self.peak_depths[position], depth)
+        if self.metrics is not None:
+            self.metrics.record_queue_depth(self.stages[position + 1].name, depth, self.queue_size)
+
+    def stats(self):
+        # Per stage: items, rows, busy/blocked seconds, rows/sec, and the depth of its input queue
+        stats = {}
+        for position, stage in enumerate(self.stages):
+            stats[stage.name] = stage.stats()
+            if position:
+                stats[stage.name]['queue'] = {'depth': self.queues[position - 1].qsize(),
+                                              'peak': self.peak_depths[position - 1], 'capacity': self.queue_size}
+        return stats
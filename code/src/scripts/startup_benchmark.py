@@ -0,0 +1,68 @@
+import json
+import os
+import subprocess
+import sys
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Each probe runs in a fresh interpreter so module caches from earlier probes do not hide import cost
+_IMPORT_PROBE = """
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(elapsed, 'torch' in sys.modules, 'transformers' in sys.modules)
+"""
+
+_FIRST_VALIDATION_PROBE = """
+import time
+start = time.perf_counter()
+from generated_validation_code import validate_data
+imported = time.perf_counter()
+validate_data({'Customer_ID': 'C001', 'Transaction_Amount': 100.0, 'Reported_Amount': 100.0,
+               'Transaction_Date': '2025-03-20', 'Currency': 'USD'})
+print(imported - start, time.perf_counter() - imported)
+"""
+
+_FIRST_EXPLANATION_PROBE = """
+import time
+import model_loader
+from remediation_explainer import ExplanationService
+start = time.perf_counter()
+model_loader.load_model('gpt2')
+loaded = time.perf_counter()
+service = ExplanationService(*model_loader.load_model('gpt2'))
+service.explain('Transaction Amount must match Reported Amount')
+print(loaded - start, time.perf_counter() - loaded)
+"""
+
+
+def _run_probe(code):
+    completed = subprocess.run([sys.executable, '-c', code], cwd=SCRIPTS_DIR, capture_output=True, text=True, check=True)
+    return completed.stdout.split()
+
+
+def measure_import(module):
+    seconds, torch_loaded, transformers_loaded = _run_probe(_IMPORT_PROBE.format(module=module))
+    return {'seconds': float(seconds), 'imports_torch': torch_loaded == 'True',
+            'imports_transformers': transformers_loaded == 'True'}
+
+
+def run_startup_benchmark(include_model=True):
+    # Import-time cost of the entry modules plus first-call latency of rule validation and,
+    # optionally, of the first GPT-2 explanation (model load + generation)
+    results = {
+        'import': {module: measure_import(module)
+                   for module in ('generated_validation_code', 'validate_data', 'remediation_explainer', 'homepage')},
+    }
+    import_seconds, first_call_seconds = _run_probe(_FIRST_VALIDATION_PROBE)
+    results['first_validation'] = {'import_seconds': float(import_seconds), 'first_call_seconds': float(first_call_seconds)}
+    if include_model:
+        load_seconds, first_explanation_seconds = _run_probe(_FIRST_EXPLANATION_PROBE)
+        results['first_explanation'] = {'model_load_seconds': float(load_seconds),
+                                        'first_generate_seconds': float(first_explanation_seconds)}
+    return results
+
+
+if __name__ == "__main__":
+    print(json.dumps(run_startup_benchmark(include_model='--no-model' not in sys.argv), indent=2))
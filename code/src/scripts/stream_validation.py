@@ -0,0 +1,131 @@
+import time
+from collections import Counter
+from datetime import datetime
+
+import pandas as pd
+from generated_validation_code import DEFAULT_DATE_FORMAT
+from results_writer import open_results_writer
+from rule_sets import load_rule_set
+
+# Explicit column types for transaction extracts, so chunks never fall back to type inference
+# (which needs to see the whole column) and every chunk gets the same schema
+TRANSACTION_DTYPES = {
+    'Customer_ID': str,
+    'Transaction_Amount': 'float64',
+    'Transaction_Date': str,
+    'Account_Balance': 'float64',
+    'Reported_Amount': 'float64',
+    'Currency': str,
+    'Country': str,
+    'Account_Flag': str,
+    'Risk_Score': 'float64',
+}
+
+DEFAULT_CHUNKSIZE = 100_000
+
+
+class ValidationSummary:
+    # Running totals over every chunk validated so far
+
+    def __init__(self, rule_ids=None):
+        self.rule_ids = list(load_rule_set().RULE_IDS if rule_ids is None else rule_ids)
+        self.rows = 0
+        self.violations = {rule_id: 0 for rule_id in self.rule_ids}
+        self.risk_histogram = Counter()
+
+    def update(self, results):
+        self.rows += len(results)
+        counts = results[self.rule_ids].sum()
+        for rule_id in self.rule_ids:
+            self.violations[rule_id] += int(counts[rule_id])
+        for risk_score, count in results['risk_score'].value_counts().items():
+            self.risk_histogram[risk_score.item() if hasattr(risk_score, 'item') else risk_score] += int(count)
+
+    def as_dict(self):
+        return {
+            'rows': self.rows,
+            'violations': dict(self.violations),
+            'risk_histogram': dict(sorted(self.risk_histogram.items())),
+        }
+
+
+def read_csv_chunks(input_path, chunksize=DEFAULT_CHUNKSIZE, dtypes=None):
+    # Read a CSV in bounded-size chunks with explicit dtypes for the columns the file actually has
+    dtypes = TRANSACTION_DTYPES if dtypes is None else dtypes
+    columns = pd.read_csv(input_path, nrows=0).columns
+    dtype = {column: dtypes[column] for column in columns if column in dtypes}
+    return pd.read_csv(input_path, dtype=dtype, chunksize=chunksize)
+
+
+def timed_chunks(chunks, timings, stage='read', metrics=None):
+    # Iterate over chunks, adding the time spent producing each one to timings[stage] (and to
+    # metrics, if given)
+    chunks = iter(chunks)
+    while True:
+        started = time.perf_counter()
+        chunk = next(chunks, None)
+        seconds = time.perf_counter() - started
+        timings[stage] = timings.get(stage, 0.0) + seconds
+        if chunk is None:
+            return
+        if metrics is not None:
+            metrics.record_stage(stage, seconds, len(chunk))
+        yield chunk
+
+
+def validate_csv_stream(input_path, output_path, historic_violations=None, max_days_old=180,
+                        chunksize=DEFAULT_CHUNKSIZE, dtypes=None, reference_time=None,
+                        date_format=DEFAULT_DATE_FORMAT, output_format='csv', rule_set=None,
+                        on_chunk=None, timings=None, metrics=None, id_dictionary=None, incremental=None):
+    # Validate a CSV chunk by chunk, appending each chunk's results to output_path (csv, parquet or
+    # arrow, see results_writer) as soon as it is done. Only one chunk is held in memory at a time,
+    # so peak memory follows chunksize, not file size. Output rows are keyed by their row number in
+    # the input file. Every chunk is checked against the same reference_time, taken once at the
+    # start of the run unless given.
+    #
+    # rule_set selects the rules (see rule_sets.load_rule_set), on_chunk(chunk, results) is called
+    # after each chunk, and seconds spent reading, validating and writing are added to `timings`.
+    # metrics (an instrumentation.ValidationMetrics) additionally gets per-rule and per-stage counters.
+    # With an id_dictionary.DatasetDictionary, ID columns are dictionary-encoded as they are read
+    # (counted as read time), so rules and historic lookups work on integer codes. With an
+    # incremental_validation.RowFingerprintIndex, only rows that are new or changed since the last
+    # run are validated; the index is updated once the whole file has been written.
+    rules = load_rule_set(rule_set)
+    timings = {} if timings is None else timings
+    reference_time = reference_time or datetime.now()
+    summary = ValidationSummary(rules.RULE_IDS)
+    writer = open_results_writer(output_path, output_format, rules.RULES)
+    if incremental is not None:
+        incremental.begin(rules, reference_time, max_days_old, date_format)
+    chunks = read_csv_chunks(input_path, chunksize, dtypes)
+    if id_dictionary is not None:
+        chunks = map(id_dictionary.encode_frame, chunks)
+    try:
+        for chunk in timed_chunks(chunks, timings, metrics=metrics):
+            started = time.perf_counter()
+            if incremental is None:
+                results = rules.validate_frame(chunk, historic_violations, max_days_old, reference_time, date_format,
+                                               metrics)
+            else:
+                results = incremental.validate_frame(chunk, historic_violations, metrics)
+            validated = time.perf_counter()
+            writer.write(chunk, results)
+            written = time.perf_counter()
+            timings['validate'] = timings.get('validate', 0.0) + validated - started
+            timings['write'] = timings.get('write', 0.0) + written - validated
+            if metrics is not None:
+                metrics.record_stage('validate', validated - started, len(chunk))
+                metrics.record_stage('write', written - validated, len(chunk))
+            summary.update(results)
+            if on_chunk:
+                on_chunk(chunk, results)
+    finally:
+        writer.close()
+    if incremental is not None:
+        incremental.commit()
+    return summary
+
+
+if __name__ == "__main__":
+    summary = validate_csv_stream('../data/example_data.csv', 'validation_results.csv', chunksize=2)
+    print(summary.as_dict())
@@ -0,0 +1,110 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# Share of rows that break each rule (rules are broken independently, so a row can break several)
+DEFAULT_VIOLATION_RATES = {
+    'amount_mismatch': 0.05,
+    'cross_currency_deviation': 0.02,
+    'negative_balance': 0.03,
+    'invalid_date': 0.005,
+    'future_date': 0.01,
+    'stale_date': 0.05,
+    'invalid_currency': 0.01,
+    'cross_border_limit': 0.01,
+    'historic_violations': 0.02,
+}
+
+CURRENCIES = np.array(['USD', 'EUR', 'GBP', 'JPY', 'CHF', 'CAD', 'AUD', 'INR'])
+COUNTRIES = np.array(['US', 'DE', 'GB', 'JP', 'CH', 'CA', 'AU', 'IN'])
+
+
+def generate_transactions(rows, seed=0, violation_rates=None, reference_time=None, max_days_old=180,
+                          customers=None, start_row=0):
+    # Seeded synthetic transactions with the example_data.csv schema (plus the Account_Flag,
+    # is_cross_currency and is_cross_border columns the rules read). Returns (data, historic_violations).
+    # The same seed, rows and start_row always give the same data, so chunks of a large file can be
+    # generated independently.
+    rates = dict(DEFAULT_VIOLATION_RATES, **(violation_rates or {}))
+    reference_time = pd.Timestamp(reference_time or datetime.now()).normalize()
+    customers = customers or max(rows // 10, 1)
+    rng = np.random.default_rng([seed, start_row])
+
+    def pick(rule):
+        return rng.random(rows) < rates.get(rule, 0.0)
+
+    customer_numbers = rng.integers(0, customers, rows)
+    customer_ids = pd.Series(customer_numbers).map('CUST{:08d}'.format)
+    amount = np.round(rng.uniform(1, 4999, rows), 2)
+    balance = np.round(rng.uniform(0, 100000, rows), 2)
+
+    # Cross-border transactions over the limit
+    is_cross_border = rng.random(rows) < 0.2
+    over_limit = pick('cross_border_limit')
+    is_cross_border |= over_limit
+    amount[over_limit] = np.round(rng.uniform(5001, 20000, over_limit.sum()), 2)
+
+    # Reported amounts: exact, within the cross-currency tolerance, or broken on purpose
+    deviation = pick('cross_currency_deviation')
+    is_cross_currency = (rng.random(rows) < 0.2) | deviation
+    reported = amount.copy()
+    reported[is_cross_currency] = np.round(amount[is_cross_currency] * rng.uniform(0.998, 1.002, is_cross_currency.sum()), 2)
+    reported[deviation] = np.round(amount[deviation] * 1.05, 2)
+    mismatch = pick('amount_mismatch') & ~is_cross_currency
+    reported[mismatch] = amount[mismatch] + 10
+
+    # Negative balances, half of which are legitimate overdrafts
+    negative = rng.random(rows) < rates.get('negative_balance', 0.0) * 2
+    balance[negative] = -balance[negative]
+    account_flag = np.where(negative & (rng.random(rows) < 0.5), 'OD', '')
+    account_flag = pd.Series(account_flag).replace('', None)
+
+    # Dates within max_days_old, or in the future / too old / unparseable for violating rows
+    age_days = rng.integers(0, max_days_old, rows)
+    stale = pick('stale_date')
+    age_days[stale] = rng.integers(max_days_old + 1, max_days_old * 3, stale.sum())
+    future = pick('future_date')
+    age_days[future] = -rng.integers(1, 30, future.sum())
+    dates = (reference_time - pd.to_timedelta(age_days, unit='D')).strftime('%Y-%m-%d').to_numpy(dtype=object)
+    dates[pick('invalid_date')] = 'not-a-date'
+
+    currency = CURRENCIES[rng.integers(0, len(CURRENCIES), rows)].astype(object)
+    currency[pick('invalid_currency')] = 'XXZ'
+
+    data = pd.DataFrame({
+        'Customer_ID': customer_ids,
+        'Transaction_Amount': amount,
+        'Transaction_Date': dates,
+        'Account_Balance': balance,
+        'Reported_Amount': reported,
+        'Currency': currency,
+        'Country': COUNTRIES[rng.integers(0, len(COUNTRIES), rows)],
+        'Risk_Score': rng.integers(0, 10, rows),
+        'Account_Flag': account_flag,
+        'is_cross_currency': is_cross_currency,
+        'is_cross_border': is_cross_border,
+    }, index=pd.RangeIndex(start_row, start_row + rows))
+
+    # Previous violations for a share of the customers
+    history_rng = np.random.default_rng(seed)
+    repeat_customers = np.flatnonzero(history_rng.random(customers) < rates.get('historic_violations', 0.0))
+    historic_violations = {f'CUST{number:08d}': int(history_rng.integers(1, 5)) for number in repeat_customers}
+    return data, historic_violations
+
+
+def write_transactions_csv(path, rows, seed=0, chunk_rows=1_000_000, **options):
+    # Write a synthetic file of any size chunk by chunk; returns historic_violations for it
+    historic_violations = {}
+    options.setdefault('customers', max(rows // 10, 1))
+    for start_row in range(0, rows, chunk_rows):
+        data, historic_violations = generate_transactions(min(chunk_rows, rows - start_row), seed,
+                                                          start_row=start_row, **options)
+        data.to_csv(path, mode='w' if start_row == 0 else 'a', header=start_row == 0, index=False)
+    return historic_violations
+
+
+if __name__ == "__main__":
+    data, historic_violations = generate_transactions(10_000, seed=42)
+    data.to_csv('synthetic_transactions.csv', index=False)
+    print(f"Wrote {len(data):,} rows to 'synthetic_transactions.csv' ({len(historic_violations)} customers with history)")
@@ -0,0 +1,270 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import resource
+import sys
+import time
+from datetime import datetime
+
+from aggregate_rules import WindowedAggregates
+from generated_validation_code import DEFAULT_DATE_FORMAT
+from historic_store import HistoricViolationsStore, run_violations
+from id_dictionary import DatasetDictionary
+from incremental_validation import RowFingerprintIndex
+from instrumentation import ValidationMetrics, timed_stage
+from parallel_validation import validate_csv_parallel
+from rule_sets import load_rule_set
+from stream_validation import validate_csv_stream, DEFAULT_CHUNKSIZE
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Validate transaction CSV files without the UI.")
+    parser.add_argument('inputs', nargs='+', help="Input CSV paths or glob patterns")
+    parser.add_argument('--rules', default=None,
+                        help="Rule set: a generated validation module (.py) or a JSON rule spec (default: generated_validation_code)")
+    parser.add_argument('--output-dir', default='validation_results', help="Directory for result files")
+    parser.add_argument('--format', choices=('csv', 'parquet', 'arrow'), default='csv', help="Result file format")
+    parser.add_argument('--workers', type=int, default=1, help="Worker processes (1 validates in this process)")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNKSIZE, help="Rows per chunk")
+    parser.add_argument('--historic-violations', default=None,
+                        help="Previous violation counts per Customer_ID: a JSON file, or a SQLite store "
+                             "(.sqlite3/.db, see historic_store.py) for large histories")
+    parser.add_argument('--record-violations', action='store_true',
+                        help="Add this run's violations to the SQLite --historic-violations store")
+    parser.add_argument('--max-days-old', type=int, default=180)
+    parser.add_argument('--reference-date', default=None,
+                        help="Judge future/stale dates against this date (YYYY-MM-DD) instead of now")
+    parser.add_argument('--date-format', default=DEFAULT_DATE_FORMAT)
+    parser.add_argument('--explain', action=argparse.BooleanOptionalAction, default=False,
+                        help="Generate GPT-2 explanations for every distinct error")
+    parser.add_argument('--explain-backend', choices=('cpu', 'transformers'), default='cpu',
+                        help="'cpu': int8 GPT-2 with a cached prompt prefix; 'transformers': full-precision generate()")
+    parser.add_argument('--explain-threads', type=int, default=None,
+                        help="Intra-op threads for the explanation model (default: one per physical core)")
+    parser.add_argument('--report', default=None, help="Also write the run report as JSON to this path")
+    parser.add_argument('--metrics', default=None,
+                        help="Record per-rule and per-stage metrics and write them to this path "
+                             "(Prometheus text format for .prom files, a JSON snapshot otherwise)")
+    parser.add_argument('--id-dictionary', default=None,
+                        help="Dictionary-encode Customer_ID, Currency and Country with the ID dictionary kept in "
+                             "this JSON file (created if missing, updated after the run); single process only")
+    parser.add_argument('--incremental-index', default=None,
+                        help="Directory of per-file row fingerprint indexes: only rows that are new or changed "
+                             "since the last run are validated; single process only")
+    parser.add_argument('--aggregate-state', default=None,
+                        help="Directory checkpointing per-customer windowed aggregates (daily cross-border totals, "
+                             "transaction velocity) across runs; feed every transaction once; single process only")
+    parser.add_argument('--aggregate-lateness', default='0D',
+                        help="How far back (e.g. 30D) Transaction_Date may jump in file order and still be "
+                             "aggregated exactly")
+    args = parser.parse_args(argv)
+    if args.id_dictionary and args.workers > 1:
+        parser.error("--id-dictionary cannot be combined with --workers > 1")
+    if args.incremental_index and args.workers > 1:
+        parser.error("--incremental-index cannot be combined with --workers > 1")
+    if args.aggregate_state and args.workers > 1:
+        parser.error("--aggregate-state cannot be combined with --workers > 1")
+    if args.record_violations and not is_sqlite_store(args.historic_violations):
+        parser.error("--record-violations needs a SQLite --historic-violations store")
+    return args
+
+
+def expand_inputs(patterns):
+    # Paths and glob patterns to a sorted, de-duplicated list of files
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        if not matches:
+            raise FileNotFoundError(f"No input files match '{pattern}'")
+        paths.extend(matches)
+    return list(dict.fromkeys(paths))
+
+
+def incremental_index_path(index_root, input_path):
+    # One index per input file, keyed on its resolved path so same-named files in different
+    # directories keep separate indexes; the file name is kept for readability
+    name = os.path.splitext(os.path.basename(input_path))[0]
+    digest = hashlib.sha256(os.path.realpath(input_path).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(index_root, f"{name}-{digest}")
+
+
+def is_sqlite_store(path):
+    return bool(path) and path.endswith(('.sqlite3', '.db'))
+
+
+def load_historic_violations(path):
+    if not path:
+        return {}
+    if is_sqlite_store(path):
+        return HistoricViolationsStore(path)
+    with open(path) as file:
+        return json.load(file)
+
+
+def peak_rss_mb():
+    # Peak resident set size of this process and of its (finished) worker processes, in MB
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024  # ru_maxrss is bytes on macOS, KB on Linux
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / divisor
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / divisor
+    return {'process': round(own, 1), 'largest_worker': round(children, 1)}
+
+
+def run(args):
+    started = time.perf_counter()
+    rules = load_rule_set(args.rules)
+    historic_violations = load_historic_violations(args.historic_violations)
+    reference_time = datetime.strptime(args.reference_date, '%Y-%m-%d') if args.reference_date else datetime.now()
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    # Distinct error messages across all files, explained once at the end
+    distinct_errors = set()
+
+    def collect_errors(chunk, results):
+        violated = results[rules.RULE_IDS].any(axis=1).to_numpy()
+        if violated.any():
+            for errors, _, _ in rules.frame_messages(chunk[violated], results[violated], historic_violations,
+                                                     args.max_days_old, args.date_format):
+                distinct_errors.update(errors)
+
+    def record_violations(chunk, results):
+        historic_violations.record(run_violations(chunk, results, rules.RULE_IDS))
+
+    aggregates = WindowedAggregates(directory=args.aggregate_state, date_format=args.date_format,
+                                    lateness=args.aggregate_lateness) if args.aggregate_state else None
+    aggregate_violations = []
+    current = {}
+
+    def check_aggregates(chunk, results):
+        # Violating rows of the windowed aggregate rules, with their errors
+        aggregate_started = time.perf_counter()
+        aggregate_results = aggregates.validate_frame(chunk, reference_time)
+        timings['aggregate'] = timings.get('aggregate', 0.0) + time.perf_counter() - aggregate_started
+        violated = aggregate_results[aggregates.rule_ids].any(axis=1).to_numpy()
+        if violated.any():
+            messages = aggregates.frame_messages(chunk[violated], aggregate_results[violated])
+            for row, customer_id, (errors, _, risk_score) in zip(chunk.index[violated],
+                                                                   chunk['Customer_ID'][violated], messages):
+                aggregate_violations.append({'input': current['input'], 'row': int(row),
+                                             'Customer_ID': str(customer_id), 'errors': errors,
+                                             'risk_score': int(risk_score)})
+
+    chunk_callbacks = [callback for callback, enabled in ((collect_errors, args.explain),
+                                                          (record_violations, args.record_violations),
+                                                          (check_aggregates, aggregates is not None)) if enabled]
+
+    def on_chunk(chunk, results):
+        for callback in chunk_callbacks:
+            callback(chunk, results)
+
+    timings = {}
+    metrics = ValidationMetrics() if args.metrics else None
+    id_dictionary = DatasetDictionary(args.id_dictionary) if args.id_dictionary else None
+    files = []
+    total_rows = 0
+    if args.record_violations:
+        # Violations staged by an earlier run that was killed before commit_run() or discard_run()
+        historic_violations.discard_run()
+    try:
+        for input_path in expand_inputs(args.inputs):
+            current['input'] = input_path
+            name = os.path.splitext(os.path.basename(input_path))[0]
+            output_path = os.path.join(args.output_dir, f"{name}.results.{args.format}")
+            options = dict(historic_violations=historic_violations, max_days_old=args.max_days_old,
+                           chunksize=args.chunk_size, reference_time=reference_time, date_format=args.date_format,
+                           output_format=args.format, rule_set=args.rules,
+                           on_chunk=on_chunk if chunk_callbacks else None, timings=timings, metrics=metrics)
+            incremental = (RowFingerprintIndex(incremental_index_path(args.incremental_index, input_path))
+                           if args.incremental_index else None)
+            file_started = time.perf_counter()
+            if args.workers > 1:
+                summary = validate_csv_parallel(input_path, output_path, workers=args.workers, **options)
+            else:
+                summary = validate_csv_stream(input_path, output_path, id_dictionary=id_dictionary,
+                                              incremental=incremental, **options)
+            seconds = time.perf_counter() - file_started
+            total_rows += summary.rows
+            files.append({'input': input_path, 'output': output_path, 'seconds': round(seconds, 3),
+                          'rows_per_sec': round(summary.rows / seconds, 1) if seconds else None,
+                          'summary': summary.as_dict()})
+            if incremental is not None:
+                files[-1]['incremental'] = incremental.stats()
+
+        if args.explain and distinct_errors:
+            from explanation_backends import make_backend
+            from remediation_explainer import ExplanationService
+            explain_started = time.perf_counter()
+            options = {'threads': args.explain_threads} if args.explain_backend == 'cpu' else {}
+            service = ExplanationService(backend=make_backend(args.explain_backend, "gpt2", **options),
+                                         templates=[rule[1] for rule in rules.RULES])
+            errors = sorted(distinct_errors)
+            with timed_stage(metrics, 'explain', len(errors)):
+                explanations = dict(zip(errors, service.explain_many(errors)))
+            with open(os.path.join(args.output_dir, 'explanations.json'), 'w') as file:
+                json.dump(explanations, file, indent=2)
+            timings['explain'] = time.perf_counter() - explain_started
+    except Exception:
+        # Nothing of a failed run goes into the history
+        if args.record_violations:
+            historic_violations.discard_run()
+        raise
+
+    if args.record_violations:
+        historic_violations.commit_run()
+    if aggregates is not None:
+        aggregates.checkpoint()
+        with open(os.path.join(args.output_dir, 'aggregate_violations.json'), 'w') as file:
+            json.dump(aggregate_violations, file, indent=2)
+    if id_dictionary is not None:
+        id_dictionary.save()
+    if metrics is not None:
+        if args.metrics.endswith('.prom'):
+            metrics.write_prometheus(args.metrics)
+        else:
+            with open(args.metrics, 'w') as file:
+                json.dump(metrics.snapshot(), file, indent=2)
+
+    elapsed = time.perf_counter() - started
+    report = {
+        'files': files,
+        'rows': total_rows,
+        'seconds': round(elapsed, 3),
+        'rows_per_sec': round(total_rows / elapsed, 1) if elapsed else None,
+        'stage_seconds': {stage: round(seconds, 3) for stage, seconds in timings.items()},
+        'peak_rss_mb': peak_rss_mb(),
+    }
+    if aggregates is not None:
+        report['aggregates'] = dict(aggregates.stats(), violations=len(aggregate_violations))
+    return report
+
+
+def print_report(report):
+    for entry in report['files']:
+        print(f"{entry['input']}: {entry['summary']['rows']:,} rows in {entry['seconds']}s "
+              f"({entry['rows_per_sec']:,} rows/sec) -> {entry['output']}")
+        if 'incremental' in entry:
+            incremental = entry['incremental']
+            print(f"  incremental: {incremental['reused']:,} rows reused, {incremental['validated']:,} validated"
+                  + (" (full revalidation)" if incremental['full_revalidation'] else ""))
+    print(f"Total: {report['rows']:,} rows in {report['seconds']}s ({report['rows_per_sec']:,} rows/sec)")
+    print("Stage timings: " + ", ".join(f"{stage} {seconds}s" for stage, seconds in report['stage_seconds'].items()))
+    rss = report['peak_rss_mb']
+    print(f"Peak RSS: {rss['process']} MB (largest worker {rss['largest_worker']} MB)")
+    if 'aggregates' in report:
+        aggregates = report['aggregates']
+        print(f"Aggregate rules: {aggregates['violations']:,} violating rows, "
+              f"{aggregates['retained_events']:,} window events retained")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = run(args)
+    print_report(report)
+    if args.report:
+        with open(args.report, 'w') as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,7 @@
-def validate_data(data, historic_violations={}):
+from model_loader import load_model
+
+
+def validate_data(data, historic_violations=None):
     errors = []
     remediation_actions = []
     risk_score = 0  # Start with a base risk score
@@ -39,6 +42,9 @@ def validate_data(data, historic_violations={}):
 
     return errors, remediation_actions, risk_score
 def generate_remediation_explanation(error_message):
+    # Load GPT-2 on first use; rule-only callers never import transformers or torch
+    model, tokenizer = load_model("gpt2")
+
     # Prepare the prompt for GPT-2
     input_text = f"Explain why the following error might have occurred in a financial transaction: {error_message}"
 
@@ -49,9 +55,4 @@ def generate_remediation_explanation(error_message):
     # Decode the output and return the explanation
     explanation = tokenizer.decode(outputs[0], skip_special_tokens=True)
     return explanation
-from transformers import GPT2LMHeadModel, GPT2Tokenizer
-
-# Load pre-trained GPT-2 model and tokenizer
-model = GPT2LMHeadModel.from_pretrained("gpt2")
-tokenizer = GPT2Tokenizer.from_pretrained("gpt2")
 
@@ -0,0 +1,405 @@
+import argparse
+import io
+import json
+import os
+import queue
+import socketserver
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+import currency_index
+from generated_validation_code import DEFAULT_DATE_FORMAT
+from historic_store import run_violations
+from instrumentation import ValidationMetrics
+from rule_sets import load_rule_set
+from stream_validation import TRANSACTION_DTYPES
+from validate_cli import is_sqlite_store, load_historic_violations
+
+DEFAULT_MAX_BATCH_ROWS = 20_000
+DEFAULT_MAX_WAIT_MS = 2.0
+# Request latencies kept for the percentiles
+LATENCY_WINDOW = 10_000
+# The JSON values a record field may hold
+SCALAR_TYPES = (str, int, float, bool, type(None))
+
+
+def parse_records(body, content_type):
+    # A request body as a DataFrame: a CSV file, or JSON holding a list of records, one record, or
+    # {"records": [...]}. Columns the rules know get the same dtypes as in validate_cli. Raises
+    # ValueError for anything else, before the request joins a batch.
+    if 'csv' in content_type:
+        columns = pd.read_csv(io.BytesIO(body), nrows=0).columns
+        return pd.read_csv(io.BytesIO(body), dtype={column: TRANSACTION_DTYPES[column] for column in columns
+                                                    if column in TRANSACTION_DTYPES})
+    payload = json.loads(body)
+    if isinstance(payload, dict):
+        payload = payload.get('records', [payload])
+    if not isinstance(payload, list):
+        raise ValueError("expected a list of records")
+    for position, record in enumerate(payload):
+        if not isinstance(record, dict):
+            raise ValueError(f"record {position} is not an object")
+        for column, value in record.items():
+            if not isinstance(value, SCALAR_TYPES):
+                raise ValueError(f"record {position} has a {type(value).__name__} in '{column}'")
+    data = pd.DataFrame.from_records(payload)
+    for column, dtype in TRANSACTION_DTYPES.items():
+        if column in data and dtype == 'float64':
+            data[column] = pd.to_numeric(data[column], errors='coerce')
+    return data
+
+
+class ValidationService:
+    # Validates micro-batches of requests with the rules, currency codes, historic-violation store
+    # and explanation model loaded once for the process's lifetime.
+    #
+    # Requests with the same columns are validated together by one validate_frame call, and the
+    # distinct errors of every request that asked for explanations go to one explain_many call. If
+    # a group fails, its requests are validated one by one so only the failing ones get the error.
+
+    def __init__(self, rules, historic_violations=None, explanation_service=None, max_days_old=180,
+                 reference_time=None, date_format=DEFAULT_DATE_FORMAT, record_violations=False, metrics=None):
+        self.rules = rules
+        self.historic_violations = historic_violations if historic_violations is not None else {}
+        self.explanation_service = explanation_service
+        self.max_days_old = max_days_old
+        self.reference_time = reference_time
+        self.date_format = date_format
+        self.record_violations = record_violations
+        self.metrics = metrics
+
+    def warm_up(self):
+        # Load everything a first request would otherwise pay for
+        currency_index.code_index()
+        data = pd.DataFrame([{'Customer_ID': 'warm-up', 'Transaction_Amount': 1.0, 'Reported_Amount': 1.0,
+                              'Currency': 'USD'}])
+        results = self.rules.validate_frame(data, self.historic_violations, self.max_days_old, self.reference_time,
+                                            self.date_format)
+        self.rules.frame_messages(data, results, self.historic_violations, self.max_days_old, self.date_format)
+        if self.explanation_service is not None:
+            self.explanation_service.backend.load()
+
+    def validate_batch(self, requests):
+        # [(data, explain)] -> one list of per-row result dicts per request, or the exception a
+        # request failed with
+        reference_time = self.reference_time or datetime.now()  # One "today" for the whole batch
+        groups = {}
+        for position, (data, _) in enumerate(requests):
+            groups.setdefault(tuple(data.columns), []).append(position)
+
+        messages = [None] * len(requests)
+        for positions in groups.values():
+            frames = [requests[position][0] for position in positions]
+            try:
+                group_messages = self._validate(frames, reference_time)
+            except Exception as e:
+                if len(frames) == 1:
+                    messages[positions[0]] = e
+                    continue
+                for position, frame in zip(positions, frames):
+                    try:
+                        messages[position] = self._validate([frame], reference_time)
+                    except Exception as e:
+                        messages[position] = e
+                continue
+            start = 0
+            for position, frame in zip(positions, frames):
+                messages[position] = group_messages[start:start + len(frame)]
+                start += len(frame)
+        if self.record_violations:
+            self.historic_violations.commit_run()
+
+        explanations = {}
+        if self.explanation_service is not None:
+            errors = list(dict.fromkeys(error for (_, explain), request_messages in zip(requests, messages)
+                                        if explain and not isinstance(request_messages, Exception)
+                                        for errors, _, _ in request_messages for error in errors))
+            explanations = dict(zip(errors, self.explanation_service.explain_many(errors)))
+
+        responses = []
+        for (_, explain), request_messages in zip(requests, messages):
+            if isinstance(request_messages, Exception):
+                responses.append(request_messages)
+                continue
+            rows = []
+            for errors, remediation_actions, risk_score in request_messages:
+                row = {'errors': errors, 'remediation_actions': remediation_actions, 'risk_score': int(risk_score)}
+                if explain and self.explanation_service is not None:
+                    row['explanations'] = [explanations[error] for error in errors]
+                rows.append(row)
+            responses.append(rows)
+        return responses
+
+    def _validate(self, frames, reference_time):
+        # Messages for the rows of frames with the same columns, validated as one frame
+        data = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0].reset_index(drop=True)
+        results = self.rules.validate_frame(data, self.historic_violations, self.max_days_old, reference_time,
+                                            self.date_format, self.metrics)
+        messages = self.rules.frame_messages(data, results, self.historic_violations, self.max_days_old,
+                                             self.date_format)
+        if self.record_violations:
+            self.historic_violations.record(run_violations(data, results, self.rules.RULE_IDS))
+        return messages
+
+
+class MicroBatcher:
+    # Collects concurrent requests into micro-batches for one worker thread. The worker takes every
+    # request already waiting, then waits up to max_wait seconds for more while the batch has fewer
+    # than max_batch_rows rows, so under load many small requests share one vectorized call while a
+    # lone request waits at most max_wait. process() returns one response per request; a response
+    # that is an exception is raised to that request only.
+
+    def __init__(self, process, max_batch_rows=DEFAULT_MAX_BATCH_ROWS, max_wait=DEFAULT_MAX_WAIT_MS / 1000):
+        self.process = process
+        self.max_batch_rows = max_batch_rows
+        self.max_wait = max_wait
+        self.batches = 0
+        self.batched_requests = 0
+        self.batch_seconds = deque(maxlen=LATENCY_WINDOW)
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, data, explain=False):
+        # Blocks until the request's batch is done; returns its per-row results
+        future = Future()
+        self._queue.put((data, explain, future))
+        return future.result()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            rows = len(first[0])
+            deadline = time.monotonic() + self.max_wait
+            while rows < self.max_batch_rows:
+                try:
+                    item = self._queue.get_nowait() if time.monotonic() >= deadline else \
+                        self._queue.get(timeout=deadline - time.monotonic())
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+                rows += len(item[0])
+
+            started = time.perf_counter()
+            try:
+                responses = self.process([(data, explain) for data, explain, _ in batch])
+            except Exception as e:
+                for _, _, future in batch:
+                    future.set_exception(e)
+            else:
+                for (_, _, future), response in zip(batch, responses):
+                    if isinstance(response, Exception):
+                        future.set_exception(response)
+                    else:
+                        future.set_result(response)
+            self.batch_seconds.append(time.perf_counter() - started)
+            self.batches += 1
+            self.batched_requests += len(batch)
+
+
+class ValidationRequestHandler(BaseHTTPRequestHandler):
+    # POST /validate (JSON or CSV body; ?explain=1 adds explanations), GET /stats (JSON),
+    # GET /metrics (Prometheus text) and GET /health
+    protocol_version = 'HTTP/1.1'  # Keep-alive, so a feed can reuse one connection
+
+    def do_POST(self):
+        started = time.perf_counter()
+        url = urlparse(self.path)
+        if url.path != '/validate':
+            return self._send_json(404, {'error': f"Unknown path '{url.path}'"})
+        try:
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            data = parse_records(body, self.headers.get('Content-Type', 'application/json'))
+        except (ValueError, pd.errors.ParserError) as e:
+            return self._send_json(400, {'error': f"Could not parse the request: {e}"})
+        explain = parse_qs(url.query).get('explain', ['0'])[0].lower() in ('1', 'true', 'yes')
+        try:
+            results = self.server.batcher.submit(data, explain)
+        except Exception as e:
+            return self._send_json(500, {'error': str(e)})
+        self._send_json(200, {'rows': len(results), 'results': results})
+        self.server.record_request(time.perf_counter() - started, len(results))
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == '/health':
+            self._send_json(200, {'status': 'ok'})
+        elif path == '/stats':
+            self._send_json(200, self.server.stats())
+        elif path == '/metrics':
+            self._send(200, self.server.prometheus_text().encode('utf-8'), 'text/plain; version=0.0.4')
+        else:
+            self._send_json(404, {'error': f"Unknown path '{path}'"})
+
+    def _send_json(self, status, payload):
+        self._send(status, json.dumps(payload).encode('utf-8'), 'application/json')
+
+    def _send(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # One line per request would dominate the cost of small requests
+
+
+class _ServerState:
+    # Request latency and batching statistics shared by the TCP and Unix socket servers
+
+    def _init_state(self, service, batcher):
+        self.service = service
+        self.batcher = batcher
+        self.requests = 0
+        self.rows = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self._stats_lock = threading.Lock()
+
+    def record_request(self, seconds, rows):
+        with self._stats_lock:
+            self.requests += 1
+            self.rows += rows
+            self.latencies.append(seconds)
+
+    def stats(self):
+        with self._stats_lock:
+            latencies = np.array(self.latencies)
+            requests, rows = self.requests, self.rows
+        batch_seconds = np.array(self.batcher.batch_seconds)
+        percentiles = lambda values, q: round(float(np.percentile(values, q)) * 1000, 3) if len(values) else None
+        return {
+            'requests': requests,
+            'rows': rows,
+            'batches': self.batcher.batches,
+            'requests_per_batch': round(self.batcher.batched_requests / self.batcher.batches, 2) if self.batcher.batches else None,
+            'latency_ms': {'p50': percentiles(latencies, 50), 'p99': percentiles(latencies, 99)},
+            'batch_ms': {'p50': percentiles(batch_seconds, 50), 'p99': percentiles(batch_seconds, 99)},
+        }
+
+    def prometheus_text(self, prefix='validation_server'):
+        stats = self.stats()
+        lines = []
+        for name, kind, help_text, value in (
+                ('requests_total', 'counter', "Validation requests served.", stats['requests']),
+                ('rows_total', 'counter', "Rows validated.", stats['rows']),
+                ('batches_total', 'counter', "Micro-batches run.", stats['batches'])):
+            lines += [f"# HELP {prefix}_{name} {help_text}", f"# TYPE {prefix}_{name} {kind}", f"{prefix}_{name} {value}"]
+        lines += [f"# HELP {prefix}_latency_seconds Request latency over the last {LATENCY_WINDOW} requests.",
+                  f"# TYPE {prefix}_latency_seconds summary"]
+        for quantile in ('p50', 'p99'):
+            if stats['latency_ms'][quantile] is not None:
+                lines.append(f'{prefix}_latency_seconds{{quantile="0.{quantile[1:]}"}} {stats["latency_ms"][quantile] / 1000}')
+        text = "\n".join(lines) + "\n"
+        if self.service.metrics is not None:
+            text += self.service.metrics.prometheus_text()
+        return text
+
+    def server_close(self):
+        super().server_close()
+        self.batcher.close()
+
+
+class ValidationHTTPServer(_ServerState, ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, service, batcher):
+        self._init_state(service, batcher)
+        super().__init__(address, ValidationRequestHandler)
+
+
+class UnixValidationHTTPServer(_ServerState, socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, service, batcher):
+        self._init_state(service, batcher)
+        if os.path.exists(path):
+            os.remove(path)
+        super().__init__(path, ValidationRequestHandler)
+
+    def get_request(self):
+        request, _ = super().get_request()
+        return request, ('unix', 0)  # BaseHTTPRequestHandler expects a (host, port) client address
+
+
+def make_server(service, host='127.0.0.1', port=8765, unix_socket=None, max_batch_rows=DEFAULT_MAX_BATCH_ROWS,
+                max_wait_ms=DEFAULT_MAX_WAIT_MS):
+    # A warmed-up server (not yet serving) for `service`; call serve_forever() and, when done,
+    # shutdown() and server_close()
+    service.warm_up()
+    batcher = MicroBatcher(service.validate_batch, max_batch_rows, max_wait_ms / 1000)
+    if unix_socket:
+        return UnixValidationHTTPServer(unix_socket, service, batcher)
+    return ValidationHTTPServer((host, port), service, batcher)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Resident validation service for small, frequent batches.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix-socket', default=None, help="Listen on this Unix socket instead of TCP")
+    parser.add_argument('--rules', default=None, help="Generated rule module or JSON rule spec (default: built-in rules)")
+    parser.add_argument('--historic-violations', default=None, help="JSON file or SQLite store (.sqlite3/.db)")
+    parser.add_argument('--record-violations', action='store_true',
+                        help="Add every batch's violations to the SQLite --historic-violations store")
+    parser.add_argument('--max-days-old', type=int, default=180)
+    parser.add_argument('--date-format', default=DEFAULT_DATE_FORMAT)
+    parser.add_argument('--explain-backend', choices=('cpu', 'transformers', 'stub', 'none'), default='none',
+                        help="Explanation model kept loaded for ?explain=1 requests")
+    parser.add_argument('--explanation-cache', default=None, help="SQLite explanation store shared across restarts")
+    parser.add_argument('--max-batch-rows', type=int, default=DEFAULT_MAX_BATCH_ROWS)
+    parser.add_argument('--max-wait-ms', type=float, default=DEFAULT_MAX_WAIT_MS,
+                        help="How long a batch waits for more requests to arrive")
+    parser.add_argument('--metrics', action='store_true', help="Also expose per-rule metrics on /metrics")
+    args = parser.parse_args(argv)
+    if args.record_violations and not is_sqlite_store(args.historic_violations):
+        parser.error("--record-violations needs a SQLite --historic-violations store")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    rules = load_rule_set(args.rules)
+    explanation_service = None
+    if args.explain_backend != 'none':
+        from explanation_backends import make_backend
+        from explanation_store import ExplanationStore
+        from remediation_explainer import ExplanationService
+        store = ExplanationStore(args.explanation_cache) if args.explanation_cache else None
+        explanation_service = ExplanationService(backend=make_backend(args.explain_backend, "gpt2"), store=store,
+                                                 templates=[rule[1] for rule in rules.RULES])
+    service = ValidationService(rules, load_historic_violations(args.historic_violations),
+                                explanation_service, args.max_days_old, date_format=args.date_format,
+                                record_violations=args.record_violations,
+                                metrics=ValidationMetrics() if args.metrics else None)
+    server = make_server(service, args.host, args.port, args.unix_socket, args.max_batch_rows, args.max_wait_ms)
+    print(f"Validating on {args.unix_socket or f'http://{args.host}:{server.server_address[1]}'}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
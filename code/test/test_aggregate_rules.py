@@ -0,0 +1,119 @@
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from aggregate_rules import DEFAULT_WINDOW_RULES, WindowRule, WindowedAggregates
+
+REFERENCE_TIME = pd.Timestamp('2025-01-31')
+
+def transactions(n, seed=0, customers=40, days=20):
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp('2025-01-01') + pd.to_timedelta(rng.integers(0, days, n), unit='D')
+    return pd.DataFrame({
+        'Customer_ID': [f"C{number}" for number in rng.integers(0, customers, n)],
+        'Transaction_Date': dates.strftime('%Y-%m-%d'),
+        'Transaction_Amount': rng.uniform(0, 2000, n).round(2),
+        'is_cross_border': rng.random(n) < 0.5,
+    })
+
+def brute_force(data, rule):
+    # The rule's value for every row it judges, by comparing every pair of rows
+    dates = pd.to_datetime(data['Transaction_Date'])
+    judged = data['is_cross_border'].to_numpy() if rule.where else np.ones(len(data), dtype=bool)
+    values = np.full(len(data), np.nan)
+    for i in np.flatnonzero(judged):
+        window = judged[:i + 1] & (data['Customer_ID'][:i + 1] == data['Customer_ID'][i]).to_numpy() & \
+            (dates[:i + 1] > dates[i] - rule.window).to_numpy() & (dates[:i + 1] <= dates[i]).to_numpy()
+        amounts = data['Transaction_Amount'].to_numpy()[:i + 1][window]
+        values[i] = {'sum': amounts.sum(), 'count': window.sum(), 'max': amounts.max()}[rule.aggregate]
+    return values
+
+RULES = [
+    WindowRule('cross_border_total', 'Cross-border total {value}', 'Action: review.', 5, 'sum', '3D', 6000,
+               column='Transaction_Amount', where='is_cross_border'),
+    WindowRule('velocity', '{value} transactions', 'Action: review.', 3, 'count', '24h', 3),
+    WindowRule('largest', 'Largest {value}', 'Action: review.', 1, 'max', '7D', 1900, column='Transaction_Amount'),
+]
+
+class TestWindowedAggregates(unittest.TestCase):
+
+    def test_chunks_and_runs_match_brute_force(self):
+        data = transactions(1200, seed=1)
+        with tempfile.TemporaryDirectory() as directory:
+            results = []
+            for start in range(0, len(data), 250):
+                # A new engine per chunk: every chunk is a separate run resumed from the checkpoint
+                engine = WindowedAggregates(RULES, directory, lateness='30D')
+                results.append(engine.validate_frame(data.iloc[start:start + 250], REFERENCE_TIME))
+                engine.checkpoint()
+        results = pd.concat(results)
+        for rule in RULES:
+            expected = brute_force(data, rule)
+            np.testing.assert_allclose(results[f"{rule.rule_id}_value"].to_numpy(), expected)
+            np.testing.assert_array_equal(results[rule.rule_id].to_numpy(), expected > rule.threshold)
+        self.assertTrue(results[[rule.rule_id for rule in RULES]].any().all())
+
+    def test_sorted_input_keeps_only_the_last_window(self):
+        data = transactions(2000, seed=2, days=60).sort_values('Transaction_Date', kind='stable').reset_index(drop=True)
+        engine = WindowedAggregates(RULES)
+        results = pd.concat([engine.validate_frame(data.iloc[start:start + 100], pd.Timestamp('2025-06-01'))
+                             for start in range(0, len(data), 100)])
+        for rule in RULES:
+            np.testing.assert_allclose(results[f"{rule.rule_id}_value"].to_numpy(), brute_force(data, rule))
+        # Only the longest window's (7 days) worth of events is retained
+        self.assertLess(engine.stats()['retained_events'], 2 * 8 * len(data) / 60)
+        self.assertEqual(engine.stats()['watermark'], '2025-03-01T00:00:00')
+
+    def test_busy_customer_costs_linear_memory(self):
+        # 100k same-day transactions of one account; pairing every row with its window would need
+        # billions of pairs
+        n = 100000
+        amounts = np.random.default_rng(5).uniform(0, 10, n)
+        data = pd.DataFrame({'Customer_ID': ['BUSY'] * n, 'Transaction_Date': ['2025-01-02'] * n,
+                             'Transaction_Amount': amounts, 'is_cross_border': True})
+        results = WindowedAggregates(RULES).validate_frame(data, REFERENCE_TIME)
+        np.testing.assert_array_equal(results['velocity_value'].to_numpy(), np.arange(1, n + 1))
+        np.testing.assert_allclose(results['cross_border_total_value'].to_numpy(), np.cumsum(amounts))
+        np.testing.assert_array_equal(results['largest_value'].to_numpy(), np.maximum.accumulate(amounts))
+
+    def test_future_dates_do_not_move_the_horizon(self):
+        engine = WindowedAggregates(RULES)
+        engine.validate_frame(transactions(100, seed=3), REFERENCE_TIME)
+        future = pd.DataFrame({'Customer_ID': ['C1'], 'Transaction_Date': ['2030-01-01'],
+                               'Transaction_Amount': [10.0], 'is_cross_border': [False]})
+        engine.validate_frame(future, REFERENCE_TIME)
+        self.assertEqual(engine.stats()['watermark'], '2025-01-20T00:00:00')
+
+    def test_changed_rules_drop_only_their_state(self):
+        data = transactions(300, seed=4)
+        with tempfile.TemporaryDirectory() as directory:
+            engine = WindowedAggregates(RULES, directory)
+            engine.validate_frame(data, REFERENCE_TIME)
+            engine.checkpoint()
+            retained = {rule_id: len(events) for rule_id, events in engine._events.items()}
+
+            stricter = WindowRule('velocity', '{value} transactions', 'Action: review.', 3, 'count', '24h', 1)
+            longer = WindowRule('largest', 'Largest {value}', 'Action: review.', 1, 'max', '14D',
+                                1900, column='Transaction_Amount')
+            reloaded = WindowedAggregates([RULES[0], stricter, longer], directory)
+            self.assertEqual(len(reloaded._events['cross_border_total']), retained['cross_border_total'])
+            self.assertEqual(len(reloaded._events['velocity']), retained['velocity'])
+            self.assertEqual(len(reloaded._events['largest']), 0)
+            self.assertEqual(reloaded.sequence, len(data))
+
+    def test_messages_and_missing_columns(self):
+        data = pd.DataFrame({'Customer_ID': ['A'] * 22 + ['B'], 'Transaction_Date': ['2025-01-02'] * 23,
+                             'Transaction_Amount': [300.0] * 23, 'is_cross_border': [True] * 23})
+        engine = WindowedAggregates()
+        results = engine.validate_frame(data, REFERENCE_TIME)
+        errors, actions, risk_score = engine.frame_messages(data, results)[-2]
+        self.assertEqual(errors, ['Cross-border transactions total 6600.00 within 24h, above the limit of 5000',
+                                  'Customer made 22 transactions within 24h, more than the limit of 20'])
+        self.assertEqual(risk_score, 8)
+        self.assertEqual(engine.frame_messages(data, results)[-1][0], [])
+
+        results = WindowedAggregates(DEFAULT_WINDOW_RULES).validate_frame(data[['Customer_ID']], REFERENCE_TIME)
+        self.assertFalse(results[[rule.rule_id for rule in DEFAULT_WINDOW_RULES]].any().any())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import os
+import tempfile
+import unittest
+from explanation_store import ExplanationStore
+from extract_rules import RuleExtractor, RuleStore, parse_rules, split_sections
+
+class WordTokenizer:
+    # Stands in for the GPT-2 tokenizer: one token per word, counting calls
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, text):
+        self.calls += 1
+        return {'input_ids': text.split()}
+
+class FakeGenerator:
+    # Answers each prompt with one rule naming the section's first word; records batch sizes
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, prompts):
+        self.batches.append(len(prompts))
+        return [f" Rule for {prompt.splitlines()[1].split()[0]}\n- Amounts must be positive\nThe end" for prompt in prompts]
+
+def document(paragraphs=300, changed=None):
+    # A long instruction document: numbered paragraphs of 40 words each
+    return "\n\n".join(f"Section{number} " + ("revised " if number == changed else "") +
+                       " ".join(f"word{word}" for word in range(40)) + "." for number in range(paragraphs))
+
+class TestRuleExtraction(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = RuleStore(os.path.join(self.tmp_dir.name, 'rules.sqlite3'))
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp_dir.cleanup()
+
+    def extractor(self):
+        self.tokenizer = WordTokenizer()
+        self.generator = FakeGenerator()
+        return RuleExtractor(store=self.store, batch_size=4, max_section_tokens=200,
+                             generate=self.generator, tokenizer=self.tokenizer)
+
+    def test_sections_are_token_bounded_and_cover_the_document(self):
+        text = document(50) + "\n\n" + " ".join(f"long{word}" for word in range(500))
+        sections = split_sections(text, lambda section: len(section.split()), 200)
+        self.assertTrue(all(len(section.split()) <= 200 for section in sections))
+        self.assertEqual(" ".join(sections).split(), text.split())
+
+    def test_unchanged_document_costs_nothing(self):
+        first = self.extractor().extract(document())
+        self.assertTrue(all(size <= 4 for size in self.generator.batches))
+        self.assertEqual(sum(self.generator.batches), len(first['sections']))
+        self.assertIn("Amounts must be positive", first['rules'])
+
+        extractor = self.extractor()
+        self.assertEqual(extractor.extract(document()), first)
+        self.assertEqual((self.generator.batches, self.tokenizer.calls), ([], 0))
+
+    def test_changed_document_only_regenerates_changed_sections(self):
+        first = self.extractor().extract(document())
+        extractor = self.extractor()
+        second = extractor.extract(document(changed=150))
+        # The edited section, plus at most a couple after it until the split re-aligns
+        stats = extractor.stats()
+        self.assertLessEqual(stats['generated_sections'], 3)
+        self.assertEqual(stats['generated_sections'] + stats['cached_sections'], len(second['sections']))
+        self.assertGreater(len(second['sections']), 50)
+        self.assertEqual(second['sections'][:10], first['sections'][:10])
+
+    def test_rules_and_explanations_do_not_share_entries(self):
+        # Even in one file and under the same fingerprint and key, neither cache sees, overwrites or
+        # prunes the other's entries
+        explanations = ExplanationStore(self.store.path)
+        try:
+            self.store.put_many('fingerprint', {'key': '["rule"]'})
+            self.assertEqual(explanations.get_many('fingerprint', ['key']), {})
+            explanations.put_many('fingerprint', {'key': 'An explanation'})
+            self.assertEqual(self.store.get_many('fingerprint', ['key']), {'key': '["rule"]'})
+            self.assertEqual(explanations.prune('other'), 1)
+            self.assertEqual(self.store.get_many('fingerprint', ['key']), {'key': '["rule"]'})
+        finally:
+            explanations.close()
+
+    def test_parse_rules(self):
+        self.assertEqual(parse_rules(" A\n\n* B\n1. C\n- A\nNot a rule\n- D"), ['A', 'B', 'C'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import types
+import unittest
+import numpy as np
+import pandas as pd
+from generate_profiling_rules import DatasetProfile, profile_frame
+from generate_validation_code import VALIDATION_RULES, render_validation_code
+from profiling_sketches import HyperLogLog, QuantileSketch, TopK
+from synthetic_data import generate_transactions
+
+class TestProfilingSketches(unittest.TestCase):
+
+    def test_merged_sketches_match_one_pass(self):
+        rng = np.random.default_rng(0)
+        values = pd.Series(rng.integers(0, 50000, 200000)).map('C{}'.format)
+        whole, first, second = HyperLogLog(), HyperLogLog(), HyperLogLog()
+        whole.update(values)
+        first.update(values[:120000])
+        second.update(values[120000:])
+        first.merge(second)
+        np.testing.assert_array_equal(first.registers, whole.registers)
+        self.assertAlmostEqual(first.count() / values.nunique(), 1, delta=0.03)
+
+    def test_quantiles_within_one_percent_rank(self):
+        values = np.random.default_rng(1).exponential(100, 300000)
+        sketches = [QuantileSketch(seed=seed) for seed in range(3)]
+        for sketch, part in zip(sketches, np.array_split(values, 3)):
+            for chunk in np.array_split(part, 4):
+                sketch.update(chunk)
+        sketches[0].merge(sketches[1])
+        sketches[0].merge(sketches[2])
+        fractions = np.array([0.01, 0.25, 0.5, 0.75, 0.99])
+        ranks = np.searchsorted(np.sort(values), sketches[0].quantiles(fractions)) / len(values)
+        self.assertEqual(sketches[0].count, len(values))
+        self.assertLess(np.abs(ranks - fractions).max(), 0.01)
+
+    def test_top_values(self):
+        values = pd.Series(['USD'] * 500 + ['EUR'] * 300 + [f'X{i}' for i in range(1000)])
+        top = TopK(capacity=20)
+        values = values.sample(frac=1, random_state=0)
+        for start in range(0, len(values), 250):
+            top.update(values.iloc[start:start + 250])
+        self.assertEqual([value for value, _ in top.top(2)], ['USD', 'EUR'])
+
+class TestDatasetProfile(unittest.TestCase):
+
+    def setUp(self):
+        self.data, _ = generate_transactions(5000, seed=2, reference_time='2025-01-01')
+
+    def test_partial_profiles_merge(self):
+        profile = profile_frame(self.data.iloc[:2000]).merge(profile_frame(self.data.iloc[2000:]))
+        amounts = profile.columns['Transaction_Amount'].as_dict()
+        self.assertEqual(profile.rows, 5000)
+        self.assertEqual((amounts['min'], amounts['max']),
+                         (self.data['Transaction_Amount'].min(), self.data['Transaction_Amount'].max()))
+        flags = profile.columns['Account_Flag'].as_dict()
+        self.assertEqual(flags['nulls'], self.data['Account_Flag'].isna().sum())
+        self.assertEqual(flags['top_values'], [('OD', self.data['Account_Flag'].eq('OD').sum())])
+        self.assertFalse(profile.columns['Currency'].numeric)
+
+    def test_range_rules_drive_the_validator(self):
+        rules = profile_frame(self.data).range_rules(columns=['Transaction_Amount'])
+        self.assertEqual([rule['id'] for rule in rules], ['transaction_amount_out_of_range'])
+        module = types.ModuleType('profiled_rules')
+        exec(render_validation_code(VALIDATION_RULES + rules), module.__dict__)
+
+        data = self.data.iloc[:3].copy()
+        data['Transaction_Amount'] = [100.0, 1e9, -1e9]
+        results = module.validate_frame(data, reference_time='2025-01-01')
+        self.assertEqual(results['transaction_amount_out_of_range'].tolist(), [False, True, True])
+        errors = module.frame_messages(data, results)[1][0]
+        self.assertTrue(errors[-1].startswith("Transaction Amount is outside the profiled range"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+import types
+import pandas as pd
+from generate_validation_code import VALIDATION_RULES, render_validation_code
+
+def load_module(source):
+    # Execute rendered validation code as a throwaway module
+    module = types.ModuleType('rendered_validation_code')
+    exec(compile(source, module.__name__, 'exec'), module.__dict__)
+    return module
+
+class TestGenerateValidationCode(unittest.TestCase):
+
+    def test_shared_subexpressions_rendered_once(self):
+        source = render_validation_code()
+
+        # Both date rules and both amount rules reuse one parse / one difference
+        self.assertEqual(source.count("pd.to_datetime("), 1)
+        self.assertEqual(source.count("np.abs(transaction_amount - reported_amount)"), 1)
+
+    def test_added_rule_joins_the_kernel(self):
+        rules = VALIDATION_RULES + [{
+            'id': 'large_transaction',
+            'column': 'Transaction_Amount',
+            'requires': ['Transaction_Amount'],
+            'uses': ['transaction_amount'],
+            'predicate': "transaction_amount > {limit}",
+            'limit': 10000,
+            'risk_weight': 1,
+            'error': "Transaction Amount is unusually large",
+            'remediation': "Action: Confirm the transaction with the customer.",
+        }]
+        module = load_module(render_validation_code(rules))
+        data = pd.DataFrame({
+            'Customer_ID': ['C001', 'C002'],
+            'Transaction_Amount': [20000, 100],
+            'Reported_Amount': [20000, 100],
+            'Transaction_Date': ['2025-03-20', '2025-03-21'],
+            'Currency': ['USD', 'EUR'],
+        })
+
+        results = module.validate_frame(data, max_days_old=100000)
+        self.assertEqual(results['large_transaction'].tolist(), [True, False])
+        self.assertEqual(results['risk_score'].tolist(), [1, 0])
+        self.assertIn("Transaction Amount is unusually large", module.frame_messages(data, results)[0][0])
+
+    def test_unknown_shared_expression(self):
+        rules = [dict(VALIDATION_RULES[1], uses=['exchange_rate'])]
+
+        with self.assertRaises(ValueError):
+            render_validation_code(rules)
+
+if __name__ == '__main__':
+    unittest.main()
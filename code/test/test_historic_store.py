@@ -0,0 +1,73 @@
+import os
+import pickle
+import tempfile
+import unittest
+import pandas as pd
+from generated_validation_code import validate_frame, frame_messages, RULE_IDS
+from historic_store import HistoricViolationsStore, run_violations
+from id_dictionary import DatasetDictionary
+from parallel_validation import validate_frame_parallel
+from synthetic_data import generate_transactions
+
+REFERENCE_TIME = pd.Timestamp('2025-01-01')
+
+class TestHistoricViolationsStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = HistoricViolationsStore(os.path.join(self.tmp_dir.name, 'history.sqlite3'))
+        self.data, self.historic_violations = generate_transactions(3000, seed=6, reference_time=REFERENCE_TIME)
+        self.store.update(self.historic_violations)
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp_dir.cleanup()
+
+    def test_bulk_lookup_matches_dict(self):
+        expected = validate_frame(self.data, self.historic_violations, reference_time=REFERENCE_TIME)
+        pd.testing.assert_frame_equal(validate_frame(self.data, self.store, reference_time=REFERENCE_TIME), expected)
+        encoded = DatasetDictionary().encode_frame(self.data)
+        pd.testing.assert_frame_equal(validate_frame(encoded, self.store, reference_time=REFERENCE_TIME), expected)
+
+        customer_id, count = next(iter(self.historic_violations.items()))
+        self.assertEqual(self.store[customer_id], count)
+        self.assertNotIn('nobody', self.store)
+        row = self.data[self.data['Customer_ID'] == customer_id].iloc[:1]
+        errors = frame_messages(row, expected.loc[row.index], self.store)[0][0]
+        self.assertIn(f"Customer has {count} previous violations.", errors)
+
+    def test_messages_query_the_store_once_per_chunk(self):
+        results = validate_frame(self.data, self.store, reference_time=REFERENCE_TIME)
+        self.assertGreater(results['historic_violations'].sum(), 10)
+        queries = []
+        get_many = self.store.get_many
+        self.store.get_many = lambda customer_ids: queries.append(len(customer_ids)) or get_many(customer_ids)
+        messages = frame_messages(self.data, results, self.store)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(messages, frame_messages(self.data, results, self.historic_violations))
+
+    def test_store_is_shipped_to_workers(self):
+        restored = pickle.loads(pickle.dumps(self.store))
+        self.assertEqual(restored.stats()['customers'], len(self.historic_violations))
+        pd.testing.assert_frame_equal(
+            validate_frame_parallel(self.data, self.store, workers=2, reference_time=REFERENCE_TIME),
+            validate_frame(self.data, self.historic_violations, reference_time=REFERENCE_TIME))
+
+    def test_recorded_violations_apply_after_commit(self):
+        data = pd.DataFrame({'Customer_ID': ['A', 'A', 'B', 'C'], 'Transaction_Amount': [1.0, 2.0, 3.0, 4.0],
+                             'Reported_Amount': [1.0, 5.0, 4.0, 4.0], 'Transaction_Date': ['2024-12-01'] * 4,
+                             'Currency': ['USD'] * 4})
+        self.store.update({'C': 2})
+        results = validate_frame(data, self.store, reference_time=REFERENCE_TIME)
+        counts = run_violations(data, results, RULE_IDS)
+        self.assertEqual(counts.to_dict(), {'A': 1, 'B': 1})  # C only broke historic_violations
+
+        self.store.record(counts)
+        self.store.record({'A': 1})
+        self.assertEqual(self.store['A'], 0)
+        self.assertEqual(self.store.commit_run(), 2)
+        self.assertEqual(self.store.lookup(data['Customer_ID']).tolist(), [2, 2, 1, 2])
+        self.assertEqual(self.store.stats()['pending_customers'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from generate_profiling_rules import generate_profiling_rules, profile_frame
+from generated_validation_code import validate_frame
+from id_dictionary import DatasetDictionary, IdDictionary
+from synthetic_data import generate_transactions
+
+class TestIdDictionary(unittest.TestCase):
+
+    def test_codes_are_stable_across_chunks_and_runs(self):
+        dictionary = IdDictionary()
+        first = dictionary.encode(pd.Series(['C2', 'C1', None, 'C2']))
+        second = dictionary.encode(pd.Series(['C3', 'C1']))
+        self.assertEqual(first.cat.codes.tolist(), [0, 1, -1, 0])
+        self.assertEqual(second.cat.codes.tolist(), [2, 1])
+        self.assertEqual(dictionary.values, ['C2', 'C1', 'C3'])
+        self.assertIs(second.dtype, dictionary.encode(pd.Series(['C1'])).dtype)  # Rebuilt only when values are added
+
+        unknown = dictionary.encode(pd.Series(['C9', 'C3']), add=False)
+        self.assertEqual(unknown.cat.codes.tolist(), [-1, 2])
+        self.assertEqual(len(dictionary), 3)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'ids.json')
+            dataset = DatasetDictionary(path)
+            dataset.columns['Customer_ID'] = dictionary
+            dataset.save()
+            reloaded = DatasetDictionary(path).encode_frame(pd.DataFrame({'Customer_ID': ['C3', 'C2']}))
+            self.assertEqual(reloaded['Customer_ID'].cat.codes.tolist(), [2, 0])
+
+    def test_encoded_frame_validates_identically(self):
+        data, historic_violations = generate_transactions(3000, seed=4, reference_time='2025-01-01')
+        original = data.copy()
+        dictionary = DatasetDictionary()
+        encoded = pd.concat([dictionary.encode_frame(data.iloc[:1000]), dictionary.encode_frame(data.iloc[1000:])])
+        pd.testing.assert_frame_equal(data, original)
+        self.assertIsInstance(encoded['Currency'].dtype, pd.CategoricalDtype)
+        pd.testing.assert_frame_equal(validate_frame(encoded, historic_violations, reference_time='2025-01-01'),
+                                      validate_frame(data, historic_violations, reference_time='2025-01-01'))
+
+    def test_one_dictionary_across_many_growing_chunks(self):
+        dictionary = IdDictionary()
+        historic_violations = {'C0': 2}
+        for chunk_number in range(20):
+            ids = pd.Series([f"C{number}" for number in range(chunk_number * 50, chunk_number * 50 + 100)])
+            encoded = dictionary.encode(ids)
+            self.assertEqual(len(dictionary), chunk_number * 50 + 100)
+            # Values seen in earlier chunks keep their codes, new ones are appended
+            self.assertEqual(encoded.cat.codes.tolist(), list(range(chunk_number * 50, chunk_number * 50 + 100)))
+            self.assertEqual(encoded.tolist(), ids.tolist())
+            # The history is read as it is now, also when the same dict was changed in place
+            historic_violations[f"C{chunk_number * 50 + 99}"] = chunk_number + 1
+            data = pd.DataFrame({'Customer_ID': ids})
+            results = validate_frame(data.assign(Customer_ID=encoded), historic_violations)
+            self.assertTrue(results['historic_violations'].iloc[-1])
+            pd.testing.assert_frame_equal(results, validate_frame(data, historic_violations))
+        self.assertEqual(dictionary.values, [f"C{number}" for number in range(1050)])
+
+    def test_profiling_encoded_columns_without_mutation(self):
+        data, _ = generate_transactions(2000, seed=5, reference_time='2025-01-01')
+        columns = list(data.columns)
+        rules = generate_profiling_rules(data, DatasetDictionary())
+        self.assertEqual(list(data.columns), columns)
+        self.assertEqual(len(rules), 3)
+
+        currency = profile_frame(DatasetDictionary().encode_frame(data)).columns['Currency'].as_dict()
+        counts = data['Currency'].value_counts()
+        self.assertEqual((currency['min'], currency['max']), (data['Currency'].min(), data['Currency'].max()))
+        self.assertEqual(currency['top_values'][0], (counts.index[0], counts.iloc[0]))
+
+if __name__ == '__main__':
+    unittest.main()
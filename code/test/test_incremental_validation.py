@@ -0,0 +1,79 @@
+import os
+import tempfile
+import time
+import types
+import unittest
+import pandas as pd
+import generated_validation_code as rules
+from generated_validation_code import validate_frame
+from id_dictionary import DatasetDictionary, IdDictionary
+from incremental_validation import RowFingerprintIndex, row_hashes, rule_set_version
+from synthetic_data import generate_transactions
+
+REFERENCE_TIME = pd.Timestamp('2025-01-01')
+
+class TestRowFingerprintIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.tmp_dir.name, 'index')
+        self.data, self.historic_violations = generate_transactions(2000, seed=8, reference_time=REFERENCE_TIME)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def run_index(self, data, historic_violations=None, rule_set=rules, reference_time=REFERENCE_TIME):
+        historic_violations = self.historic_violations if historic_violations is None else historic_violations
+        index = RowFingerprintIndex(self.directory)
+        index.begin(rule_set, reference_time)
+        results = pd.concat([index.validate_frame(data.iloc[start:start + 500], historic_violations)
+                             for start in range(0, len(data), 500)])
+        index.commit()
+        pd.testing.assert_frame_equal(results, validate_frame(data, historic_violations, reference_time=reference_time),
+                                      check_dtype=False)
+        return index.stats()
+
+    def test_unchanged_rows_are_reused(self):
+        self.assertEqual(self.run_index(self.data), {'reused': 0, 'validated': 2000, 'full_revalidation': True})
+        self.assertEqual(self.run_index(self.data), {'reused': 2000, 'validated': 0, 'full_revalidation': False})
+        shuffled = self.data.sample(frac=1, random_state=0).reset_index(drop=True)
+        self.assertEqual(self.run_index(shuffled)['reused'], 2000)
+
+    def test_changed_rows_are_revalidated(self):
+        self.run_index(self.data)
+        changed = self.data.copy()
+        changed.loc[:19, 'Transaction_Amount'] = -1.0
+        self.assertEqual(self.run_index(changed), {'reused': 1980, 'validated': 20, 'full_revalidation': False})
+
+    def test_history_change_revalidates_customer_rows(self):
+        self.run_index(self.data)
+        customer_id = self.data['Customer_ID'].iloc[0]
+        history = dict(self.historic_violations)
+        history[customer_id] = history.get(customer_id, 0) + 5
+        stats = self.run_index(self.data, history)
+        self.assertEqual(stats['validated'], int((self.data['Customer_ID'] == customer_id).sum()))
+
+    def test_encoded_rows_reuse_plain_fingerprints(self):
+        self.run_index(self.data)
+        encoded = DatasetDictionary().encode_frame(self.data)
+        self.assertEqual(self.run_index(encoded), {'reused': 2000, 'validated': 0, 'full_revalidation': False})
+
+    def test_encoded_chunk_cost_does_not_follow_the_dictionary(self):
+        # Only the chunk's own values are hashed and looked up, not every ID of the dictionary
+        dictionary = IdDictionary()
+        dictionary.encode(pd.Series([f"C{number}" for number in range(1_000_000)]))
+        chunk = self.data.iloc[:200]
+        encoded = chunk.assign(Customer_ID=dictionary.encode(chunk['Customer_ID']))
+        started = time.perf_counter()
+        hashes = row_hashes(encoded, self.historic_violations)
+        self.assertLess(time.perf_counter() - started, 0.05)
+        self.assertEqual(hashes.tolist(), row_hashes(chunk, self.historic_violations).tolist())
+
+    def test_settings_change_forces_full_revalidation(self):
+        self.run_index(self.data)
+        self.assertTrue(self.run_index(self.data, reference_time=REFERENCE_TIME + pd.Timedelta(hours=6))['reused'])
+        self.assertTrue(self.run_index(self.data, reference_time='2025-01-02')['full_revalidation'])
+        edited = types.SimpleNamespace(**{name: getattr(rules, name) for name in ('RULES', 'RULE_IDS', 'validate_frame')})
+        edited.RULE_SET_VERSION = 'edited'
+        self.assertNotEqual(rule_set_version(edited), rule_set_version(rules))
+        self.assertTrue(self.run_index(self.data, rule_set=edited)['full_revalidation'])
@@ -0,0 +1,65 @@
+import os
+import tempfile
+import unittest
+import pandas as pd
+from generated_validation_code import validate_frame, RULE_IDS
+from instrumentation import ValidationMetrics
+from parallel_validation import validate_csv_parallel
+from stream_validation import validate_csv_stream
+from synthetic_data import generate_transactions
+
+REFERENCE_TIME = pd.Timestamp('2025-01-01')
+
+class TestValidationMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.data, self.historic_violations = generate_transactions(2000, seed=3, reference_time=REFERENCE_TIME)
+
+    def test_rule_counters_match_results(self):
+        metrics = ValidationMetrics()
+        results = validate_frame(self.data, self.historic_violations, reference_time=REFERENCE_TIME, metrics=metrics)
+        pd.testing.assert_frame_equal(results, validate_frame(self.data, self.historic_violations,
+                                                              reference_time=REFERENCE_TIME))
+
+        snapshot = metrics.snapshot()
+        self.assertEqual(list(snapshot['rules']), RULE_IDS)
+        for rule_id in RULE_IDS:
+            self.assertEqual(snapshot['rules'][rule_id]['rows'], 2000)
+            self.assertEqual(snapshot['rules'][rule_id]['violations'], results[rule_id].sum())
+        self.assertEqual(sum(entry['risk'] for entry in snapshot['rules'].values()), results['risk_score'].sum())
+        self.assertGreater(snapshot['shared_seconds'], 0)
+
+    def test_merge_and_prometheus_text(self):
+        metrics = ValidationMetrics()
+        validate_frame(self.data, self.historic_violations, reference_time=REFERENCE_TIME, metrics=metrics)
+        metrics.record_stage('explain', 0.5, 10)
+        merged = ValidationMetrics()
+        merged.merge(metrics.snapshot())
+        merged.merge(metrics.snapshot())
+        self.assertEqual(merged.rules['stale_date']['violations'], 2 * metrics.rules['stale_date']['violations'])
+        self.assertEqual(merged.stages['explain'], {'seconds': 1.0, 'calls': 2, 'rows': 20})
+
+        text = merged.prometheus_text()
+        self.assertIn('# TYPE validation_rule_rows_violated_total counter', text)
+        self.assertIn(f'validation_rule_rows_violated_total{{rule="stale_date"}} '
+                      f'{merged.rules["stale_date"]["violations"]}', text)
+        self.assertIn('validation_stage_calls_total{stage="explain"} 2', text)
+
+    def test_stream_and_parallel_record_stages(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            input_path = os.path.join(tmp_dir, 'transactions.csv')
+            self.data.to_csv(input_path, index=False)
+            for validate in (validate_csv_stream, validate_csv_parallel):
+                metrics = ValidationMetrics()
+                options = {'workers': 2} if validate is validate_csv_parallel else {}
+                summary = validate(input_path, os.path.join(tmp_dir, 'results.csv'), self.historic_violations,
+                                   chunksize=500, reference_time=REFERENCE_TIME, metrics=metrics, **options)
+                snapshot = metrics.snapshot()
+                self.assertEqual({stage: entry['rows'] for stage, entry in snapshot['stages'].items()},
+                                 {'read': 2000, 'validate': 2000, 'write': 2000})
+                self.assertEqual(snapshot['stages']['validate']['calls'], 4)
+                self.assertEqual({rule_id: entry['violations'] for rule_id, entry in snapshot['rules'].items()},
+                                 summary.violations)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+try:
+    import tkinter as tk
+    from paged_table import PagedResultTable
+except ImportError:
+    tk = None
+
+def rows(start, stop):
+    return [(f"C{number}", 'No Errors', 'No Actions', str(number % 7)) for number in range(start, stop)]
+
+class TestPagedResultTable(unittest.TestCase):
+
+    def setUp(self):
+        # The window is never shown; without Tk or a display to create it on, there is nothing to test
+        if tk is None:
+            self.skipTest("tkinter is not available")
+        try:
+            self.root = tk.Tk()
+        except tk.TclError as e:
+            self.skipTest(f"Tk is not available: {e}")
+        self.root.withdraw()
+        self.table = PagedResultTable(self.root, ('Customer_ID', 'Errors', 'Remediation Actions', 'Risk Score'),
+                                      page_size=3)
+
+    def tearDown(self):
+        self.root.destroy()
+
+    def visible(self):
+        return [tuple(str(value) for value in self.table.treeview.item(item)['values'])
+                for item in self.table.treeview.get_children()]
+
+    def label(self):
+        return self.table.page_label.cget('text')
+
+    def test_page_boundaries(self):
+        self.assertEqual(self.label(), "Page 1 of 1 (0 rows)")
+        self.table.append(rows(0, 6))
+        self.assertEqual(self.table.page_count(), 2)  # Exactly two full pages
+        self.table.append(rows(6, 7))
+        self.assertEqual(self.table.page_count(), 3)
+        self.assertEqual(self.visible(), rows(0, 3))
+
+        self.table.previous_page()
+        self.assertEqual(self.table.page, 0)
+        for _ in range(5):
+            self.table.next_page()
+        self.assertEqual(self.table.page, 2)
+        self.assertEqual(self.visible(), rows(6, 7))
+        self.assertEqual(self.label(), "Page 3 of 3 (7 rows)")
+        self.table.previous_page()
+        self.assertEqual(self.visible(), rows(3, 6))
+
+    def test_append_across_pages(self):
+        self.table.append(rows(0, 2))
+        # Fills the shown page and spills onto the next ones; only the shown page is rendered
+        self.table.append(rows(2, 8))
+        self.assertEqual(self.visible(), rows(0, 3))
+        self.assertEqual(self.label(), "Page 1 of 3 (8 rows)")
+
+        self.table.next_page()
+        self.table.next_page()
+        self.assertEqual(self.visible(), rows(6, 8))
+        # Rows landing on the partly filled page being shown appear at once
+        self.table.append(rows(8, 10))
+        self.assertEqual(self.visible(), rows(6, 9))
+        self.assertEqual(self.label(), "Page 3 of 4 (10 rows)")
+        self.assertEqual(len(self.table.treeview.get_children()), 3)
+
+    def test_clear(self):
+        self.table.append(rows(0, 10))
+        self.table.next_page()
+        self.table.clear()
+        self.assertEqual((self.table.rows, self.table.page), ([], 0))
+        self.assertEqual(self.visible(), [])
+        self.assertEqual(self.label(), "Page 1 of 1 (0 rows)")
+
+        self.table.append(rows(10, 12))
+        self.assertEqual(self.visible(), rows(10, 12))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,29 @@
+import unittest
+import pandas as pd
+from generated_validation_code import validate_frame
+from parallel_validation import validate_frame_parallel
+
+class TestParallelValidation(unittest.TestCase):
+
+    def setUp(self):
+        self.historic_violations = {'C003': 2, 'C007': 1}
+        self.data = pd.DataFrame({
+            'Customer_ID': [f"C{i % 9:03d}" for i in range(40)],
+            'Transaction_Amount': [float(i * 250) for i in range(40)],
+            'Transaction_Date': ['2025-03-20'] * 40,
+            'Account_Balance': [(-1) ** i * 100 for i in range(40)],
+            'Reported_Amount': [float(i * 250 + i % 3) for i in range(40)],
+            'Currency': ['USD', 'EUR', None, 'GBP'] * 10,
+            'is_cross_border': [i % 2 == 0 for i in range(40)],
+        })
+
+    def test_matches_serial_results(self):
+        expected = validate_frame(self.data, self.historic_violations)
+
+        # Both sharding modes must give back the serial results in the original row order
+        for shard_by in ('range', 'customer'):
+            results = validate_frame_parallel(self.data, self.historic_violations, workers=3, shard_by=shard_by)
+            pd.testing.assert_frame_equal(results, expected)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,157 @@
+import importlib.util
+import os
+import tempfile
+import unittest
+import numpy as np
+from remediation_explainer import PROMPT_PREFIX, PROMPT_TEMPLATE, PROMPT_VERSION, ExplanationService
+from explanation_backends import CPUBackend, StubBackend
+from explanation_store import ExplanationStore
+
+HAS_TORCH = importlib.util.find_spec('torch') is not None and importlib.util.find_spec('transformers') is not None
+
+class FakeTokenizer:
+    # Stands in for GPT2Tokenizer: one token per word, decoded back to the prompt plus " because"
+    eos_token = '<eos>'
+    pad_token = None
+    pad_token_id = 0
+
+    def __call__(self, prompts, return_tensors=None, padding=False):
+        self.prompts = prompts
+        width = max(len(prompt.split()) for prompt in prompts)
+        return {'input_ids': np.ones((len(prompts), width)), 'attention_mask': np.ones((len(prompts), width))}
+
+    def batch_decode(self, outputs, skip_special_tokens=False):
+        return [f"{prompt} because" for prompt in outputs]
+
+class FakeModel:
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+        self.batches = []
+
+    def generate(self, input_ids, **kwargs):
+        self.batches.append(len(input_ids))
+        return self.tokenizer.prompts
+
+class TestExplanationService(unittest.TestCase):
+
+    def setUp(self):
+        self.tokenizer = FakeTokenizer()
+        self.model = FakeModel(self.tokenizer)
+        self.service = ExplanationService(self.model, self.tokenizer, batch_size=2, max_cache_size=3)
+
+    def test_deduplicates_and_batches(self):
+        errors = ["Transaction Amount must match Reported Amount", "Currency should be a valid ISO 4217 currency code",
+                  "Transaction Amount must match  Reported Amount", "Transaction Date is required"] * 50
+        explanations = self.service.explain_many(errors)
+
+        # 3 distinct messages (whitespace normalized) -> 2 padded batches, not 200 generate() calls
+        self.assertEqual(self.model.batches, [2, 1])
+        self.assertEqual(len(explanations), 200)
+        self.assertEqual(explanations[0], explanations[2])
+        self.assertTrue(explanations[1].endswith("ISO 4217 currency code because"))
+
+    def test_cache_hits_and_lru_bound(self):
+        self.service.explain("Transaction Date is required")
+        self.service.explain("Transaction Date is required")
+        self.assertEqual(self.model.batches, [1])
+        self.assertEqual(self.service.stats()['hits'], 1)
+
+        self.service.explain_many(["a", "b", "c", "d"])
+        self.assertEqual(self.service.stats()['cached'], 3)
+
+    def test_rows_with_different_values_share_one_generation(self):
+        backend = StubBackend()
+        service = ExplanationService(backend=backend)
+        errors = ["Transaction Amount deviates from Reported Amount by more than 1% (Allowed deviation: 12.5)",
+                  "Transaction Amount deviates from Reported Amount by more than 1% (Allowed deviation: 980.03)",
+                  "Customer has 3 previous violations.", "Customer has 41 previous violations."]
+        explanations = service.explain_many(errors)
+
+        self.assertEqual(sum(backend.batches), 2)
+        self.assertEqual(explanations[0], explanations[1])
+        self.assertEqual(explanations[2], PROMPT_TEMPLATE.format(error_message="Customer has X previous violations.")
+                         + " (stub explanation)")
+        self.assertEqual(service.cache_key(errors[0]), service.cache_key(errors[1]))
+        # Messages of no known template keep their own text
+        self.assertEqual(service.cache_key("Something  else")[0], "Something else")
+
+    def test_prompt_version_is_part_of_the_key(self):
+        other = ExplanationService(self.model, self.tokenizer, prompt_version=PROMPT_VERSION + 1)
+        self.assertNotEqual(self.service.cache_key("x"), other.cache_key("x"))
+
+class TestExplanationStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'explanations.sqlite3')
+        self.errors = ["Transaction Amount must match Reported Amount", "Transaction Date is required"]
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def run_service(self, **kwargs):
+        # A fresh service per "process run", sharing only the store file
+        tokenizer = FakeTokenizer()
+        model = FakeModel(tokenizer)
+        store = ExplanationStore(self.path)
+        service = ExplanationService(model, tokenizer, store=store, **kwargs)
+        explanations = service.explain_many(self.errors)
+        store.close()
+        return model, service, explanations
+
+    def test_warm_run_makes_no_model_calls(self):
+        cold_model, _, cold = self.run_service()
+        warm_model, warm_service, warm = self.run_service()
+
+        self.assertEqual(cold_model.batches, [2])
+        self.assertEqual(warm_model.batches, [])
+        self.assertEqual(warm, cold)
+        self.assertEqual(warm_service.stats()['store'], {'hits': 2, 'misses': 0})
+
+    def test_changed_generation_params_invalidate(self):
+        self.run_service()
+        model, service, _ = self.run_service(max_length=60)
+
+        self.assertEqual(model.batches, [2])
+        self.assertEqual(service.stats()['generated'], 2)
+
+class TestExplanationBackends(unittest.TestCase):
+
+    def test_stub_backend(self):
+        backend = StubBackend()
+        service = ExplanationService(backend=backend, batch_size=2)
+        explanations = service.explain_many(["a", "b", "c", "a"])
+        self.assertEqual(backend.batches, [2, 1])
+        self.assertEqual(explanations[0], PROMPT_TEMPLATE.format(error_message="a") + " (stub explanation)")
+        self.assertEqual(service.model_name, 'stub')
+
+    @unittest.skipUnless(HAS_TORCH, "needs torch and transformers")
+    def test_cpu_backend_matches_generate(self):
+        # A tiny random GPT-2 with a byte-level tokenizer: batched decoding from the cached prefix
+        # gives the same greedy text as generate() on each full prompt
+        import torch
+        from tokenizers import pre_tokenizers
+        from transformers import GPT2Config, GPT2LMHeadModel, GPT2Tokenizer
+        import model_loader
+        vocab = {char: code for code, char in enumerate(sorted(pre_tokenizers.ByteLevel.alphabet()))}
+        vocab['<|endoftext|>'] = len(vocab)
+        tokenizer = GPT2Tokenizer(vocab=vocab, merges=[])
+        torch.manual_seed(0)
+        model = GPT2LMHeadModel(GPT2Config(vocab_size=len(vocab), n_layer=2, n_embd=64, n_head=4,
+                                           bos_token_id=len(vocab) - 1, eos_token_id=len(vocab) - 1)).eval()
+
+        errors = ["Transaction Amount must match Reported Amount", "Currency should be a valid ISO 4217 currency code", "x"]
+        backend = CPUBackend(model, tokenizer, quantize=False, max_new_tokens=12)
+        explanations = ExplanationService(backend=backend).explain_many(errors)
+        self.assertEqual(backend._prefix[0], tokenizer(PROMPT_PREFIX.rstrip())['input_ids'][:-1])
+        for error, explanation in zip(errors, explanations):
+            inputs = tokenizer(PROMPT_TEMPLATE.format(error_message=error), return_tensors='pt')
+            expected = model.generate(**inputs, max_new_tokens=12, do_sample=False, pad_token_id=tokenizer.eos_token_id)
+            self.assertEqual(explanation, tokenizer.decode(expected[0], skip_special_tokens=True))
+
+        quantized = CPUBackend(model_loader.quantize_for_cpu(model), tokenizer, max_new_tokens=12)
+        self.assertEqual(len(ExplanationService(backend=quantized).explain_many(errors)), 3)
+        self.assertNotEqual(ExplanationService(backend=quantized).fingerprint, ExplanationService(backend=backend).fingerprint)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+import asyncio
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from remediation_suggestions import RemediationClient, TokenBucket
+
+class MockCompletionsServer(ThreadingHTTPServer):
+    # Local stand-in for the completions endpoint: answers each prompt with "Fix: <prompt>" after
+    # `latency` seconds, fails the first `failures` requests with HTTP 429, answers at most
+    # `max_choices` prompts per request, and records the peak number of concurrent requests
+    daemon_threads = True
+
+    def __init__(self, latency=0.05, failures=0, max_choices=None):
+        super().__init__(('127.0.0.1', 0), MockCompletionsHandler)
+        self.latency = latency
+        self.failures = failures
+        self.max_choices = max_choices
+        self.requests = []
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+class MockCompletionsHandler(BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        server = self.server
+        with server.lock:
+            server.requests.append(body)
+            fail = server.failures > 0
+            server.failures -= fail
+            server.active += 1
+            server.peak = max(server.peak, server.active)
+        time.sleep(server.latency)
+        with server.lock:
+            server.active -= 1
+        if fail:
+            self.respond(429, {'error': {'message': 'Rate limit reached', 'type': 'requests'}}, {'Retry-After': '0'})
+            return
+        prompts = body['prompt'] if isinstance(body['prompt'], list) else [body['prompt']]
+        choices = [{'text': f" Fix: {prompt}", 'index': index, 'finish_reason': 'stop', 'logprobs': None}
+                   for index, prompt in enumerate(prompts)][:server.max_choices]
+        self.respond(200, {'id': 'cmpl-mock', 'object': 'text_completion', 'created': 0, 'model': body['model'],
+                           'choices': choices})
+
+    def respond(self, status, payload, headers=None):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+class TestRemediationClient(unittest.TestCase):
+
+    def start_server(self, **options):
+        server = MockCompletionsServer(**options)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def run_client(self, server, issues, **options):
+        async def run():
+            async with RemediationClient(base_url=server.base_url, api_key='test', **options) as client:
+                return await client.suggest_many(issues), client.stats()
+        return asyncio.run(run())
+
+    def test_batches_and_coalesces_identical_issues(self):
+        server = self.start_server()
+        issues = [f"Issue {number % 20}" for number in range(200)]
+        suggestions, stats = self.run_client(server, issues, batch_size=4)
+        self.assertEqual(len(server.requests), 5)
+        self.assertEqual(suggestions[21], "Fix: Given the following data issue: Issue 1, suggest remediation actions.")
+        self.assertEqual(stats['coalesced'], 180)
+
+    def test_concurrency_is_bounded_and_faster_than_serial(self):
+        server = self.start_server(latency=0.1)
+        started = time.perf_counter()
+        self.run_client(server, [f"Issue {number}" for number in range(40)], batch_size=1, max_concurrency=10)
+        self.assertLess(time.perf_counter() - started, 40 * 0.1 / 2)
+        # The semaphore caps concurrency; how close a run gets to the cap depends on the scheduler
+        self.assertLessEqual(server.peak, 10)
+        self.assertGreaterEqual(server.peak, 2)
+
+    def test_rate_limit_and_retries(self):
+        server = self.start_server(latency=0, failures=2)
+        started = time.perf_counter()
+        suggestions, stats = self.run_client(server, [f"Issue {number}" for number in range(10)], batch_size=1,
+                                             requests_per_minute=600, backoff=0.01)
+        # 12 attempts at 10 per second with a burst of 10: the last two wait for the bucket to refill
+        self.assertGreaterEqual(time.perf_counter() - started, 0.15)
+        self.assertEqual(stats['retries'], 2)
+        self.assertEqual(len(server.requests), 12)
+        self.assertEqual(len(suggestions), 10)
+
+    def test_token_bucket_paces_requests(self):
+        async def run():
+            bucket = TokenBucket(rate=50, capacity=1)
+            started = time.perf_counter()
+            for _ in range(11):
+                await bucket.acquire()
+            return time.perf_counter() - started
+        self.assertGreaterEqual(asyncio.run(run()), 10 / 50 * 0.9)
+
+    def test_concurrent_callers_share_a_request(self):
+        server = self.start_server(latency=0.1)
+        async def run():
+            async with RemediationClient(base_url=server.base_url, api_key='test') as client:
+                return await asyncio.gather(*(client.suggest("Same  issue") for _ in range(5)))
+        self.assertEqual(len(set(asyncio.run(run()))), 1)
+        self.assertEqual(len(server.requests), 1)
+
+    def test_missing_choices_fail_instead_of_hanging(self):
+        server = self.start_server(latency=0, max_choices=2)
+        async def run():
+            async with RemediationClient(base_url=server.base_url, api_key='test', batch_size=3) as client:
+                with self.assertRaisesRegex(RuntimeError, "Expected 3 completions, got 2"):
+                    await asyncio.wait_for(client.suggest_many(["Issue 1", "Issue 2", "Issue 3"]), timeout=5)
+                # Answered issues are kept; the unanswered one is requested again
+                self.assertEqual(await client.suggest("Issue 3"),
+                                 "Fix: Given the following data issue: Issue 3, suggest remediation actions.")
+                return client.stats()
+        self.assertEqual(asyncio.run(run())['suggestions'], 3)
+        self.assertEqual(len(server.requests), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from generated_validation_code import validate_frame, RULE_IDS
+from results_writer import open_results_writer, read_results, load_rule_texts
+
+class TestColumnarResultsWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data = pd.DataFrame({
+            'Customer_ID': ['C001', 'C002', 'C003', 'C001'],
+            'Transaction_Amount': [5000, 1200.0, 300, 2000],
+            'Transaction_Date': ['2025-03-20', '2025-03-21', 'bad-date', '2025-03-23'],
+            'Account_Balance': [15000, 32000, -5000, 70000],
+            'Reported_Amount': [500, 1200, 300, 2000],
+            'Currency': ['USD', 'EUR', 'GBP', 'XXX'],
+        })
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_round_trip_in_chunks(self):
+        for output_format in ('parquet', 'arrow'):
+            path = os.path.join(self.tmp_dir.name, f"results.{output_format}")
+            writer = open_results_writer(path, output_format)
+            expected = []
+            # Two chunks, written as validation proceeds
+            for chunk in (self.data.iloc[:2], self.data.iloc[2:]):
+                results = validate_frame(chunk, {'C001': 1}, max_days_old=100000)
+                writer.write(chunk, results)
+                expected.append(results)
+            writer.close()
+            expected = pd.concat(expected)
+
+            table = read_results(path, output_format)
+            loaded = table.to_pandas()
+            self.assertEqual(loaded['row'].tolist(), [0, 1, 2, 3])
+            self.assertEqual(loaded['Customer_ID'].astype(str).tolist(), self.data['Customer_ID'].tolist())
+            self.assertEqual(loaded['risk_score'].tolist(), expected['risk_score'].tolist())
+            for violations, (_, row) in zip(loaded['violations'], expected.iterrows()):
+                self.assertEqual(list(violations), [rule_id for rule_id in RULE_IDS if row[rule_id]])
+            self.assertEqual(set(load_rule_texts(table)), set(RULE_IDS))
+
+    def test_float_history_counts(self):
+        path = os.path.join(self.tmp_dir.name, 'results.parquet')
+        writer = open_results_writer(path, 'parquet')
+        results = validate_frame(self.data, {'C001': 2.0, 'C003': 1.0}, max_days_old=100000)
+        writer.write(self.data, results)
+        writer.close()
+        self.assertEqual(read_results(path).to_pandas()['risk_score'].tolist(), results['risk_score'].tolist())
+
+    def test_many_rules(self):
+        # More rules than an int8 dictionary index can address
+        rules = [(f"range_{number}", f"Value out of range {number}", "Action: review.", 1) for number in range(300)]
+        masks = np.zeros((len(self.data), len(rules)), dtype=bool)
+        masks[0, [0, 127, 128, 299]] = True
+        masks[3, 200] = True
+        results = pd.DataFrame(masks, columns=[rule[0] for rule in rules])
+        results['risk_score'] = masks.sum(axis=1)
+        for output_format in ('parquet', 'arrow'):
+            path = os.path.join(self.tmp_dir.name, f"many.{output_format}")
+            writer = open_results_writer(path, output_format, rules)
+            writer.write(self.data, results)
+            writer.close()
+            violations = read_results(path, output_format).to_pandas()['violations']
+            self.assertEqual(list(violations[0]), ['range_0', 'range_127', 'range_128', 'range_299'])
+            self.assertEqual(list(violations[3]), ['range_200'])
+            self.assertEqual(len(violations[1]), 0)
+
+if __name__ == '__main__':
+    unittest.main()
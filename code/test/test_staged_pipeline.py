@@ -0,0 +1,70 @@
+import threading
+import time
+import unittest
+import pandas as pd
+from generated_validation_code import validate_frame
+from instrumentation import ValidationMetrics
+from staged_pipeline import Stage, StagedPipeline
+from synthetic_data import generate_transactions
+
+REFERENCE_TIME = pd.Timestamp('2025-01-01')
+
+class TestStagedPipeline(unittest.TestCase):
+
+    def test_stages_overlap_and_keep_order(self):
+        data, historic_violations = generate_transactions(10000, seed=4, reference_time=REFERENCE_TIME)
+        published = []
+        validate = lambda chunk: (chunk, validate_frame(chunk, historic_violations, reference_time=REFERENCE_TIME))
+        pipeline = StagedPipeline([Stage('validate', validate),
+                                   Stage('publish', lambda item: published.append(item[1]), lambda item: len(item[0]))])
+        stats = pipeline.run(data.iloc[start:start + 1000] for start in range(0, len(data), 1000))
+
+        pd.testing.assert_frame_equal(pd.concat(published),
+                                      validate_frame(data, historic_violations, reference_time=REFERENCE_TIME))
+        self.assertEqual(stats['validate']['rows'], 10000)
+        self.assertEqual(stats['publish']['items'], 10)
+        self.assertEqual(stats['publish']['queue']['capacity'], 4)
+
+    def test_backpressure_bounds_buffered_items(self):
+        produced = []
+        consumed = []
+        ahead = []
+
+        def slow_sink(item):
+            time.sleep(0.01)
+            consumed.append(item)
+            ahead.append(len(produced) - len(consumed))
+
+        def source():
+            for item in range(50):
+                produced.append(item)
+                yield item
+
+        metrics = ValidationMetrics()
+        stats = StagedPipeline([Stage('read', lambda item: item, lambda item: 1),
+                                Stage('double', lambda item: item * 2, lambda item: 1),
+                                Stage('write', slow_sink, lambda item: 1)], queue_size=2, metrics=metrics).run(source())
+        self.assertEqual(consumed, [item * 2 for item in range(50)])
+        # Two queues of two, plus an item in the hands of each of the first two stages
+        self.assertLessEqual(max(ahead), 2 * 2 + 2)
+        self.assertEqual(stats['write']['queue']['peak'], 2)
+        self.assertGreater(stats['double']['blocked_seconds'], 0)
+        self.assertEqual(metrics.snapshot()['queues']['write']['peak'], 2)
+        self.assertIn('validation_queue_peak_depth{stage="write"} 2', metrics.prometheus_text())
+
+    def test_failure_stops_the_pipeline(self):
+        seen = []
+
+        def failing(item):
+            if item == 3:
+                raise ValueError("bad chunk")
+            return item
+
+        with self.assertRaisesRegex(ValueError, "bad chunk"):
+            StagedPipeline([Stage('read', lambda item: item, lambda item: 1), Stage('check', failing, lambda item: 1),
+                            Stage('write', seen.append, lambda item: 1)], queue_size=1).run(iter(range(10_000)))
+        self.assertEqual(seen, [0, 1, 2][:len(seen)])  # Items already past the failed stage may be discarded
+        self.assertEqual(threading.active_count(), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import os
+import tempfile
+import unittest
+import pandas as pd
+from generated_validation_code import validate_frame, RULE_IDS
+from stream_validation import validate_csv_stream
+
+class TestStreamValidation(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.input_path = os.path.join(self.tmp_dir.name, 'transactions.csv')
+        self.output_path = os.path.join(self.tmp_dir.name, 'results.csv')
+        self.data = pd.DataFrame({
+            'Customer_ID': ['C001', 'C002', 'C003', 'C004', 'C005'],
+            'Transaction_Amount': [5000, 1200.0, 300, 2000, 10],
+            'Transaction_Date': ['2025-03-20', '2025-03-21', '2025-03-22', '2025-03-23', '2025-03-24'],
+            'Account_Balance': [15000, 32000, -5000, 70000, 5],
+            'Reported_Amount': [500, 1200, 300, 1800, 10],
+            'Currency': ['USD', 'EUR', 'GBP', None, 'USD'],
+        })
+        self.data.to_csv(self.input_path, index=False)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_chunked_results_match_whole_file(self):
+        historic_violations = {'C003': 2}
+        summary = validate_csv_stream(self.input_path, self.output_path, historic_violations, chunksize=2)
+        expected = validate_frame(self.data, historic_violations)
+        written = pd.read_csv(self.output_path, index_col='Row')
+
+        self.assertEqual(written['Customer_ID'].tolist(), self.data['Customer_ID'].tolist())
+        self.assertEqual(written['risk_score'].tolist(), expected['risk_score'].tolist())
+        self.assertEqual(summary.rows, 5)
+        for rule_id in RULE_IDS:
+            self.assertEqual(summary.violations[rule_id], int(expected[rule_id].sum()))
+        self.assertEqual(sum(summary.risk_histogram.values()), 5)
+
+if __name__ == '__main__':
+    unittest.main()
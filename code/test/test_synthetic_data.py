@@ -0,0 +1,32 @@
+import unittest
+import pandas as pd
+from synthetic_data import generate_transactions
+from generated_validation_code import validate_frame, RULE_IDS
+
+REFERENCE_TIME = pd.Timestamp('2025-01-01')
+
+class TestSyntheticData(unittest.TestCase):
+
+    def test_same_seed_same_data(self):
+        first, history = generate_transactions(1000, seed=7, reference_time=REFERENCE_TIME)
+        second, same_history = generate_transactions(1000, seed=7, reference_time=REFERENCE_TIME)
+        pd.testing.assert_frame_equal(first, second)
+        self.assertEqual(history, same_history)
+        other, _ = generate_transactions(1000, seed=8, reference_time=REFERENCE_TIME)
+        self.assertFalse(first.equals(other))
+
+    def test_chunks_continue_row_numbers(self):
+        data, _ = generate_transactions(100, seed=7, reference_time=REFERENCE_TIME, start_row=500)
+        self.assertEqual(list(data.index[[0, -1]]), [500, 599])
+
+    def test_violation_rates_are_controllable(self):
+        rates = {'stale_date': 0.25, 'invalid_currency': 0.0, 'amount_mismatch': 0.1}
+        data, history = generate_transactions(20000, seed=1, violation_rates=rates, reference_time=REFERENCE_TIME)
+        shares = validate_frame(data, history, reference_time=REFERENCE_TIME)[RULE_IDS].mean()
+        self.assertAlmostEqual(shares['stale_date'], 0.25, delta=0.02)
+        self.assertAlmostEqual(shares['amount_mismatch'], 0.1 * 0.8, delta=0.02)  # cross-currency rows excluded
+        self.assertEqual(shares['invalid_currency'], 0.0)
+        self.assertEqual(shares['reported_amount_missing'], 0.0)
+
+if __name__ == '__main__':
+    unittest.main()
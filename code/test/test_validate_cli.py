@@ -0,0 +1,148 @@
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+import pandas as pd
+import validate_cli
+from generated_validation_code import validate_frame, RULE_IDS
+from historic_store import HistoricViolationsStore
+from validate_cli import expand_inputs, parse_args, run
+
+REFERENCE_DATE = '2025-04-01'
+
+class TestArguments(unittest.TestCase):
+
+    def assert_usage_error(self, argv):
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr), self.assertRaises(SystemExit) as raised:
+            parse_args(argv)
+        self.assertEqual(raised.exception.code, 2)
+        return stderr.getvalue()
+
+    def test_defaults(self):
+        args = parse_args(['transactions.csv'])
+        self.assertEqual(args.inputs, ['transactions.csv'])
+        self.assertEqual((args.workers, args.format, args.explain), (1, 'csv', False))
+
+    def test_invalid_combinations(self):
+        self.assert_usage_error([])
+        self.assert_usage_error(['transactions.csv', '--format', 'xlsx'])
+        self.assert_usage_error(['transactions.csv', '--workers', 'two'])
+        for option in ('--id-dictionary', '--incremental-index', '--aggregate-state'):
+            message = self.assert_usage_error(['transactions.csv', '--workers', '2', option, 'state'])
+            self.assertIn(f"{option} cannot be combined with --workers > 1", message)
+        message = self.assert_usage_error(['transactions.csv', '--record-violations',
+                                           '--historic-violations', 'history.json'])
+        self.assertIn("--record-violations needs a SQLite --historic-violations store", message)
+        parse_args(['transactions.csv', '--record-violations', '--historic-violations', 'history.sqlite3'])
+
+    def test_expand_inputs(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for name in ('b.csv', 'a.csv', 'notes.txt'):
+                open(os.path.join(directory, name), 'w').close()
+            pattern = os.path.join(directory, '*.csv')
+            self.assertEqual(expand_inputs([pattern, os.path.join(directory, 'a.csv')]),
+                             [os.path.join(directory, 'a.csv'), os.path.join(directory, 'b.csv')])
+            with self.assertRaises(FileNotFoundError):
+                expand_inputs([os.path.join(directory, '*.parquet')])
+
+class TestEndToEnd(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.input_path = os.path.join(self.tmp_dir.name, 'transactions.csv')
+        self.output_dir = os.path.join(self.tmp_dir.name, 'results')
+        self.data = pd.DataFrame({
+            'Customer_ID': ['C001', 'C002', 'C003', 'C004', 'C005'],
+            'Transaction_Amount': [5000, 1200.0, 300, 2000, 10],
+            'Transaction_Date': ['2025-03-20', '2025-03-21', '2025-03-22', '2025-05-23', '2024-01-24'],
+            'Account_Balance': [15000, 32000, -5000, 70000, 5],
+            'Reported_Amount': [500, 1200, 300, 1800, 10],
+            'Currency': ['USD', 'EUR', 'GBP', None, 'USD'],
+        })
+        self.data.to_csv(self.input_path, index=False)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def run_cli(self, *arguments):
+        return subprocess.run([sys.executable, validate_cli.__file__, *arguments], capture_output=True, text=True,
+                              cwd=self.tmp_dir.name)
+
+    def test_validates_a_csv_file(self):
+        history_path = os.path.join(self.tmp_dir.name, 'history.json')
+        report_path = os.path.join(self.tmp_dir.name, 'report.json')
+        with open(history_path, 'w') as file:
+            json.dump({'C003': 2}, file)
+        completed = self.run_cli(self.input_path, '--output-dir', self.output_dir, '--chunk-size', '2',
+                                 '--reference-date', REFERENCE_DATE, '--historic-violations', history_path,
+                                 '--report', report_path)
+        self.assertEqual(completed.returncode, 0, completed.stderr)
+        self.assertIn("Total: 5 rows", completed.stdout)
+
+        written = pd.read_csv(os.path.join(self.output_dir, 'transactions.results.csv'), index_col='Row')
+        expected = validate_frame(self.data, {'C003': 2}, reference_time=datetime.strptime(REFERENCE_DATE, '%Y-%m-%d'))
+        self.assertEqual(written.index.tolist(), list(range(5)))
+        self.assertEqual(written['Customer_ID'].tolist(), self.data['Customer_ID'].tolist())
+        self.assertEqual(written['risk_score'].tolist(), expected['risk_score'].tolist())
+        self.assertTrue(expected[['amount_mismatch', 'future_date', 'historic_violations']].any().all())
+
+        with open(report_path) as file:
+            report = json.load(file)
+        self.assertEqual(report['rows'], 5)
+        summary = report['files'][0]['summary']
+        for rule_id in RULE_IDS:
+            self.assertEqual(summary['violations'][rule_id], int(expected[rule_id].sum()))
+
+    def test_failed_run_records_no_violations(self):
+        store_path = os.path.join(self.tmp_dir.name, 'history.sqlite3')
+        arguments = ['--output-dir', self.output_dir, '--chunk-size', '2', '--reference-date', REFERENCE_DATE,
+                     '--historic-violations', store_path, '--record-violations']
+        # The first file's chunks are staged before the second, missing, file fails the run
+        with self.assertRaises(FileNotFoundError):
+            run(parse_args([self.input_path, os.path.join(self.tmp_dir.name, 'missing.csv'), *arguments]))
+        store = HistoricViolationsStore(store_path)
+        self.assertEqual(store.stats(), {'customers': 0, 'violations': 0, 'pending_customers': 0})
+
+        # Violations a killed run left staged are dropped by the next run
+        store.record({'C001': 5})
+        report = run(parse_args([self.input_path, *arguments]))
+        self.assertEqual(report['rows'], 5)
+        self.assertEqual(store['C001'], 1)
+        self.assertEqual(store.stats()['pending_customers'], 0)
+        store.close()
+
+    def test_same_named_inputs_keep_separate_indexes(self):
+        index_dir = os.path.join(self.tmp_dir.name, 'index')
+        other_path = os.path.join(self.tmp_dir.name, 'other', 'transactions.csv')
+        os.makedirs(os.path.dirname(other_path))
+        self.data.assign(Customer_ID=['X1', 'X2', 'X3', 'X4', 'X5']).to_csv(other_path, index=False)
+
+        def validate(input_path):
+            report = run(parse_args([input_path, '--output-dir', os.path.join(os.path.dirname(input_path), 'results'),
+                                     '--reference-date', REFERENCE_DATE, '--incremental-index', index_dir]))
+            return report['files'][0]['incremental']
+
+        validate(self.input_path)
+        validate(other_path)
+        # The second file did not replace the first one's index
+        self.assertEqual(validate(self.input_path), {'reused': 5, 'validated': 0, 'full_revalidation': False})
+        self.assertEqual(validate(other_path)['reused'], 5)
+        self.assertEqual(len(os.listdir(index_dir)), 2)
+
+    def test_exit_codes_on_errors(self):
+        completed = self.run_cli(os.path.join(self.tmp_dir.name, 'missing-*.csv'), '--output-dir', self.output_dir)
+        self.assertEqual(completed.returncode, 1)
+        self.assertIn("No input files match", completed.stderr)
+
+        completed = self.run_cli(self.input_path, '--workers', '2', '--id-dictionary', 'ids.json')
+        self.assertEqual(completed.returncode, 2)
+        self.assertFalse(os.path.exists(os.path.join(self.tmp_dir.name, 'validation_results')))
+
+if __name__ == '__main__':
+    unittest.main()
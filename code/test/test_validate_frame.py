@@ -0,0 +1,236 @@
+import math
+import time
+import unittest
+from datetime import datetime
+import pandas as pd
+import pycountry
+from generated_validation_code import validate_data, validate_frame, frame_messages, RULE_IDS
+from synthetic_data import generate_transactions
+
+REFERENCE_TIME = datetime(2025, 6, 30)
+
+def scalar_validate_data(data, historic_violations, max_days_old=180, reference_time=REFERENCE_TIME):
+    # Frozen copy of the original per-row rules, the oracle for the vectorized kernel. Two
+    # deliberate differences: dates are judged against reference_time instead of now, and a currency
+    # is valid only if ISO 4217 knows it (the original's pycountry call never failed). Rows with a
+    # missing or malformed date made the original raise, so those cases are checked separately.
+    errors = []
+    remediation_actions = []
+    risk_score = 0
+
+    if 'Reported_Amount' not in data:
+        errors.append("Reported Amount is required")
+        remediation_actions.append("Action: Ensure 'Reported_Amount' is provided for comparison.")
+        risk_score += 2
+    else:
+        transaction_amount = data['Transaction_Amount']
+        reported_amount = data['Reported_Amount']
+        if 'is_cross_currency' in data and data['is_cross_currency']:
+            allowed_deviation = 0.01 * reported_amount
+            if abs(transaction_amount - reported_amount) > allowed_deviation:
+                errors.append(f"Transaction Amount deviates from Reported Amount by more than 1% (Allowed deviation: {allowed_deviation})")
+                remediation_actions.append("Action: Review the transaction for cross-currency discrepancy. Adjust the reported amount or validate cross-currency rates.")
+                risk_score += 3
+        else:
+            if transaction_amount != reported_amount:
+                errors.append("Transaction Amount must match Reported Amount")
+                remediation_actions.append("Action: Ensure the transaction amount matches the reported amount.")
+                risk_score += 2
+
+    if 'Account_Balance' in data:
+        account_balance = data['Account_Balance']
+        if account_balance < 0 and ('Account_Flag' not in data or data['Account_Flag'] != 'OD'):
+            errors.append("Account Balance cannot be negative unless flagged as overdraft (OD)")
+            remediation_actions.append("Action: Investigate negative balance. If it's a valid overdraft, ensure 'Account_Flag' is set to 'OD'.")
+            risk_score += 4
+
+    if 'Transaction_Date' not in data:
+        errors.append("Transaction Date is required")
+        remediation_actions.append("Action: Ensure 'Transaction_Date' is provided.")
+        risk_score += 2
+    else:
+        transaction_date = datetime.strptime(data['Transaction_Date'], '%Y-%m-%d')
+        if transaction_date > reference_time:
+            errors.append("Transaction Date cannot be in the future")
+            remediation_actions.append("Action: Review the transaction date and correct any future dates.")
+            risk_score += 3
+        if (reference_time - transaction_date).days > max_days_old:
+            errors.append(f"Transaction is older than {max_days_old} days, triggering validation alert")
+            remediation_actions.append(f"Action: Review the transaction for validity if older than {max_days_old} days.")
+            risk_score += 3
+
+    currency = data.get('Currency')
+    if not isinstance(currency, str) or pycountry.currencies.get(alpha_3=currency) is None:
+        errors.append("Currency should be a valid ISO 4217 currency code")
+        remediation_actions.append("Action: Ensure the currency code is valid and follows ISO 4217 standards.")
+        risk_score += 2
+
+    if 'is_cross_border' in data and data['is_cross_border']:
+        if data['Transaction_Amount'] > 5000:
+            errors.append("Transaction exceeds cross-border transaction limits")
+            remediation_actions.append("Action: Cross-border transaction limit exceeded. Ensure the transaction adheres to regulatory limits or obtain necessary approval.")
+            risk_score += 5
+
+    if data['Customer_ID'] in historic_violations:
+        historic_score = historic_violations[data['Customer_ID']]
+        errors.append(f"Customer has {historic_score} previous violations.")
+        remediation_actions.append("Action: Review the customer's history of violations. Consider manual review.")
+        risk_score += historic_score
+
+    return errors, remediation_actions, risk_score
+
+class TestValidateFrame(unittest.TestCase):
+
+    def setUp(self):
+        # Sample historic violations
+        self.historic_violations = {
+            'C001': 3,  # Customer C001 has 3 previous violations
+            'C004': 1   # Customer C004 has 1 previous violation
+        }
+        self.data = pd.DataFrame({
+            'Customer_ID': ['C001', 'C002', 'C003', 'C004', 'C005', 'C006'],
+            'Transaction_Amount': [5000, 1200.0, 300, 2000, 7000, 101],
+            'Transaction_Date': ['2099-03-20', '2025-03-21', '2000-03-22', '2025-03-23', '2025-03-24', '2025-03-25'],
+            'Account_Balance': [15000, 32000, -5000, 70000, -10, 0],
+            'Reported_Amount': [500, 1200, 300, 1800, 7000, 100],
+            'Currency': ['USD', 'EUR', None, 'USD', 'GBP', 'JPY'],
+            'Account_Flag': [None, None, 'OD', None, None, None],
+            'is_cross_currency': [False, True, False, True, False, True],
+            'is_cross_border': [True, False, False, False, True, False],
+        })
+
+    def assert_matches_scalar_rules(self, data, historic_violations):
+        results = validate_frame(data, historic_violations, reference_time=REFERENCE_TIME)
+        messages = frame_messages(data, results, historic_violations)
+        for row_data, row_messages in zip(data.to_dict('records'), messages):
+            with self.subTest(row=row_data):
+                self.assertEqual(row_messages, scalar_validate_data(row_data, historic_violations))
+
+    def test_matches_scalar_rules(self):
+        self.assert_matches_scalar_rules(self.data, self.historic_violations)
+        data, historic_violations = generate_transactions(3000, seed=3, reference_time=REFERENCE_TIME)
+        parsed = pd.to_datetime(data['Transaction_Date'], format='%Y-%m-%d', errors='coerce').notna()
+        self.assert_matches_scalar_rules(data[parsed], historic_violations)
+
+    def test_matches_scalar_rules_on_edge_cases(self):
+        nan = math.nan
+        data = pd.DataFrame({
+            'Customer_ID': ['E1', 'E2', 'E3', 'E4', 'E5', 'E6', 'E7', 'E8'],
+            'Transaction_Amount': [nan, 100.0, nan, 6000.0, 100.0, 100.0, 5001.0, 99.5],
+            'Transaction_Date': ['2025-06-30', '2025-07-01', '2024-12-31', '2025-01-02', '2025-06-01',
+                                 '2025-06-01', '2025-06-01', '2025-06-01'],
+            'Account_Balance': [-1.0, nan, -1.0, 0.0, -0.01, 5.0, -3.0, 1.0],
+            'Reported_Amount': [100.0, nan, nan, 6000.0, 100.0, 101.5, 5001.0, 100.0],
+            'Currency': ['USD', 'EUR', 'XYZ', None, 'GBP', 'JPY', 'USD', 'EUR'],
+            # Non-boolean flags are read by truthiness, like the original rules read them
+            'is_cross_currency': ['yes', '', 0, 1, 'no', 1.0, nan, 'Y'],
+            'is_cross_border': [nan, 0, 'x', 'true', '', 0, 1, False],
+        })
+        # No Account_Flag column at all: every negative balance is reported
+        self.assert_matches_scalar_rules(data, {'E4': 2, 'E7': 0})
+        self.assert_matches_scalar_rules(data.assign(Account_Flag=['OD', None, 'XX', 'OD', None, 'OD', 'od', None]),
+                                         {})
+
+    def test_missing_and_malformed_dates(self):
+        # The original rules raised on these rows; the kernel reports them instead
+        data = pd.DataFrame({'Customer_ID': ['D1', 'D2', 'D3'], 'Transaction_Amount': [10.0, 10.0, 10.0],
+                             'Transaction_Date': [None, '2025-02-30', '30/06/2025'], 'Account_Balance': [1.0] * 3,
+                             'Reported_Amount': [10.0] * 3, 'Currency': ['USD'] * 3})
+        results = validate_frame(data, reference_time=REFERENCE_TIME)
+        messages = frame_messages(data, results)
+        self.assertEqual(messages[0], (["Transaction Date is required"],
+                                       ["Action: Ensure 'Transaction_Date' is provided."], 2))
+        invalid = (["Transaction Date is not a valid date in the format %Y-%m-%d"],
+                   ["Action: Correct the transaction date so it follows the %Y-%m-%d format."], 2)
+        self.assertEqual(messages[1], invalid)
+        self.assertEqual(messages[2], invalid)
+        # Without the column the whole frame is missing its dates
+        self.assertTrue(validate_frame(data.drop(columns='Transaction_Date'))['transaction_date_missing'].all())
+
+    def test_validate_data_wraps_the_kernel(self):
+        for row_data in self.data.to_dict('records'):
+            self.assertEqual(validate_data(row_data, self.historic_violations, reference_time=REFERENCE_TIME),
+                             scalar_validate_data(row_data, self.historic_violations))
+
+    def test_masks_and_risk_score(self):
+        results = validate_frame(self.data, self.historic_violations)
+
+        self.assertEqual(list(results.columns), RULE_IDS + ['risk_score'])
+        self.assertTrue(results.loc[0, 'future_date'])
+        self.assertTrue(results.loc[2, 'stale_date'])
+        self.assertTrue(results.loc[4, 'cross_border_limit'])
+        self.assertTrue(results.loc[4, 'negative_balance'])
+        self.assertFalse(results.loc[2, 'negative_balance'])  # Overdraft flag set
+        scalar_results = validate_frame(self.data, self.historic_violations, reference_time=REFERENCE_TIME)
+        self.assertEqual(scalar_results['risk_score'].tolist(),
+                         [scalar_validate_data(row, self.historic_violations)[2] for row in self.data.to_dict('records')])
+
+    def test_history_lookup_follows_the_chunk(self):
+        # Only the chunk's customers are looked up, however long the history is
+        history = {f"H{number}": number % 5 + 1 for number in range(1_000_000)}
+        history.update({7: 2, 'F1': 1.0})
+        data = pd.DataFrame({'Customer_ID': ['H3', None, 'nobody', 7, 'H3', 'F1'] * 100})
+        started = time.perf_counter()
+        results = validate_frame(data, history)
+        self.assertLess(time.perf_counter() - started, 0.1)
+        self.assertEqual(results['historic_violations'].tolist()[:6], [True, False, False, True, True, True])
+        scores = results['risk_score'] - validate_frame(data)['risk_score']
+        self.assertEqual(scores.tolist()[:6], [4, 0, 0, 2, 4, 1])
+        # Counts are whole numbers, also when the dict holds floats
+        self.assertEqual(results['risk_score'].dtype, 'int64')
+        with self.assertRaisesRegex(ValueError, "whole numbers"):
+            validate_frame(data, {'F1': 1.5})
+
+    def test_missing_reported_amount_column(self):
+        results = validate_frame(self.data.drop(columns=['Reported_Amount']))
+
+        self.assertTrue(results['reported_amount_missing'].all())
+        self.assertFalse(results['amount_mismatch'].any())
+
+    def test_currency_checked_against_iso_4217(self):
+        data = self.data.assign(Currency=['USD', 'XYZ', 'usd', None, 'EUR', 'JPY'])
+        results = validate_frame(data)
+
+        self.assertEqual(results['invalid_currency'].tolist(), [False, True, True, True, False, False])
+        # Categorical columns are checked per category and give the same answer
+        categorical = validate_frame(data.astype({'Currency': 'category'}))
+        self.assertEqual(categorical['invalid_currency'].tolist(), results['invalid_currency'].tolist())
+
+    def test_dates_use_one_reference_time(self):
+        data = self.data.assign(Transaction_Date=['2024-12-31', '2025-06-30', '2025-07-01', 'not-a-date', None, '01/02/2025'])
+        reference_time = datetime(2025, 6, 30, 23, 59)
+        results = validate_frame(data, max_days_old=180, reference_time=reference_time)
+
+        # Unparseable and empty dates are reported instead of raising
+        self.assertEqual(results['invalid_date'].tolist(), [False, False, False, True, False, True])
+        self.assertEqual(results['transaction_date_missing'].tolist(), [False, False, False, False, True, False])
+        self.assertEqual(results['future_date'].tolist(), [False, False, True, False, False, False])
+        self.assertEqual(results['stale_date'].tolist(), [True, False, False, False, False, False])
+
+        # Re-running with the same reference time gives the same answer
+        pd.testing.assert_frame_equal(results, validate_frame(data, max_days_old=180, reference_time=reference_time))
+
+        # A different date format is honoured
+        us_dates = validate_frame(data, reference_time=reference_time, date_format='%m/%d/%Y')
+        self.assertFalse(us_dates.loc[5, 'invalid_date'])
+
+    def test_timezone_aware_dates(self):
+        # Both sides are compared as naive UTC: 2025-07-01 01:00+02:00 is 2025-06-30 23:00 UTC
+        data = self.data.assign(Transaction_Date=['2025-07-01T01:00:00+02:00', '2025-07-01T03:00:00+02:00',
+                                                  '2024-12-31T23:00:00-02:00', '2025-01-01T01:00:00+02:00',
+                                                  'not-a-date', None])
+        reference_time = pd.Timestamp('2025-07-01 02:00', tz='Europe/Berlin')
+        results = validate_frame(data, reference_time=reference_time, date_format='%Y-%m-%dT%H:%M:%S%z')
+        self.assertEqual(results['future_date'].tolist(), [False, True, False, False, False, False])
+        self.assertEqual(results['stale_date'].tolist(), [False, False, False, True, False, False])
+        self.assertEqual(results['invalid_date'].tolist(), [False, False, False, False, True, False])
+
+        # A tz-aware reference time against naive dates, and a tz-aware datetime column
+        naive = validate_frame(self.data, reference_time=pd.Timestamp(REFERENCE_TIME, tz='UTC'))
+        pd.testing.assert_frame_equal(naive, validate_frame(self.data, reference_time=REFERENCE_TIME))
+        aware_column = self.data.assign(Transaction_Date=pd.to_datetime(self.data['Transaction_Date'])
+                                        .dt.tz_localize('Asia/Tokyo'))
+        pd.testing.assert_frame_equal(validate_frame(aware_column, reference_time=REFERENCE_TIME), naive)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,204 @@
+import http.client
+import json
+import os
+import socket
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import generated_validation_code
+from explanation_backends import StubBackend
+from generated_validation_code import validate_frame, frame_messages
+from remediation_explainer import ExplanationService
+from synthetic_data import generate_transactions
+from validation_server import MicroBatcher, ValidationService, make_server
+
+REFERENCE_TIME = pd.Timestamp('2025-01-01')
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+
+    def __init__(self, path):
+        super().__init__('localhost')
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.path)
+
+class TestValidationServer(unittest.TestCase):
+
+    def setUp(self):
+        self.data, self.historic_violations = generate_transactions(2000, seed=11, reference_time=REFERENCE_TIME)
+        self.backend = StubBackend()
+        service = ValidationService(generated_validation_code, self.historic_violations,
+                                    ExplanationService(backend=self.backend), reference_time=REFERENCE_TIME)
+        self.server = make_server(service, port=0, max_wait_ms=20)
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def request(self, method, path, body=None, content_type='application/json'):
+        connection = http.client.HTTPConnection('127.0.0.1', self.port)
+        connection.request(method, path, body, {'Content-Type': content_type})
+        response = connection.getresponse()
+        payload = response.read()
+        connection.close()
+        return response.status, payload
+
+    def expected(self, data):
+        results = validate_frame(data, self.historic_violations, reference_time=REFERENCE_TIME)
+        return [errors for errors, _, _ in frame_messages(data, results, self.historic_violations)]
+
+    def test_concurrent_requests_are_micro_batched(self):
+        chunks = [self.data.iloc[start:start + 50] for start in range(0, len(self.data), 50)]
+
+        def post(chunk):
+            status, body = self.request('POST', '/validate', chunk.to_json(orient='records'))
+            self.assertEqual(status, 200)
+            return json.loads(body)['results']
+
+        with ThreadPoolExecutor(max_workers=20) as pool:
+            responses = list(pool.map(post, chunks))
+        for chunk, results in zip(chunks, responses):
+            self.assertEqual([row['errors'] for row in results], self.expected(chunk.reset_index(drop=True)))
+
+        stats = json.loads(self.request('GET', '/stats')[1])
+        self.assertEqual(stats['requests'], len(chunks))
+        self.assertEqual(stats['rows'], len(self.data))
+        self.assertLess(stats['batches'], len(chunks))
+        self.assertIsNotNone(stats['latency_ms']['p50'])
+        self.assertGreaterEqual(stats['latency_ms']['p99'], stats['latency_ms']['p50'])
+
+    def test_csv_body_and_explanations(self):
+        chunk = self.data.iloc[:200]
+        status, body = self.request('POST', '/validate?explain=1', chunk.to_csv(index=False), 'text/csv')
+        self.assertEqual(status, 200)
+        results = json.loads(body)['results']
+        self.assertEqual([row['errors'] for row in results], self.expected(chunk))
+        for row in results:
+            self.assertEqual(len(row['explanations']), len(row['errors']))
+            self.assertTrue(all(explanation.endswith('(stub explanation)') for explanation in row['explanations']))
+        # Each error template is generated once, whatever the values in its messages
+        service = self.server.service.explanation_service
+        self.assertEqual(sum(self.backend.batches),
+                         len({service.cache_key(error) for row in results for error in row['errors']}))
+        self.assertLess(sum(self.backend.batches), len({error for row in results for error in row['errors']}))
+
+    def test_bad_requests(self):
+        self.assertEqual(self.request('POST', '/validate', '{"records": [')[0], 400)
+        self.assertEqual(self.request('POST', '/nowhere', '[]')[0], 404)
+        self.assertEqual(self.request('GET', '/health')[0], 200)
+
+    def test_bad_request_in_a_batch_fails_alone(self):
+        chunks = [self.data.iloc[start:start + 20] for start in range(0, 200, 20)]
+        bodies = [chunk.to_json(orient='records') for chunk in chunks]
+        bad = ['[1, 2]', '{"records": 5}', '"records"', '[{"Customer_ID": {"id": 1}}]', '[{"Currency": ["USD"]}]']
+
+        with ThreadPoolExecutor(max_workers=len(bodies) + len(bad)) as pool:
+            responses = list(pool.map(lambda body: self.request('POST', '/validate', body), bodies + bad))
+        for chunk, (status, body) in zip(chunks, responses):
+            self.assertEqual(status, 200)
+            self.assertEqual([row['errors'] for row in json.loads(body)['results']],
+                             self.expected(chunk.reset_index(drop=True)))
+        for status, body in responses[len(bodies):]:
+            self.assertEqual(status, 400)
+            self.assertIn('Could not parse the request', json.loads(body)['error'])
+
+    def test_metrics_text(self):
+        self.request('POST', '/validate', self.data.iloc[:10].to_json(orient='records'))
+        status, body = self.request('GET', '/metrics')
+        self.assertEqual(status, 200)
+        self.assertIn('validation_server_requests_total 1', body.decode())
+        self.assertIn('validation_server_latency_seconds{quantile="0.99"}', body.decode())
+
+class TestUnixSocketServer(unittest.TestCase):
+
+    def test_validates_over_a_unix_socket(self):
+        data, historic_violations = generate_transactions(100, seed=12, reference_time=REFERENCE_TIME)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'validation.sock')
+            server = make_server(ValidationService(generated_validation_code, historic_violations,
+                                                   reference_time=REFERENCE_TIME), unix_socket=path)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            try:
+                connection = UnixHTTPConnection(path)
+                connection.request('POST', '/validate', data.to_json(orient='records'),
+                                   {'Content-Type': 'application/json'})
+                response = connection.getresponse()
+                self.assertEqual(response.status, 200)
+                self.assertEqual(json.loads(response.read())['rows'], 100)
+                connection.close()
+            finally:
+                server.shutdown()
+                server.server_close()
+
+class TestValidationService(unittest.TestCase):
+
+    def test_failing_request_does_not_fail_its_batch(self):
+        data, historic_violations = generate_transactions(60, seed=13, reference_time=REFERENCE_TIME)
+        service = ValidationService(generated_validation_code, historic_violations, reference_time=REFERENCE_TIME)
+        # Same columns as the good requests, so it is validated in the same frame; text amounts (which
+        # parse_records would have coerced) fail the amount rules
+        broken = data.iloc[:5].assign(Transaction_Amount='abc')
+        requests = [(data.iloc[:30], False), (broken, False), (data.iloc[30:], False)]
+
+        responses = service.validate_batch(requests)
+        self.assertIsInstance(responses[1], TypeError)
+        for (frame, _), response in zip(requests[::2], responses[::2]):
+            expected = validate_frame(frame.reset_index(drop=True), historic_violations, reference_time=REFERENCE_TIME)
+            self.assertEqual([row['errors'] for row in response],
+                             [errors for errors, _, _ in frame_messages(frame.reset_index(drop=True), expected,
+                                                                        historic_violations)])
+
+class TestMicroBatcher(unittest.TestCase):
+
+    def test_failure_reaches_every_request_in_the_batch(self):
+        def process(requests):
+            raise ValueError("broken rules")
+        batcher = MicroBatcher(process, max_wait=0.01)
+        try:
+            with self.assertRaises(ValueError):
+                batcher.submit(pd.DataFrame({'a': [1]}))
+        finally:
+            batcher.close()
+
+    def test_failed_response_reaches_only_its_request(self):
+        def process(requests):
+            return [ValueError("bad request") if len(data) == 2 else [None] * len(data) for data, _ in requests]
+        batcher = MicroBatcher(process, max_wait=0.05)
+        try:
+            with ThreadPoolExecutor(max_workers=3) as pool:
+                futures = [pool.submit(batcher.submit, pd.DataFrame({'a': range(rows)})) for rows in (1, 2, 3)]
+                self.assertEqual(futures[0].result(), [None])
+                with self.assertRaises(ValueError):
+                    futures[1].result()
+                self.assertEqual(futures[2].result(), [None] * 3)
+        finally:
+            batcher.close()
+
+    def test_max_batch_rows_caps_a_batch(self):
+        sizes = []
+        release = threading.Event()
+
+        def process(requests):
+            release.wait()
+            sizes.append(sum(len(data) for data, _ in requests))
+            return [[None] * len(data) for data, _ in requests]
+
+        batcher = MicroBatcher(process, max_batch_rows=30, max_wait=0.05)
+        try:
+            with ThreadPoolExecutor(max_workers=10) as pool:
+                futures = [pool.submit(batcher.submit, pd.DataFrame({'a': range(10)})) for _ in range(10)]
+                release.set()
+                self.assertTrue(all(len(future.result()) == 10 for future in futures))
+        finally:
+            batcher.close()
+        self.assertEqual(sum(sizes), 100)
+        self.assertLessEqual(max(sizes), 30)
+
+if __name__ == '__main__':
+    unittest.main()